@@ -1,8 +1,17 @@
 from io import StringIO
+import hashlib
 import os
 
 from .simulator import Simulator
-from .draw import Render as Renderer
+
+
+def __getattr__(name):
+    # The renderer pulls in pygame, only load it for code that actually draws something
+    if name == "Renderer":
+        from .draw import Render
+        return Render
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def read_next_internal(file):
@@ -77,6 +86,10 @@ def split_at_spaces(text):
 
 
 
+def hash_text(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
 class Schematic:
     def __init__(self, path):
         self.path = path
@@ -87,8 +100,10 @@ class Schematic:
 
         self.sub_schematics = []
 
-        with open(self.path, "r") as f:
-            self.layout = self.__parse(f)
+        self.mtime = None
+        self.hash = None
+
+        self.layout = self.__parse(StringIO(self.__read()))
 
         self.__load_layout()
 
@@ -100,11 +115,46 @@ class Schematic:
 
         self.sub_schematics = []
 
-        with open(self.path, "r") as f:
-            self.layout = self.__parse(f)
+        self.layout = self.__parse(StringIO(self.__read()))
 
         self.__load_layout()
 
+    def __read(self):
+        self.mtime = os.path.getmtime(self.path)  # Before reading, so a save mid read still shows up next time
+
+        with open(self.path, "r") as f:
+            text = f.read()
+
+        self.hash = hash_text(text)
+        return text
+
+    def has_changed(self, checked=None):
+        """
+            Cheap mtime check first, the file is only hashed if that moved (so touching a file is not a change).
+            checked is a {path: changed} dict shared across one scan, a design uses the same file many times
+        """
+        if checked is not None and self.path in checked:
+            return checked[self.path]
+
+        try:
+            mtime = os.path.getmtime(self.path)
+            changed = False
+
+            if mtime != self.mtime:
+                with open(self.path, "r") as f:
+                    changed = hash_text(f.read()) != self.hash
+
+        except OSError:  # Deleted or mid save (editors often replace the file), keep what we have
+            return False
+
+        if mtime != self.mtime and not changed:
+            self.mtime = mtime
+
+        if checked is not None:
+            checked[self.path] = changed
+
+        return changed
+
     def __extract_symbol_file_info(self, component):
         comp_name = None
         comp_instance = None
@@ -0,0 +1,491 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from . import Schematic
+from . import simulator as simulator1
+from . import simulator2
+from .netlist import compile_netlist, load_netlist
+from .optimize import optimize_netlist
+
+
+"""
+Benchmarks
+
+Generates synthetic .bdf designs of a chosen size and times the parse, build and simulate
+phases of both simulators, plus simulator2 running an optimized netlist (see optimize.py).
+Results are printed as a table and can be written out as JSON to compare between versions:
+
+    python -m loader.bench --out bench.json
+    python -m loader.bench --quick
+
+Import times are measured too, each in a fresh interpreter, along with which GUI modules the
+import dragged in.
+"""
+
+BENCH_VERSION = 2
+
+IMPORT_TARGETS = ("loader", "loader.simulator2", "loader.netlist", "loader.draw")
+GUI_MODULES = ("pygame", "tkinter")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "gui_modules": [name for name in {gui!r} if name in sys.modules]}}))
+"""
+
+SYMBOL_WIDTH = 64
+PORT_SPACING = 16
+
+
+# --- .bdf generation ---
+
+class DesignWriter:
+    """ Just enough of the Quartus block diagram format for the parser and simulators """
+
+    def __init__(self):
+        self.chunks = ['(header "graphic" (version "1.4"))\n']
+        self.instances = 0
+
+    def pin(self, name, is_input, x, y):
+        """ Returns the xy of the pin's connection point """
+        if is_input:
+            self.chunks.append(
+                f'(pin\n\t(input)\n\t(rect {x} {y} {x + 168} {y + 16})\n'
+                f'\t(text "INPUT" (rect 125 0 153 10)(font "Arial" (font_size 6)))\n'
+                f'\t(text "{name}" (rect 5 0 60 12)(font "Arial" ))\n'
+                f'\t(pt 168 8)\n'
+                f'\t(drawing\n\t\t(line (pt 84 12)(pt 109 12))\n\t\t(line (pt 113 8)(pt 168 8))\n\t)\n)\n'
+            )
+            return x + 168, y + 8
+
+        self.chunks.append(
+            f'(pin\n\t(output)\n\t(rect {x} {y} {x + 176} {y + 16})\n'
+            f'\t(text "OUTPUT" (rect 1 0 39 10)(font "Arial" (font_size 6)))\n'
+            f'\t(text "{name}" (rect 90 0 150 12)(font "Arial" ))\n'
+            f'\t(pt 0 8)\n'
+            f'\t(drawing\n\t\t(line (pt 0 8)(pt 52 8))\n\t\t(line (pt 52 4)(pt 78 4))\n\t)\n)\n'
+        )
+        return x, y + 8
+
+    def symbol(self, name, inputs, outputs, x, y):
+        """ Returns {port name: xy} """
+        height = PORT_SPACING * (max(len(inputs), len(outputs)) + 1)
+        points = {}
+        ports = []
+
+        for side, names, is_input in ((0, inputs, True), (SYMBOL_WIDTH, outputs, False)):
+            for i, port_name in enumerate(names):
+                py = PORT_SPACING * (i + 1)
+                points[port_name] = (x + side, y + py)
+
+                text = f'(text "{port_name}" (rect 2 {py - 9} 23 {py + 3})(font "Courier New" (bold))(invisible))'
+                ports.append(
+                    f'\t(port\n\t\t(pt {side} {py})\n\t\t({"input" if is_input else "output"})\n'
+                    f'\t\t{text}\n\t\t{text}\n'
+                    f'\t\t(line (pt {side} {py})(pt {14 if is_input else SYMBOL_WIDTH - 14} {py}))\n\t)\n'
+                )
+
+        self.instances += 1
+        self.chunks.append(
+            f'(symbol\n\t(rect {x} {y} {x + SYMBOL_WIDTH} {y + height})\n'
+            f'\t(text "{name}" (rect 19 0 59 12)(font "Arial" (font_size 6)))\n'
+            f'\t(text "inst{self.instances}" (rect 3 {height - 11} 40 {height + 1})(font "Arial" ))\n'
+            + "".join(ports) +
+            f'\t(drawing\n\t\t(line (pt 14 8)(pt 14 {height - 8}))\n'
+            f'\t\t(line (pt 14 8)(pt 40 8))\n\t\t(line (pt 14 {height - 8})(pt 40 {height - 8}))\n'
+            f'\t\t(arc (pt 40 {height - 8})(pt 40 8)(rect 24 8 56 {height - 8}))\n\t)\n)\n'
+        )
+        return points
+
+    def connect(self, xy1, xy2):
+        self.chunks.append(f'(connector\n\t(pt {xy1[0]} {xy1[1]})\n\t(pt {xy2[0]} {xy2[1]})\n)\n')
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write("".join(self.chunks))
+
+
+def generate_not_chain(directory, length):
+    design = DesignWriter()
+    previous = design.pin("A", True, 0, 0)
+
+    for i in range(length):
+        ports = design.symbol("NOT", ["IN"], ["OUT"], 300 + (i % 32) * 120, (i // 32) * 80)
+        design.connect(previous, ports["IN"])
+        previous = ports["OUT"]
+
+    design.connect(previous, design.pin("Y", False, 300 + 33 * 120, 0))
+
+    path = os.path.join(directory, f"not_chain_{length}.bdf")
+    design.save(path)
+    return path
+
+
+def generate_ripple_adder(directory, bits):
+    """ Full adders made of 9 NAND2s each """
+    design = DesignWriter()
+    carry = design.pin("CIN", True, 0, 0)
+
+    for bit in range(bits):
+        y = 100 + bit * 300
+        a = design.pin(f"A{bit}", True, 0, y)
+        b = design.pin(f"B{bit}", True, 0, y + 40)
+
+        def nand(in1, in2, column, row):
+            ports = design.symbol("NAND2", ["IN1", "IN2"], ["OUT"], 300 + column * 120, y + row * 60)
+            design.connect(in1, ports["IN1"])
+            design.connect(in2, ports["IN2"])
+            return ports["OUT"]
+
+        n1 = nand(a, b, 0, 0)
+        n2 = nand(a, n1, 1, 0)
+        n3 = nand(b, n1, 1, 1)
+        half_sum = nand(n2, n3, 2, 0)
+        n4 = nand(half_sum, carry, 3, 0)
+        n5 = nand(half_sum, n4, 4, 0)
+        n6 = nand(carry, n4, 4, 1)
+        design.connect(nand(n5, n6, 5, 0), design.pin(f"S{bit}", False, 1200, y))
+        carry = nand(n1, n4, 5, 2)
+
+    design.connect(carry, design.pin("COUT", False, 1200, 100 + bits * 300))
+
+    path = os.path.join(directory, f"ripple_adder_{bits}.bdf")
+    design.save(path)
+    return path
+
+
+def generate_counter(directory, bits):
+    """ Ripple counter, each DFF clocked by the inverted output of the previous one """
+    design = DesignWriter()
+    clock = design.pin("CLK", True, 0, 0)
+
+    for bit in range(bits):
+        y = bit * 120
+        dff = design.symbol("DFF", ["D", "CLK"], ["Q"], 300, y)
+        inverter = design.symbol("NOT", ["IN"], ["OUT"], 450, y)
+
+        design.connect(clock, dff["CLK"])
+        design.connect(dff["Q"], inverter["IN"])
+        design.connect(inverter["OUT"], dff["D"])
+        design.connect(dff["Q"], design.pin(f"Q{bit}", False, 600, y))
+
+        clock = inverter["OUT"]
+
+    path = os.path.join(directory, f"counter_{bits}.bdf")
+    design.save(path)
+    return path
+
+
+def generate_hierarchy(directory, depth):
+    """ Every level holds two of the level below in series, the bottom level is a NOT """
+    for level in range(depth + 1):
+        design = DesignWriter()
+        a = design.pin("A", True, 0, 0)
+
+        if level == 0:
+            ports = design.symbol("NOT", ["IN"], ["OUT"], 300, 0)
+            design.connect(a, ports["IN"])
+            out = ports["OUT"]
+
+        else:
+            first = design.symbol(f"level{level - 1}", ["A"], ["Y"], 300, 0)
+            second = design.symbol(f"level{level - 1}", ["A"], ["Y"], 450, 0)
+            design.connect(a, first["A"])
+            design.connect(first["Y"], second["A"])
+            out = second["Y"]
+
+        design.connect(out, design.pin("Y", False, 600, 0))
+        design.save(os.path.join(directory, f"level{level}.bdf"))
+
+    return os.path.join(directory, f"level{depth}.bdf")
+
+
+DESIGNS = {
+    # name: (generator, stimulus, sizes, quick sizes)
+    "not_chain": (generate_not_chain, "toggle", (64, 512, 4096), (64,)),
+    "ripple_adder": (generate_ripple_adder, "random", (8, 32, 128), (8,)),
+    "counter": (generate_counter, "clock", (8, 32, 128), (8,)),
+    "hierarchy": (generate_hierarchy, "toggle", (4, 7, 10), (4,)),
+}
+
+
+# --- measurements ---
+
+def stimulus_values(kind, input_names, tick, rng):
+    if kind == "random":
+        return {name: rng.randint(0, 1) for name in input_names}
+
+    if kind == "clock":
+        return {"CLK": tick % 2}
+
+    return {name: tick % 2 for name in input_names}
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak
+
+
+def bench_simulator2(path, kind, ticks, optimize=False):
+    result = {}
+
+    start = time.perf_counter()
+    schematic = Schematic(path)
+    result["parse_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim = simulator2.Simulator(schematic)
+    sim.build()
+    result["build_s"] = time.perf_counter() - start
+
+    if optimize:
+        start = time.perf_counter()
+        sim = load_netlist(optimize_netlist(compile_netlist(sim)))  # Starts up the same way as below
+        result["optimize_s"] = time.perf_counter() - start
+
+    else:
+        sim.update_simulation()  # Same start-up as Simulator.update()
+        sim.full_rescan()
+        sim.built = True
+
+    sim.update_simulation()
+
+    simulators = list(sim.iter_simulators())
+    events_before = sum(s.event_count for s in simulators)
+    input_names = list(sim.inputs.keys())
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for pin_name, vcc in stimulus_values(kind, input_names, tick, rng).items():
+            sim.set_input(pin_name, vcc)
+
+        sim.update_simulation()
+    elapsed = time.perf_counter() - start
+
+    events = sum(s.event_count for s in simulators) - events_before
+    result.update({
+        "simulate_s": elapsed,
+        "ticks": ticks,
+        "ticks_per_s": ticks / elapsed if elapsed else None,
+        "events": events,
+        "events_per_s": events / elapsed if elapsed else None,
+        "components": sum(len(s.components) for s in simulators),
+        "peak_memory_bytes": measure_memory(lambda: simulator2.Simulator(Schematic(path)).build()),
+    })
+    return result
+
+
+def bench_simulator1(path, kind, ticks):
+    result = {}
+
+    start = time.perf_counter()
+    schematic = Schematic(path)
+    result["parse_s"] = time.perf_counter() - start
+
+    sim = simulator1.Simulator(schematic)
+    sim.update()  # Off -> Building
+
+    start = time.perf_counter()
+    sim.update()  # Builds the connection map
+    result["build_s"] = time.perf_counter() - start
+
+    def build():
+        memory_sim = simulator1.Simulator(Schematic(path))
+        memory_sim.update()
+        memory_sim.update()
+
+    result["peak_memory_bytes"] = measure_memory(build)
+
+    input_pins = {pin["pin_name"]: pin["component"] for pin in sim.pin_inputs}
+    rng = random.Random(0)
+
+    simulators = list(sim.iter_simulators())
+    events_before = sum(s.event_count for s in simulators)
+
+    try:
+        start = time.perf_counter()
+        for tick in range(ticks):
+            for pin_name, vcc in stimulus_values(kind, list(input_pins.keys()), tick, rng).items():
+                pin_vcc = input_pins[pin_name]["_simulation"]["pin_vcc"]["outputs"]
+
+                if pin_name in pin_vcc:
+                    pin_vcc[pin_name] = vcc
+
+            sim.update()
+        elapsed = time.perf_counter() - start
+
+    except Exception as e:  # The original simulator can't run every design, still report parse / build
+        result["error"] = f"{e.__class__.__name__}: {e}"
+        return result
+
+    events = sum(s.event_count for s in simulators) - events_before
+    result.update({
+        "simulate_s": elapsed,
+        "ticks": ticks,
+        "ticks_per_s": ticks / elapsed if elapsed else None,
+        "events": events,
+        "events_per_s": events / elapsed if elapsed else None,
+    })
+    return result
+
+
+def bench_simulator2_optimized(path, kind, ticks):
+    return bench_simulator2(path, kind, ticks, optimize=True)
+
+
+SIMULATORS = {
+    "simulator": bench_simulator1,
+    "simulator2": bench_simulator2,
+    "simulator2-opt": bench_simulator2_optimized,
+}
+
+
+def bench_import(module, repeats=5):
+    """ Best of a few cold imports, a new interpreter every time so nothing is cached in sys.modules """
+    result = {"module": module}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = IMPORT_SCRIPT.format(module=module, gui=GUI_MODULES)
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (root, env.get("PYTHONPATH"))))
+
+    times = []
+    for _ in range(repeats):
+        process = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=root, env=env)
+
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines()
+            result["error"] = lines[-1] if lines else f"exit code {process.returncode}"
+            return result
+
+        data = json.loads(process.stdout.strip().splitlines()[-1])
+        times.append(data["import_s"])
+        result["gui_modules"] = data["gui_modules"]
+
+    result["import_s"] = min(times)
+    return result
+
+
+def format_import_result(result):
+    line = f"import {result['module']:<20}"
+
+    if result.get("import_s") is not None:
+        line += f"  {result['import_s'] * 1000:9.1f}ms  gui: {', '.join(result['gui_modules']) or 'none'}"
+
+    if "error" in result:
+        line += f"  ({result['error']})"
+
+    return line
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=os.path.dirname(__file__), timeout=5
+        ).stdout.strip() or None
+
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(quick=False, ticks=200, designs=None, simulators=None, imports=True):
+    results = []
+    import_results = []
+
+    if imports:
+        for module in IMPORT_TARGETS:
+            import_result = bench_import(module)
+            import_results.append(import_result)
+
+            print(format_import_result(import_result), file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for design_name, (generator, kind, sizes, quick_sizes) in DESIGNS.items():
+            if designs and design_name not in designs:
+                continue
+
+            for size in (quick_sizes if quick else sizes):
+                design_directory = os.path.join(directory, f"{design_name}_{size}")
+                os.mkdir(design_directory)
+                path = generator(design_directory, size)
+
+                for sim_name, bench in SIMULATORS.items():
+                    if simulators and sim_name not in simulators:
+                        continue
+
+                    try:
+                        result = bench(path, kind, ticks)
+
+                    except Exception as e:
+                        result = {"error": f"{e.__class__.__name__}: {e}"}
+
+                    result.update({"design": design_name, "size": size, "simulator": sim_name})
+                    results.append(result)
+
+                    print(format_result(result), file=sys.stderr)
+
+    return {
+        "bench_version": BENCH_VERSION,
+        "revision": get_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "imports": import_results,
+        "results": results,
+    }
+
+
+def format_result(result):
+    def ms(key):
+        return f"{result[key] * 1000:9.1f}ms" if result.get(key) is not None else " " * 11
+
+    line = f"{result['simulator']:<14} {result['design']:<13} {result['size']:>5}  parse{ms('parse_s')}  build{ms('build_s')}"
+
+    if result.get("events_per_s") is not None:
+        line += f"  {result['events_per_s']:>12,.0f} events/s  {result['events'] / result['ticks']:8.1f} events/tick"
+
+    elif result.get("ticks_per_s") is not None:
+        line += f"  {result['ticks_per_s']:>12,.0f} ticks/s "
+
+    if result.get("peak_memory_bytes") is not None:
+        line += f"  {result['peak_memory_bytes'] / 1024 / 1024:7.2f}MiB"
+
+    if "error" in result:
+        line += f"  ({result['error']})"
+
+    return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parsing, building and simulating synthetic designs")
+    parser.add_argument("--quick", action="store_true", help="Only run the smallest size of each design")
+    parser.add_argument("--ticks", type=int, default=200, help="Simulation ticks per design")
+    parser.add_argument("--design", action="append", choices=list(DESIGNS.keys()), help="Only run these designs")
+    parser.add_argument("--simulator", action="append", choices=list(SIMULATORS.keys()), help="Only run these simulators")
+    parser.add_argument("--no-imports", action="store_true", help="Skip the import time measurements")
+    parser.add_argument("--out", help="Write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.quick, args.ticks, args.design, args.simulator, not args.no_imports)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
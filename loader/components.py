@@ -1,5 +1,7 @@
 
 class Component:
+    sequential = False  # Outputs depend on more than the current inputs
+
     def __init__(self, component):
         self.component = component
         self.ready = False
@@ -20,6 +22,10 @@ class Component:
     def calculate_outputs(self):
         raise NotImplementedError
 
+    def load_state(self):
+        """ Sequential components pick their internal state back up after their pin values were restored """
+        pass
+
     def __clone_outputs(self):
         return [
             (int(pin.vcc), pin)
@@ -124,7 +130,26 @@ class OR8(Component):
         self.outputs["OUT"].vcc = min(sum([pin.vcc for pin in self.inputs.values()]), 1)
 
 
+class VCC(Component):
+    def __init__(self, component):
+        super().__init__(component)
+
+    def calculate_outputs(self):
+        for pin in self.outputs.values():
+            pin.vcc = 1
+
+class GND(Component):
+    def __init__(self, component):
+        super().__init__(component)
+
+    def calculate_outputs(self):
+        for pin in self.outputs.values():
+            pin.vcc = 0
+
+
 class DFF(Component):
+    sequential = True
+
     def __init__(self, component):
         super().__init__(component)
 
@@ -161,5 +186,12 @@ class DFF(Component):
         # store clock for next edge detect
         self.prev_clk = clk
 
+    def load_state(self):
+        q = self.component.outputs.get("Q")
+        clk = self.component.inputs.get("CLK")
+
+        self.internal_state = 0 if q is None else int(q.vcc)
+        self.prev_clk = 0 if clk is None else int(clk.vcc)
+
 
 
@@ -0,0 +1,227 @@
+import argparse
+import base64
+import json
+import sys
+
+from . import hash_text
+
+
+"""
+Toggle Coverage
+
+Records which nets ever rose (0 -> 1) and fell (1 -> 0), as two bitsets with one bit per net.
+Nets are numbered across the whole hierarchy in iter_nets() order, the same numbering the
+background runner uses. Collection rides on the net_change hook of every level, so each change
+costs a shift, a mask and an or.
+
+Results from separate runs of the same design can be merged, in process (merge()), through
+files (save() / load()) or from sweep workers (see SweepRunner(coverage=True)). Merging checks
+that both sides have the same net names, so coverage of different designs (or an optimized
+netlist) can't be mixed up.
+
+    python -m loader.coverage run <schematic.bdf> <vectors>... [--out coverage.json]
+    python -m loader.coverage merge <out.json> <coverage.json>...
+    python -m loader.coverage report <coverage.json> [--limit N]
+"""
+
+COVERAGE_VERSION = 1
+
+
+class ToggleCoverage:
+    def __init__(self, names):
+        self.names = list(names)  # Hierarchical name of every net
+        self.rose = bytearray((len(self.names) + 7) // 8)
+        self.fell = bytearray((len(self.names) + 7) // 8)
+        self.runs = 0
+
+        self.subscriptions = []  # (simulator, hook, callback) while attached
+
+    @classmethod
+    def for_simulator(cls, simulator):
+        return cls(name for name, _, _ in simulator.iter_nets())
+
+    @property
+    def signature(self):
+        return hash_text("\n".join(self.names))
+
+    def attach(self, simulator, fresh=False):
+        """
+            Every attach counts as one run. simulator must be the design this was made for (see
+            for_simulator). Changes count from the values nets have now, a fresh (just built or
+            loaded) design only settles on its first tick, so with fresh=True recording starts after it
+        """
+        nets = sum(len(sim.nets) for sim in simulator.iter_simulators())
+        if nets != len(self.names):
+            raise ValueError(f"Design has {nets} nets, coverage was made for {len(self.names)}")
+
+        self.runs += 1
+
+        if not fresh:
+            self.__subscribe(simulator)
+            return
+
+        def settled(sim, events, wave_sizes):
+            sim.unsubscribe("tick_end", settled)
+            self.subscriptions.remove((sim, "tick_end", settled))
+            self.__subscribe(sim)
+
+        simulator.subscribe("tick_end", settled)
+        self.subscriptions.append((simulator, "tick_end", settled))
+
+    def __subscribe(self, simulator):
+        simulator.settle_memoized()  # Otherwise memoized levels catching up would count as toggles
+        offset = 0
+
+        for sim in simulator.iter_simulators():
+            callback = self.__make_callback(offset)
+            sim.subscribe("net_change", callback)
+            self.subscriptions.append((sim, "net_change", callback))
+            offset += len(sim.nets)
+
+    def __make_callback(self, offset):
+        rose, fell = self.rose, self.fell
+
+        def changed(simulator, net_id, vcc):
+            index = offset + net_id
+
+            if vcc > 0.5:
+                rose[index >> 3] |= 1 << (index & 7)
+            else:
+                fell[index >> 3] |= 1 << (index & 7)
+
+        return changed
+
+    def detach(self):
+        for sim, hook, callback in self.subscriptions:
+            sim.unsubscribe(hook, callback)
+
+        self.subscriptions = []
+
+    def merge_bits(self, rose, fell, runs=1):
+        """ Ors in raw bitsets, e.g. the ones sweep workers send back """
+        if len(rose) != len(self.rose) or len(fell) != len(self.fell):
+            raise ValueError("Bitsets are for a different number of nets")
+
+        for target, source in ((self.rose, rose), (self.fell, fell)):
+            merged = int.from_bytes(target, "little") | int.from_bytes(source, "little")
+            target[:] = merged.to_bytes(len(target), "little")
+
+        self.runs += runs
+
+    def merge(self, other):
+        if other.names != self.names:
+            raise ValueError("Coverage is for a different design")
+
+        self.merge_bits(other.rose, other.fell, other.runs)
+
+    @staticmethod
+    def get_bit(bits, index):
+        return (bits[index >> 3] >> (index & 7)) & 1
+
+    @staticmethod
+    def count(bits):
+        return bin(int.from_bytes(bits, "little")).count("1")
+
+    def get_uncovered(self):
+        """ [(name, rose, fell)] for every net that didn't toggle both ways """
+        uncovered = []
+
+        for index, name in enumerate(self.names):
+            rose, fell = self.get_bit(self.rose, index), self.get_bit(self.fell, index)
+
+            if not (rose and fell):
+                uncovered.append((name, bool(rose), bool(fell)))
+
+        return uncovered
+
+    def report(self, limit=None):
+        total = len(self.names)
+        uncovered = self.get_uncovered()
+        covered = total - len(uncovered)
+
+        lines = [
+            f"Toggle coverage: {covered}/{total} nets ({covered / total if total else 1:.1%}) over {self.runs} runs",
+            f"  rose: {self.count(self.rose)}/{total}, fell: {self.count(self.fell)}/{total}",
+        ]
+
+        for name, rose, fell in uncovered[:limit]:
+            missing = "never toggled" if not (rose or fell) else ("never rose" if not rose else "never fell")
+            lines.append(f"  {name}: {missing}")
+
+        if limit is not None and len(uncovered) > limit:
+            lines.append(f"  ... and {len(uncovered) - limit} more")
+
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "version": COVERAGE_VERSION,
+                "signature": self.signature,
+                "runs": self.runs,
+                "names": self.names,
+                "rose": base64.b64encode(bytes(self.rose)).decode("ascii"),
+                "fell": base64.b64encode(bytes(self.fell)).decode("ascii"),
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        if data["version"] != COVERAGE_VERSION:
+            raise ValueError(f"Unsupported coverage version: {data['version']}")
+
+        coverage = cls(data["names"])
+        coverage.merge_bits(base64.b64decode(data["rose"]), base64.b64decode(data["fell"]), data["runs"])
+        return coverage
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Toggle coverage of stimulus runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run stimulus files and report what they covered")
+    run_parser.add_argument("schematic")
+    run_parser.add_argument("vectors", nargs="+")
+    run_parser.add_argument("--out", help="Write the coverage out for merging later")
+    run_parser.add_argument("--limit", type=int, default=50, help="Uncovered nets to list")
+
+    merge_parser = commands.add_parser("merge", help="Merge coverage files of the same design")
+    merge_parser.add_argument("out")
+    merge_parser.add_argument("inputs", nargs="+")
+    merge_parser.add_argument("--limit", type=int, default=50, help="Uncovered nets to list")
+
+    report_parser = commands.add_parser("report", help="Report a coverage file")
+    report_parser.add_argument("coverage")
+    report_parser.add_argument("--limit", type=int, default=50, help="Uncovered nets to list")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        from .netlist import load_or_build
+        from .stimulus import StimulusRunner
+
+        simulator = load_or_build(args.schematic)
+        coverage = ToggleCoverage.for_simulator(simulator)
+
+        for i, vectors in enumerate(args.vectors):  # One design, so the runs just carry on from each other
+            coverage.attach(simulator, fresh=i == 0)
+            print(f"{vectors}: {StimulusRunner(simulator).run(vectors)}", file=sys.stderr)
+            coverage.detach()
+
+        if args.out:
+            coverage.save(args.out)
+
+    elif args.command == "merge":
+        coverage = ToggleCoverage.load(args.inputs[0])
+
+        for path in args.inputs[1:]:
+            coverage.merge(ToggleCoverage.load(path))
+
+        coverage.save(args.out)
+
+    else:
+        coverage = ToggleCoverage.load(args.coverage)
+
+    print(coverage.report(args.limit))
@@ -1,18 +1,26 @@
 import os.path
+import queue
 import random
+import threading
 import time
 
 import pygame
 import math
 
-import tkinter as tk
-from tkinter import simpledialog
-
+from .hud import PerformanceHUD
 from .simulator2 import Simulator
+from .spatial import GridIndex
+from .sprites import SpriteCache, quantize_zoom, surface_bytes
 
 DEFAULT_FONT_SIZE = 8
+TILE_SIZE = 512  # px
+TILE_CACHE_BYTES = 64 * 1024 * 1024
+LEVEL_CACHE_BYTES = 128 * 1024 * 1024
 
-pygame.init()
+# Level of detail tiers, see Render.get_lod()
+LOD_FULL = 0
+LOD_NO_TEXT = 1
+LOD_BOXES = 2
 
 
 HELP_TEXT = """
@@ -21,9 +29,11 @@ HELP_TEXT = """
     Close: escape
 
 > Simulation
-    Reload Files: ctrl + r
+    Reload Changed Files: ctrl + r
+    Reload Everything: ctrl + shift + r
     Force update: r
     Clear Cache(s): c
+    Performance HUD: h
 
 > Sub Simulations
     View Component: Left Click 
@@ -74,6 +84,129 @@ def draw_arc(surface, color, p1, p2, rect_data, width=2, steps=48):
 
     pygame.draw.lines(surface, color, False, points, width)
 
+
+def decimate_points(points):
+    """ Drops points in the middle of straight runs, the ends and every corner stay so the shape doesn't change """
+    kept = [points[0]]
+
+    for (x, y), (nx, ny) in zip(points[1:-1], points[2:]):
+        lx, ly = kept[-1]
+        dx1, dy1, dx2, dy2 = x - lx, y - ly, nx - x, ny - y
+
+        # Carries straight on when the cross product is 0 and it doesn't turn back on itself
+        if dx1 * dy2 - dy1 * dx2 != 0 or dx1 * dx2 + dy1 * dy2 < 0:
+            kept.append((x, y))
+
+    kept.append(points[-1])
+    return kept
+
+
+def segments_to_polylines(segments):
+    """ Greedily chains ((x1, y1), (x2, y2)) segments into as few point lists as it easily can """
+    neighbours = {}
+    for p1, p2 in segments:
+        neighbours.setdefault(p1, []).append(p2)
+        neighbours.setdefault(p2, []).append(p1)
+
+    used = set()
+    polylines = []
+
+    # Odd ends first, an open path has to start at one of them
+    starts = [p for p, others in neighbours.items() if len(others) % 2] + list(neighbours)
+
+    for start in starts:
+        while True:
+            point = start
+            line = [point]
+
+            while True:
+                for other in neighbours[point]:
+                    edge = (point, other) if point <= other else (other, point)
+
+                    if edge not in used:
+                        used.add(edge)
+                        line.append(other)
+                        point = other
+                        break
+
+                else:
+                    break
+
+            if len(line) < 2:
+                break
+
+            polylines.append(line)
+
+    return polylines
+
+
+class RasterWorker:
+    """ Re-rasterizes component surfaces for a new zoom level off the frame loop """
+
+    def __init__(self, render):
+        self.render = render
+        self.generation = 0
+
+        self.jobs = queue.SimpleQueue()
+        self.results = queue.SimpleQueue()
+
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def submit(self, components, symbol_keys, zoom, order):
+        """ Replaces any unfinished job, results come back in the given order """
+        self.generation += 1
+        self.jobs.put((self.generation, components, symbol_keys, zoom, order))
+
+    def cancel(self):
+        self.generation += 1
+
+    def __run(self):
+        while True:
+            generation, components, symbol_keys, zoom, order = self.jobs.get()
+
+            for i in order:
+                if generation != self.generation:
+                    break
+
+                surface = self.render.get_component_sprite(components[i], symbol_keys[i], zoom)
+                labels = self.render.generate_labels(components[i], zoom)
+
+                self.results.put((generation, i, zoom, surface, labels))
+
+
+class LevelView:
+    """ Everything __pregenerate builds for one schematic, plus where the camera was, so going back is instant """
+    ATTRIBUTES = (
+        "static_components", "static_labels", "static_zooms", "symbol_keys",
+        "indexed_components", "component_index", "junction_index",
+        "wire_polylines", "polyline_nets", "net_polylines", "wire_index", "wire_nets_source",
+        "zoom", "last_static_zoom",
+    )
+
+    def __init__(self, render):
+        self.state = {name: getattr(render, name) for name in self.ATTRIBUTES}
+        self.pan_offset = list(render.pan_offset)
+
+        surfaces = {id(surface): surface for surface in render.static_components}
+        for labels in render.static_labels:
+            for surface, _ in labels:
+                surfaces[id(surface)] = surface
+
+        # Sprites still in the shared sprite cache are charged there, only ones it already let go are ours
+        shared = render.sprite_cache.value_ids()
+        self.nbytes = sum(surface_bytes(surface) for surface_id, surface in surfaces.items() if surface_id not in shared)
+
+    def restore(self, render):
+        for name, value in self.state.items():
+            setattr(render, name, value)
+
+        render.pan_offset = list(self.pan_offset)
+
+        if set(render.static_zooms) != {render.last_static_zoom}:  # Left mid raster, pick it back up
+            render.last_static_zoom = None
+
+
 class Render:
     BACKGROUND_COLOUR = (10, 10, 10)
     COMPONENT_COLOUR = (230, 230, 230)
@@ -84,8 +217,23 @@ class Render:
     DEBUG_DARK_GREEN = (30, 100, 30)
     HELP_BACKGROUND = (40, 40, 40)
     HELP_TEXT_COLOUR = (255, 255, 255)
+    WIRE_LAYER_KEY = (255, 0, 255)  # Transparent colour of the cached wire layer
 
-    def __init__(self, schematic, simulator):
+    # Below these zoom levels text is skipped, then symbols become boxes and wires are thinned out
+    LOD_TEXT_ZOOM = 0.5
+    LOD_BOX_ZOOM = 0.3
+
+    LOADING_SCREEN_INTERVAL = 0.05  # s, the loading bar is only redrawn this often
+    FILE_POLL_INTERVAL = 1.0  # s, how often .bdf files are checked for changes
+
+    def __init__(self, schematic, simulator, runner=None, watch_files=False):
+        pygame.init()
+
+        self.runner = runner  # Optional SimulationRunner, the simulator is then only a mirror of it
+        self.last_loading_screen = 0
+
+        self.watch_files = watch_files  # Opt-in, polls the .bdf files every FILE_POLL_INTERVAL and reloads changed ones
+        self.last_file_poll = time.time()
         self.screen = pygame.display.set_mode((1920, 1080))
         self.clock = pygame.time.Clock()
 
@@ -93,7 +241,37 @@ class Render:
         self.simulators = [simulator]
 
         self.font_cache = {}
+        self.sprite_cache = SpriteCache()
+        self.tile_cache = SpriteCache(max_bytes=TILE_CACHE_BYTES)
+        self.level_cache = SpriteCache(max_bytes=LEVEL_CACHE_BYTES, sizeof=lambda view: view.nbytes)  # Schematic -> LevelView
         self.static_components = []
+        self.static_labels = []
+        self.static_zooms = []
+        self.symbol_keys = []
+
+        self.font_lock = threading.Lock()
+        self.scaled_cache = {}  # id(surface) -> (surface, zoom, scaled surface)
+        self.raster_worker = RasterWorker(self)
+        self.raster_pending = 0
+
+        self.indexed_components = None
+        self.component_index = GridIndex()
+        self.wire_index = GridIndex()
+        self.junction_index = GridIndex()
+
+        self.hit_index = GridIndex()
+        self.hit_index_source = None
+
+        self.wire_polylines = []  # World space point lists, each one belongs to a single net
+        self.polyline_nets = []  # Net id (or -1) of every polyline
+        self.net_polylines = {}  # Net id -> indexes into wire_polylines
+        self.wire_nets_source = None
+        self.tracked_simulator = None
+
+        self.wire_layer = None
+        self.wire_layer_view = None
+        self.visible_wires = set()
+
         self.__pregenerate()
 
         self.pin_settings_menu = None
@@ -117,32 +295,230 @@ class Render:
         self.help_overlay_active = False
         self.help_surface = self.create_help_menu()
 
+        self.hud_active = False  # H shows it
+        self.hud = PerformanceHUD(self.render_ui_text, self.COMPONENT_COLOUR)
+
     def create_help_menu(self):
         surface = pygame.Surface((self.screen.get_width() - 40, self.screen.get_height() - 40))
         surface.fill(self.HELP_BACKGROUND)
 
         y = 5
         for line in HELP_TEXT.splitlines():
-            surf = self.font.render(line, True, self.HELP_TEXT_COLOUR)
+            surf = self.render_ui_text(line, True, self.HELP_TEXT_COLOUR)
             surface.blit(surf, (5, y))
             y += surf.get_height() + 2
 
         return surface
 
 
-    def blit_scaled(self, surface, xy):
-        sx, sy = self.world_to_screen(*xy)
+    def get_scaled(self, surface, surface_zoom, zoom):
+        """ A surface rendered at surface_zoom resized for zoom, each surface is only scaled once per zoom """
+        if zoom == surface_zoom:
+            return surface
+
+        cached = self.scaled_cache.get(id(surface))
+
+        if cached is None or cached[1] != zoom:
+            tw = surface.get_width() * (zoom / surface_zoom)
+            th = surface.get_height() * (zoom / surface_zoom)
+
+            cached = (surface, zoom, pygame.transform.smoothscale(surface, (tw, th)))
+            self.scaled_cache[id(surface)] = cached
+
+        return cached[2]
+
+    def blit_scaled(self, surface, xy, surface_zoom):
+        self.screen.blit(self.get_scaled(surface, surface_zoom, self.zoom), self.world_to_screen(*xy))
+
+    def update_input_pin(self, component, vcc):
+        if self.runner is not None:
+            self.runner.update_input_pin(component, vcc)
+        else:
+            self.simulator.update_input_pin(component, vcc)
+
+    def update_pin_settings(self, component):
+        if self.runner is not None:
+            self.runner.update_pin_settings(component)
+
+    def full_rescan(self):
+        if self.runner is not None:
+            self.runner.full_rescan(self.simulator)
+        else:
+            self.simulator.full_rescan()
+
+    def reload_simulator(self):
+        if self.runner is not None:
+            self.runner.reload(self.simulator)
+        else:
+            self.simulator.reload()
+
+        self.__drop_orphaned_levels()
+
+    def reload_changed_files(self):
+        """ Only rebuilds the parts of the design whose files changed, returns the rebuilt simulators """
+        if self.runner is not None:
+            reloaded = self.runner.reload_changed()
+        else:
+            reloaded = self.simulators[0].reload_changed()
+
+        if reloaded:
+            self.__drop_orphaned_levels()
+
+        return reloaded
+
+    def __drop_orphaned_levels(self):
+        """ A rebuilt level makes new simulators for everything below it, stop viewing the old ones """
+        for i in range(1, len(self.simulators)):
+            parent = self.simulators[i - 1]
+
+            if not any(component.internal_component is self.simulators[i] for component in parent.components):
+                del self.schematics[i:]
+                del self.simulators[i:]
+                self.__enter_level()
+                return
+
+    def get_viewport(self):
+        """ World space box currently visible on screen """
+        x1, y1 = self.screen_to_world(0, 0)
+        x2, y2 = self.screen_to_world(self.screen.get_width(), self.screen.get_height())
+
+        return x1, y1, x2, y2
+
+    def update_wire_nets(self):
+        """ Chains the wire segments of every net into polylines once per simulator build, returns True if it had to """
+        simulator = self.simulator
+        source = (simulator, simulator.connection_nets, self.schematic.connections, len(simulator.connection_nets))
+        old = self.wire_nets_source
+
+        # Compared by identity, a rebuild produces equal but new arrays
+        if old is not None and old[0] is source[0] and old[1] is source[1] and old[2] is source[2] and old[3] == source[3]:
+            if self.tracked_simulator is simulator:
+                return False
+
+            self.track_simulator(simulator)  # Polylines came back from the level cache
+            return True
+
+        self.wire_nets_source = source
+        self.wire_polylines = []
+        self.polyline_nets = []
+        self.net_polylines = {}
+        self.wire_index = GridIndex()
+
+        connection_nets = simulator.connection_nets
+        net_segments = {}
+
+        for i, wire in enumerate(self.schematic.connections):
+            net_id = connection_nets[i] if i < len(connection_nets) else -1
+            net_segments.setdefault(net_id, []).append((tuple(wire[0]["data"]), tuple(wire[1]["data"])))
+
+        for net_id, segments in net_segments.items():
+            for line in segments_to_polylines(segments):
+                index = len(self.wire_polylines)
+                xs = [x for x, y in line]
+                ys = [y for x, y in line]
+
+                self.wire_polylines.append(line)
+                self.polyline_nets.append(net_id)
+                self.net_polylines.setdefault(net_id, []).append(index)
+                self.wire_index.insert(index, (min(xs) - 1, min(ys) - 1, max(xs) + 1, max(ys) + 1))
+
+        self.track_simulator(simulator)
+        return True
+
+    def track_simulator(self, simulator):
+        if self.tracked_simulator is not None and self.tracked_simulator is not simulator:
+            self.tracked_simulator.track_changes(False)
+
+        # Re-registers in case nets were added since the last time
+        self.tracked_simulator = simulator
+        simulator.track_changes(False)
+        simulator.track_changes()
+
+    def get_net_colour(self, net_id):
+        if net_id < 0:
+            return self.NO_CONNECTION_COLOUR
+
+        if self.simulator.get_net_vcc(net_id) > 0.5:
+            return self.ACTIVE_COLOUR
+
+        return self.UNACTIVE_COLOUR
+
+    def get_lod(self, zoom):
+        if zoom < self.LOD_BOX_ZOOM:
+            return LOD_BOXES
+
+        if zoom < self.LOD_TEXT_ZOOM:
+            return LOD_NO_TEXT
+
+        return LOD_FULL
+
+    def draw_polylines(self, surface, indexes):
+        """ One pygame.draw.lines call per polyline (they're disjoint, so can't share one), colours are looked up once per net """
+        colours = {}
+
+        zoom = self.zoom
+        ox, oy = self.pan_offset
+        width = max(1, int(zoom))
+        decimate = self.get_lod(zoom) == LOD_BOXES
+
+        for i in indexes:
+            net_id = self.polyline_nets[i]
+            colour = colours.get(net_id)
+
+            if colour is None:
+                colour = colours[net_id] = self.get_net_colour(net_id)
+
+            points = [(x * zoom + ox, y * zoom + oy) for x, y in self.wire_polylines[i]]
+
+            if decimate and len(points) > 2:
+                points = decimate_points(points)
+
+            pygame.draw.lines(surface, colour, False, points, width)
+
+    def draw_wires(self, viewport):
+        """ Wires live on a cached layer, only segments of nets that changed are redrawn unless the view moved """
+        rebuilt = self.update_wire_nets()
+        view = (tuple(self.pan_offset), self.zoom, self.screen.get_size())
+
+        if rebuilt or self.wire_layer is None or self.wire_layer_view != view:
+            if self.wire_layer is None or self.wire_layer.get_size() != self.screen.get_size():
+                self.wire_layer = pygame.Surface(self.screen.get_size())
+                self.wire_layer.set_colorkey(self.WIRE_LAYER_KEY)
+
+            self.wire_layer.fill(self.WIRE_LAYER_KEY)
+            self.wire_layer_view = view
+
+            visible = self.wire_index.query(*viewport)
+            self.visible_wires = set(visible)
+            self.simulator.pop_changed_nets()
 
-        if self.zoom == self.last_static_zoom:
-            self.screen.blit(surface, (sx, sy))
+            self.draw_polylines(self.wire_layer, visible)
 
         else:
-            tw = surface.get_width() * (self.zoom / self.last_static_zoom)
-            th = surface.get_height() * (self.zoom / self.last_static_zoom)
+            changed = []
+            for net_id in self.simulator.pop_changed_nets():
+                for i in self.net_polylines.get(net_id, ()):
+                    if i in self.visible_wires:
+                        changed.append(i)
 
-            scaled = pygame.transform.smoothscale(surface, (tw, th))
+            if changed:
+                self.draw_polylines(self.wire_layer, changed)
 
-            self.screen.blit(scaled, (sx, sy))
+        self.screen.blit(self.wire_layer, (0, 0))
+
+    def components_at(self, x, y):
+        """ Simulator components under a world space point, the index is rebuilt if the simulator rebuilt its components """
+        components = self.simulator.components
+
+        if self.hit_index_source is not components:
+            self.hit_index = GridIndex()
+            self.hit_index_source = components
+
+            for i, component in enumerate(components):
+                if component.rect is not None:
+                    self.hit_index.insert(i, component.rect)
+
+        return [components[i] for i in self.hit_index.query_point(x, y)]
 
     def screen_to_world(self, x, y):
         return (
@@ -166,34 +542,233 @@ class Render:
 
     def back_one_schematic(self):
         if len(self.schematics) > 1:
+            self.__leave_level()
             self.schematics.pop(-1)
             self.simulators.pop(-1)
-            self.__pregenerate()
+            self.__enter_level()
 
     def add_one_schematic(self, simulator):
+        self.__leave_level()
         self.schematics.append(simulator.schematic)
         self.simulators.append(simulator)
-        self.__pregenerate()
+        self.__enter_level()
+
+    def __leave_level(self):
+        self.raster_worker.cancel()
+        self.raster_pending = 0
+        self.level_cache.put(self.schematic, LevelView(self))
+
+    def __enter_level(self):
+        view = self.level_cache.pop(self.schematic)
+
+        if view is None:
+            self.__pregenerate()
+            return
+
+        view.restore(self)
+        self.scaled_cache = {}
+        self.tile_cache.clear()
+        self.wire_layer_view = None
 
     def __pregenerate(self):
         self.pan_offset = [0, 0]
         self.static_components = []
         self.zoom = 1
+        self.last_static_zoom = 1.0
+
+        self.raster_worker.cancel()
+        self.raster_pending = 0
+        self.scaled_cache = {}
+        self.tile_cache.clear()
 
-        self.display_loading_screen(0, None)
+        self.display_loading_screen(0, None, force=True)
         components = self.schematic.components
+        self.symbol_keys = [self.get_symbol_key(component) for component in components]
+        self.static_labels = []
 
         for i, component in enumerate(components):
-            comp = self.generate_component(component)
+            comp = self.get_component_sprite(component, self.symbol_keys[i], 1.0)
             self.static_components.append(comp)
+            self.static_labels.append(self.generate_labels(component, 1.0))
 
             self.display_loading_screen(i / len(components), comp)
 
+        self.static_zooms = [1.0] * len(self.static_components)
+
+        self.__build_spatial_index()
+
+    def __build_spatial_index(self):
+        """ Only depends on the schematic, so this is done once per (re)load. Wires are indexed by update_wire_nets """
+        self.indexed_components = self.schematic.components
+        self.component_index = GridIndex()
+        self.junction_index = GridIndex()
+
+        for i, component in enumerate(self.schematic.components):
+            self.component_index.insert(i, self.get_rect(component))
+
+        for i, junction in enumerate(self.schematic.junctions):
+            x, y = junction["data"]
+            self.junction_index.insert(i, (x - 3, y - 3, x + 3, y + 3))
+
     def __fast_generate(self):
+        if len(self.symbol_keys) != len(self.schematic.components):
+            self.symbol_keys = [self.get_symbol_key(component) for component in self.schematic.components]
+
+        self.raster_worker.cancel()
+        self.raster_pending = 0
+        self.tile_cache.clear()
+
+        zoom = quantize_zoom(self.zoom)
         self.static_components = [
-            self.generate_component(component, zoom=self.zoom)
+            self.get_component_sprite(component, self.symbol_keys[i], zoom)
+            for i, component in enumerate(self.schematic.components)
+        ]
+        self.static_labels = [
+            self.generate_labels(component, zoom)
             for component in self.schematic.components
         ]
+        self.static_zooms = [zoom] * len(self.static_components)
+
+    def start_rasterizing(self, zoom):
+        """ Hands the new zoom level to the raster worker, visible components first """
+        components = self.schematic.components
+        visible = self.component_index.query(*self.get_viewport())
+        visible_set = set(visible)
+
+        order = visible + [i for i in range(len(components)) if i not in visible_set]
+
+        self.raster_pending = len(order)
+        self.raster_worker.submit(components, self.symbol_keys, zoom, order)
+
+    def swap_in_rasters(self):
+        while True:
+            try:
+                generation, i, zoom, surface, labels = self.raster_worker.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if generation != self.raster_worker.generation:
+                continue  # Left over from a job that was replaced
+
+            self.static_components[i] = surface
+            self.static_labels[i] = labels
+            self.static_zooms[i] = zoom
+            self.raster_pending -= 1
+
+            if self.raster_pending == 0:
+                self.scaled_cache = {}  # Everything is on the new rung, copies scaled from the old one can go
+                self.tile_cache.clear()
+
+    def tiles_ready(self):
+        """ Tiles are only built once every surface has been rasterized at the current zoom """
+        return self.raster_pending == 0 and self.last_static_zoom == quantize_zoom(self.zoom)
+
+    def render_tile(self, zoom, tx, ty):
+        """ Component bodies, labels and junction dots for one TILE_SIZE square of the zoomed schematic """
+        tile = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        tile.fill(self.BACKGROUND_COLOUR)
+
+        ox, oy = tx * TILE_SIZE, ty * TILE_SIZE
+        world_box = (ox / zoom, oy / zoom, (ox + TILE_SIZE) / zoom, (oy + TILE_SIZE) / zoom)
+
+        components = self.schematic.components
+        for i in self.component_index.query(*world_box):
+            x, y = self.get_rect(components[i])[0:2]
+            surface_zoom = self.static_zooms[i]  # The zoom ladder rung, scaled the rest of the way here
+            tile.blit(self.get_scaled(self.static_components[i], surface_zoom, zoom), (x * zoom - ox, y * zoom - oy))
+
+            for label, (lx, ly) in self.static_labels[i]:
+                tile.blit(self.get_scaled(label, surface_zoom, zoom), ((x + lx) * zoom - ox, (y + ly) * zoom - oy))
+
+        junctions = self.schematic.junctions
+        for i in self.junction_index.query(*world_box) if self.get_lod(zoom) != LOD_BOXES else ():
+            x, y = junctions[i]["data"]
+            pygame.draw.circle(tile, self.COMPONENT_COLOUR, (x * zoom - ox, y * zoom - oy), max(1, int(3 * zoom)))
+
+        return tile
+
+    def draw_static_tiles(self):
+        zoom = self.zoom
+        px, py = self.pan_offset
+
+        tx1, ty1 = int(-px // TILE_SIZE), int(-py // TILE_SIZE)
+        tx2 = int((self.screen.get_width() - px) // TILE_SIZE)
+        ty2 = int((self.screen.get_height() - py) // TILE_SIZE)
+
+        for tx in range(tx1, tx2 + 1):
+            for ty in range(ty1, ty2 + 1):
+                tile = self.tile_cache.get((zoom, tx, ty), lambda: self.render_tile(zoom, tx, ty))
+                self.screen.blit(tile, (tx * TILE_SIZE + px, ty * TILE_SIZE + py))
+
+    def get_label_text(self, component):
+        """ The one bit of text that differs between instances of the same artwork (instance / pin name) """
+        if component["type"] == "pin":
+            texts = component["data"]["text"]
+            return texts[1] if len(texts) > 1 else None
+
+        texts = [
+            chunk[0]["data"] for chunk in component["data"]
+            if type(chunk[0]) is dict and chunk[0]["type"] == "text"
+        ]
+        return texts[1] if len(texts) > 1 else None
+
+    def get_symbol_key(self, component):
+        """ Everything generate_component draws, minus the position and the instance label """
+        label = self.get_label_text(component)
+
+        if component["type"] == "pin":
+            data = {key: value for key, value in component["data"].items() if key != "rect"}
+            data["text"] = [text for text in data["text"] if text is not label]
+            rect = component["data"]["rect"]
+
+        else:
+            data = [
+                chunk for chunk in component["data"][1:]
+                if not (type(chunk[0]) is dict and chunk[0]["data"] is label)
+            ]
+            rect = component["data"][0][0]["data"]
+
+        return component["type"], rect[2] - rect[0], rect[3] - rect[1], repr(data)
+
+    def get_component_sprite(self, component, symbol_key, zoom):
+        lod = self.get_lod(zoom)
+
+        if lod == LOD_BOXES:  # Only the outline is left, so anything the same size can share it
+            symbol_key = symbol_key[:3]
+
+        return self.sprite_cache.get(
+            (symbol_key, zoom, lod),
+            lambda: self.generate_component(component, zoom=zoom, labels=False)
+        )
+
+    def render_text(self, text_string, colour, font_name, font_size):
+        with self.font_lock:  # Font rendering isn't thread safe, the raster worker uses this too
+            if (str(font_name), font_size) not in self.font_cache:
+                self.font_cache[(str(font_name), font_size)] = pygame.sysfont.SysFont(font_name, font_size)
+
+            loaded_font = self.font_cache[(str(font_name), font_size)]
+            return loaded_font.render(text_string, True, colour)
+
+    def render_ui_text(self, text_string, antialias, colour):
+        with self.font_lock:
+            return self.font.render(text_string, antialias, colour)
+
+    def generate_labels(self, component, zoom):
+        """ [(surface, world offset from the component's corner)], the surfaces are shared through the sprite cache """
+        data = self.get_label_text(component)
+
+        if data is None or "invisible" in data or self.get_lod(zoom) != LOD_FULL:
+            return []
+
+        x, y, tw, th = data["rect"]
+        font_size = int(data["font"].get("size", DEFAULT_FONT_SIZE) * zoom)
+
+        surface = self.sprite_cache.get(
+            ("text", str(data["text"]), str(data["font"]["name"]), font_size),
+            lambda: self.render_text(data["text"], self.COMPONENT_COLOUR, data["font"]["name"], font_size)
+        )
+
+        return [(surface, (x, y))]
 
     def get_rect(self, component):
         if component["type"] == "pin":
@@ -204,8 +779,9 @@ class Render:
 
         raise NotImplementedError(f"Unknown component type, cant get rect: {component['type']}")
 
-    def generate_component(self, component, zoom=1.0):
+    def generate_component(self, component, zoom=1.0, labels=True):
         flags = []
+        label = None if labels else self.get_label_text(component)
         width = max(1, int(zoom))
 
         if component["type"] == "pin":
@@ -228,11 +804,16 @@ class Render:
             raise NotImplementedError(f"Unknown component type: {component['type']}")
 
         size = ((rect[2] - rect[0]) * zoom, (rect[3] - rect[1]) * zoom)
+        lod = self.get_lod(zoom)
 
 
         surface = pygame.Surface(size)
         surface.fill(self.BACKGROUND_COLOUR)
 
+        if lod == LOD_BOXES:
+            pygame.draw.rect(surface, self.COMPONENT_COLOUR, surface.get_rect(), width=1)
+            return surface
+
         for raw in drawing_data:
             if not raw:
                 continue
@@ -263,7 +844,8 @@ class Render:
                     p1,
                     p2,
                     rect_data,
-                    width=width
+                    width=width,
+                    steps=max(8, int(48 * min(1.0, zoom)))
                 )
 
             elif task["type"] == "circle":
@@ -291,13 +873,10 @@ class Render:
 
 
         def draw_text(text_string, tx, ty, colour, font_name, font_size):
-            if (str(font_name), font_size) not in self.font_cache:
-                self.font_cache[(str(font_name), font_size)] = pygame.sysfont.SysFont(font_name, font_size)
+            if lod != LOD_FULL:
+                return
 
-            loaded_font = self.font_cache[(str(font_name), font_size)]
-            text_surf = loaded_font.render(text_string, True, colour)
-
-            surface.blit(text_surf, (tx, ty))
+            surface.blit(self.render_text(text_string, colour, font_name, font_size), (tx, ty))
 
 
         # See if we have some extra rendering to do
@@ -345,7 +924,7 @@ class Render:
                         data = chunk[0]["data"]
                         x, y, tw, th = data["rect"]
 
-                        if "invisible" in data:
+                        if "invisible" in data or data is label:
                             continue
 
                         draw_text(
@@ -360,7 +939,7 @@ class Render:
             for data in component["data"]["text"]:
                 x, y, tw, th = data["rect"]
 
-                if "invisible" in data:
+                if "invisible" in data or data is label:
                     continue
 
                 draw_text(
@@ -375,9 +954,20 @@ class Render:
         return surface
 
 
-    def display_loading_screen(self, percent_completed: float, preview):
+    def display_loading_screen(self, percent_completed: float, preview, force=False):
+        """ Cheap to call per item, it does nothing until LOADING_SCREEN_INTERVAL has passed since the last draw """
+        now = time.perf_counter()
+
+        if not force and now - self.last_loading_screen < self.LOADING_SCREEN_INTERVAL:
+            return
+
+        self.last_loading_screen = now
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if self.runner is not None:
+                    self.runner.stop()
+
                 pygame.quit()
                 exit()
 
@@ -403,7 +993,6 @@ class Render:
             self.screen.blit(preview, ((self.screen.get_width() - preview.get_width()) // 2, (self.screen.get_height() // 2) + 25))
 
         pygame.display.flip()
-        self.clock.tick(120)
 
     def generate_pin_settings_menu(self, component):
         surface = pygame.Surface((400, self.screen.get_height()))
@@ -413,17 +1002,17 @@ class Render:
         pin_comp = component.outputs[pin_name]
         config = pin_comp.settings
 
-        surf = self.font.render("Toggle", True, (255, 255, 255))
+        surf = self.render_ui_text("Toggle", True, (255, 255, 255))
         toggle_button = pygame.Surface((surf.get_width() + 4, surf.get_height() + 4))
         toggle_button.fill((25, 25, 25))
         toggle_button.blit(surf, (2, 2))
 
-        surf = self.font.render("Set", True, (255, 255, 255))
+        surf = self.render_ui_text("Set", True, (255, 255, 255))
         set_button = pygame.Surface((surf.get_width() + 4, surf.get_height() + 4))
         set_button.fill((25, 25, 25))
         set_button.blit(surf, (2, 2))
 
-        surf = self.font.render("Close", True, (255, 255, 255))
+        surf = self.render_ui_text("Close", True, (255, 255, 255))
         close_button = pygame.Surface((surf.get_width() + 4, surf.get_height() + 4))
         close_button.fill((25, 25, 25))
         close_button.blit(surf, (2, 2))
@@ -441,6 +1030,7 @@ class Render:
 
         def toggle_pin_mode():
             config["is_toggle"] = not config["is_toggle"]
+            self.update_pin_settings(component)
             close_menu()
             self.pin_settings_menu = self.generate_pin_settings_menu(component)
 
@@ -452,12 +1042,16 @@ class Render:
             else:
                 self.simulator.clocks.remove((component, pin_comp))
 
+            self.update_pin_settings(component)
             close_menu()
             self.pin_settings_menu = self.generate_pin_settings_menu(component)
 
         def set_clock_speed():
             close_menu()
 
+            import tkinter as tk  # Only needed for this dialog
+            from tkinter import simpledialog
+
             root = tk.Tk()
             root.withdraw()  # hide the main Tk window
 
@@ -471,17 +1065,18 @@ class Render:
 
             if value is not None:
                 config["clock_speed_hz"] = value
+                self.update_pin_settings(component)
 
             close_menu()
             self.pin_settings_menu = self.generate_pin_settings_menu(component)
 
-        surf = self.font.render(f"Settings Menu", True, (255, 255, 255))
+        surf = self.render_ui_text(f"Settings Menu", True, (255, 255, 255))
         surface.blit(surf, (5, 5))
 
-        surf = self.font.render(f"{component} ({component.component_name})", True, (255, 255, 255))
+        surf = self.render_ui_text(f"{component} ({component.component_name})", True, (255, 255, 255))
         surface.blit(surf, (5, 30))
 
-        surf = self.font.render(f"Mode: {'Toggle' if config['is_toggle'] else 'Hold'}", True, (255, 255, 255))
+        surf = self.render_ui_text(f"Mode: {'Toggle' if config['is_toggle'] else 'Hold'}", True, (255, 255, 255))
         surface.blit(surf, (5, 70))
         surface.blit(toggle_button, (surface.get_width() - (toggle_button.get_width() + 5), 68))
 
@@ -491,7 +1086,7 @@ class Render:
             toggle_pin_mode
         ))
 
-        surf = self.font.render(f"Is Clock: {config['is_clock']}", True, (255, 255, 255))
+        surf = self.render_ui_text(f"Is Clock: {config['is_clock']}", True, (255, 255, 255))
         surface.blit(surf, (5, 95))
         surface.blit(toggle_button, (surface.get_width() - (toggle_button.get_width() + 5), 93))
 
@@ -501,7 +1096,7 @@ class Render:
             toggle_is_clock
         ))
 
-        surf = self.font.render(f"Clock Speed: {config['clock_speed_hz']}hz", True, (255, 255, 255))
+        surf = self.render_ui_text(f"Clock Speed: {config['clock_speed_hz']}hz", True, (255, 255, 255))
         surface.blit(surf, (5, 120))
         surface.blit(set_button, (surface.get_width() - (set_button.get_width() + 5), 118))
 
@@ -525,10 +1120,21 @@ class Render:
             simulator.clear_cache()
 
         self.font_cache = {}
+        self.sprite_cache.clear()
+        self.tile_cache.clear()
+        self.level_cache.clear()
 
     def update(self):
+        frame_start = time.perf_counter()
+
+        if self.runner is not None:
+            self.runner.sync()
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if self.runner is not None:
+                    self.runner.stop()
+
                 pygame.quit()
                 exit()
 
@@ -544,14 +1150,19 @@ class Render:
                         self.back_one_schematic()
 
                 if event.key == pygame.K_r:
-                    if event.mod & pygame.KMOD_CTRL:
-                        self.simulator.reload()
+                    if event.mod & pygame.KMOD_CTRL and event.mod & pygame.KMOD_SHIFT:
+                        self.reload_simulator()
+                    elif event.mod & pygame.KMOD_CTRL:
+                        self.reload_changed_files()
                     else:
-                        self.simulator.full_rescan()
+                        self.full_rescan()
 
                 if event.key == pygame.K_c:
                     self.clear_cache()
 
+                if event.key == pygame.K_h:
+                    self.hud_active = not self.hud_active
+
             if event.type == pygame.MOUSEMOTION:
                 if event.buttons[0]:
                     self.pan_offset[0] += event.rel[0]
@@ -568,21 +1179,15 @@ class Render:
                 y = (event.pos[1] - self.pan_offset[1]) / self.zoom
 
                 if event.button == 1 and not self.mouse_dragging:
-                    for component in self.simulator.components:
-                        rect = component.rect
-
-                        if (rect[0] < x < rect[2]) and (rect[1] < y < rect[3]):
-                            if component.component_name != "pin.generic":
-                                if isinstance(component.internal_component, Simulator):
-                                    self.add_one_schematic(component.internal_component)
+                    for component in self.components_at(x, y):
+                        if component.component_name != "pin.generic":
+                            if isinstance(component.internal_component, Simulator):
+                                self.add_one_schematic(component.internal_component)
 
 
                 if event.button == 1:
-                    for component in self.simulator.components:
-                        rect = component.rect
-
-                        if (rect[0] < x < rect[2]) and (rect[1] < y < rect[3]):
-                            self.simulator.update_input_pin(component, 0)
+                    for component in self.components_at(x, y):
+                        self.update_input_pin(component, 0)
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 x = (event.pos[0] - self.pan_offset[0]) / self.zoom
@@ -600,22 +1205,16 @@ class Render:
                                 break
 
 
-                    for component in self.simulator.components:
-                        rect = component.rect
-
-                        if (rect[0] < x < rect[2]) and (rect[1] < y < rect[3]):
-                            self.simulator.update_input_pin(component, 1)
+                    for component in self.components_at(x, y):
+                        self.update_input_pin(component, 1)
 
                 if event.button == 3:
-                    for component in self.simulator.components:
+                    for component in self.components_at(x, y):
                         if not (component.component_name == "pin.generic" and component.is_input):
                             continue
 
-                        rect = component.rect
-
-                        if (rect[0] < x < rect[2]) and (rect[1] < y < rect[3]):
-                            self.pin_settings_menu = self.generate_pin_settings_menu(component)
-                            self.pin_settings_ref = component
+                        self.pin_settings_menu = self.generate_pin_settings_menu(component)
+                        self.pin_settings_ref = component
 
             if event.type == pygame.MOUSEWHEEL:
                 old_zoom = self.zoom
@@ -635,50 +1234,53 @@ class Render:
 
                 self.last_zoom_time = time.time()
 
+        if self.watch_files and time.time() - self.last_file_poll >= self.FILE_POLL_INTERVAL:
+            self.last_file_poll = time.time()
+            self.reload_changed_files()
+
         self.screen.fill(self.BACKGROUND_COLOUR)
 
-        if self.last_static_zoom != self.zoom and self.last_zoom_time + self.zoom_wait_time <= time.time():
+        if self.indexed_components is not self.schematic.components:  # Schematic was reloaded
+            self.symbol_keys = []
             self.__fast_generate()
-            self.last_static_zoom = self.zoom
+            self.last_static_zoom = quantize_zoom(self.zoom)
+            self.__build_spatial_index()
 
-        for i, component in enumerate(self.schematic.components):
-            rect = self.get_rect(component)
-            surface = self.static_components[i]
-
-            x, y = rect[0:2]
-            self.blit_scaled(surface, (x, y))
+        if self.last_static_zoom != quantize_zoom(self.zoom) and self.last_zoom_time + self.zoom_wait_time <= time.time():
+            self.last_static_zoom = quantize_zoom(self.zoom)
+            self.start_rasterizing(self.last_static_zoom)
 
-        for junction in self.schematic.junctions:
-            x, y = junction["data"]
-            pygame.draw.circle(
-                self.screen,
-                self.COMPONENT_COLOUR,
-                self.world_to_screen(x, y),
-                max(1, int(3 * self.zoom))
-            )
+        self.swap_in_rasters()
 
-        for wire in self.schematic.connections:
-            x1, y1 = wire[0]["data"]
-            x2, y2 = wire[1]["data"]
+        viewport = self.get_viewport()
+        components = self.schematic.components
 
+        if self.tiles_ready():
+            self.draw_static_tiles()
 
+        else:  # Mid zoom, draw (and scale) the components directly until the new surfaces are in
+            for i in self.component_index.query(*viewport):
+                rect = self.get_rect(components[i])
+                surface = self.static_components[i]
+                surface_zoom = self.static_zooms[i]
 
-            vcc = self.simulator.get_wire_vcc((x1, y1))
+                x, y = rect[0:2]
+                self.blit_scaled(surface, (x, y), surface_zoom)
 
-            colour = self.UNACTIVE_COLOUR
-            if vcc is None:
-                colour = self.NO_CONNECTION_COLOUR
+                for label, (lx, ly) in self.static_labels[i]:
+                    self.blit_scaled(label, (x + lx, y + ly), surface_zoom)
 
-            elif vcc > 0.5:
-                colour = self.ACTIVE_COLOUR
+            junctions = self.schematic.junctions
+            for i in self.junction_index.query(*viewport) if self.get_lod(self.zoom) != LOD_BOXES else ():
+                x, y = junctions[i]["data"]
+                pygame.draw.circle(
+                    self.screen,
+                    self.COMPONENT_COLOUR,
+                    self.world_to_screen(x, y),
+                    max(1, int(3 * self.zoom))
+                )
 
-            pygame.draw.line(
-                self.screen,
-                colour,
-                self.world_to_screen(x1, y1),
-                self.world_to_screen(x2, y2),
-                max(1, int(self.zoom))
-            )
+        self.draw_wires(viewport)
 
         if self.pin_settings_menu:
             self.screen.blit(self.pin_settings_menu, (self.screen.get_width() - self.pin_settings_menu.get_width(), 0))
@@ -690,17 +1292,22 @@ class Render:
         debug_text = (
             f"Path: {os.path.basename(self.schematic.path)}",
             f"FPS: {fps}{' ' * (len(str(self.target_fps)) - len(fps))} Target: {self.target_fps}",
-            f"Simulation: {self.simulator.status}",
+            f"Simulation: {self.simulator.status if self.runner is None else self.runner.status}",
             "For Help Press: p"
         )
         y = 5
         for line in debug_text:
-            surf = self.font.render(line, True, self.COMPONENT_COLOUR)
+            surf = self.render_ui_text(line, True, self.COMPONENT_COLOUR)
             self.screen.blit(surf, (5, y))
             y += surf.get_height() + 2
 
+        if self.hud_active:
+            self.hud.sample(self.simulators[0], running_in_background=self.runner is not None)
+            self.hud.draw(self.screen, (5, y + 4))
+
         if self.help_overlay_active:
             self.screen.blit(self.help_surface, (20, 20))
 
         pygame.display.flip()
+        self.hud.add_render_time(time.perf_counter() - frame_start)
         self.clock.tick(self.target_fps)
@@ -0,0 +1,135 @@
+import os
+import time
+from collections import deque
+
+import pygame
+
+
+"""
+Performance HUD
+
+Simulation throughput for the renderer overlay. Stats are sampled from simulator2 every
+SAMPLE_INTERVAL and drawn into a small surface, so the HUD costs one blit per frame:
+
+    ticks/s     root simulator ticks per second, with a rolling graph
+    events      evaluations per tick, summed over every level
+    deltas      waves of evaluations the last root tick took to settle
+    queue       largest wave of the last root tick, and the high-water mark
+    sim/render  share of the sample spent simulating vs drawing (lockstep only)
+    memory      resident set size
+
+In background mode (runner.py) only ticks and events come back from the worker.
+"""
+
+SAMPLE_INTERVAL = 0.25  # s
+HISTORY = 120  # samples in the graph
+GRAPH_SIZE = (180, 40)  # px
+
+
+def get_memory_bytes():
+    """ Resident memory of this process, None if it can't be found out """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+
+    except ImportError:  # Windows
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak rather than current
+    return rss if os.uname().sysname == "Darwin" else rss * 1024
+
+
+class PerformanceHUD:
+    def __init__(self, render_text, colour=(255, 255, 255), graph_colour=(0, 200, 80)):
+        self.render_text = render_text  # (text, antialias, colour) -> surface
+        self.colour = colour
+        self.graph_colour = graph_colour
+
+        self.history = deque(maxlen=HISTORY)  # ticks per second
+        self.lines = []
+        self.surface = None
+
+        self.last_sample = None  # (time, tick, events, simulate seconds, render seconds)
+        self.last_simulator = None
+        self.render_seconds = 0.0
+
+    def add_render_time(self, seconds):
+        self.render_seconds += seconds
+
+    def sample(self, simulator, running_in_background=False):
+        """ Call once per frame, only does any work every SAMPLE_INTERVAL """
+        now = time.perf_counter()
+
+        if self.last_sample is not None and now - self.last_sample[0] < SAMPLE_INTERVAL:
+            return
+
+        events = sum(sim.event_count for sim in simulator.iter_simulators())
+        current = (now, simulator.simulation_tick, events, simulator.simulate_seconds, self.render_seconds)
+
+        if self.last_sample is None or simulator is not self.last_simulator:
+            self.last_sample = current
+            self.last_simulator = simulator
+            return
+
+        elapsed, ticks, events, simulating, rendering = (b - a for a, b in zip(self.last_sample, current))
+        self.last_sample = current
+
+        if ticks < 0 or events < 0:  # Reloaded or the runner restarted, counting starts over from here
+            return
+
+        rate = ticks / elapsed if elapsed > 0 else 0
+        self.history.append(rate)
+
+        self.lines = [
+            f"Ticks/s: {rate:,.0f}",
+            f"Events/tick: {events / ticks:.1f}" if ticks > 0 else "Events/tick: -",
+        ]
+
+        if not running_in_background:
+            self.lines += [
+                f"Deltas/tick: {simulator.tick_deltas}",
+                f"Queue: {simulator.tick_queue_peak} (high-water {simulator.queue_high_water})",
+                f"Sim {simulating / elapsed:.0%} / Render {rendering / elapsed:.0%}",
+            ]
+
+        memory = get_memory_bytes()
+        if memory is not None:
+            self.lines.append(f"Memory: {memory / 1024 / 1024:.1f}MiB")
+
+        self.surface = self.__draw()
+
+    def __draw(self):
+        texts = [self.render_text(line, True, self.colour) for line in self.lines]
+        width = max([GRAPH_SIZE[0]] + [text.get_width() for text in texts])
+        height = sum(text.get_height() + 2 for text in texts) + GRAPH_SIZE[1] + 4
+
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+
+        y = 0
+        for text in texts:
+            surface.blit(text, (0, y))
+            y += text.get_height() + 2
+
+        graph_width, graph_height = GRAPH_SIZE
+        pygame.draw.rect(surface, self.colour, (0, y + 2, graph_width, graph_height), 1)
+
+        if len(self.history) > 1:
+            top = max(self.history) or 1
+            step = graph_width / (HISTORY - 1)
+            points = [
+                (i * step, y + 2 + graph_height - 1 - (rate / top) * (graph_height - 2))
+                for i, rate in enumerate(self.history)
+            ]
+            pygame.draw.lines(surface, self.graph_colour, False, points)
+
+        return surface
+
+    def draw(self, screen, xy):
+        if self.surface is not None:
+            screen.blit(self.surface, xy)
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+
+
+"""
+Memoized Sub Schematics
+
+Output values of purely combinational sub schematics, keyed by their input vector (one bit per
+input pin, in the sub schematic's own pin order). Every instance of the same design shares one
+table, looked up by the simulator's structural fingerprint, so a decoder used 64 times only has
+to be simulated once per distinct input pattern.
+
+Narrow designs get a full truth table (one list slot per input vector), anything wider an LRU
+capped at LRU_ENTRIES vectors.
+"""
+
+TRUTH_TABLE_BITS = 12
+LRU_ENTRIES = 4096
+
+tables = {}  # fingerprint -> table
+
+
+class TruthTable:
+    def __init__(self, width):
+        self.values = [None] * (1 << width)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(1 for value in self.values if value is not None)
+
+    def get(self, key):
+        value = self.values[key]
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def put(self, key, value):
+        self.values[key] = value
+
+
+class LRUTable:
+    def __init__(self, max_entries=LRU_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def get_table(fingerprint, width):
+    table = tables.get(fingerprint)
+
+    if table is None:
+        table = TruthTable(width) if width <= TRUTH_TABLE_BITS else LRUTable()
+        tables[fingerprint] = table
+
+    return table
+
+
+def drop_table(fingerprint):
+    tables.pop(fingerprint, None)
+
+
+def clear():
+    tables.clear()
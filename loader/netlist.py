@@ -0,0 +1,251 @@
+import os
+import pickle
+import time
+
+from . import Schematic, components, hash_text
+from .simulator2 import Simulator, SimulatorComponent, SimulatorWire, ComponentPin
+
+
+"""
+Compiled Netlists
+
+A built simulator2.Simulator flattened down to plain tuples / lists. This is everything the
+simulation needs (components, pins, connections) without the parsed schematic layout, so it
+pickles small and can be rebuilt without re-tracing any wires.
+
+load_or_build() keeps compiled netlists on disk in a .netlist_cache directory next to the
+design. A cached netlist is only used while every .bdf it was built from still has the same
+hash, and no symbol that was a primitive at build time has since gained a .bdf of its own.
+"""
+
+NETLIST_VERSION = 3
+
+CACHE_DIRECTORY = ".netlist_cache"
+CACHE_SUFFIX = ".netlist"
+
+
+def compile_netlist(simulator):
+    """ Simulator must already be built """
+    index = {id(component): i for i, component in enumerate(simulator.components)}
+    pin_owners = {}
+
+    entries = []
+    connections = []
+
+    for i, component in enumerate(simulator.components):
+        sub_netlist = None
+        if component.has_sub_schematic:
+            sub_netlist = compile_netlist(component.internal_component)
+
+        entries.append((
+            component.component_name,
+            component.instance_name,
+            component.is_input,
+            tuple(component.rect) if component.rect else None,
+            tuple((pin_name, pin.xy, pin.net_id) for pin_name, pin in component.inputs.items()),
+            tuple((pin_name, pin.xy, pin.net_id) for pin_name, pin in component.outputs.items()),
+            sub_netlist
+        ))
+
+        for is_input, pins in ((True, component.inputs), (False, component.outputs)):
+            for pin_name, pin in pins.items():
+                pin_owners[id(pin)] = (i, is_input, pin_name)
+
+                for other, _, other_pin in pin.connections:
+                    connections.append((i, is_input, pin_name, index[id(other)], other_pin))
+
+    wires = tuple(
+        (xy, *pin_owners[id(pin)])
+        for xy, pin in simulator.wire_vcc_lookup.items()
+    )
+
+    nets = tuple(
+        (index[id(component)], pin_name)
+        for component, pin_name in simulator.nets
+    )
+
+    return {
+        "version": NETLIST_VERSION,
+        "path": simulator.schematic.path if simulator.schematic else None,
+        "components": tuple(entries),
+        "connections": tuple(connections),
+        "nets": nets,
+        "wires": wires,
+        "connection_nets": simulator.connection_nets.tobytes(),
+    }
+
+
+def load_netlist(netlist, is_root=True):
+    """ Rebuilds a ready to run Simulator from a compiled netlist, without a schematic """
+    if netlist["version"] != NETLIST_VERSION:
+        raise ValueError(f"Unsupported netlist version: {netlist['version']}")
+
+    start = time.time()
+    simulator = Simulator(None, is_root=is_root)
+
+    for comp_name, instance_name, is_input, rect, inputs, outputs, sub_netlist in netlist["components"]:
+        comp = SimulatorComponent(None)
+        comp.component_name = comp_name
+        comp.instance_name = instance_name
+        comp.is_input = is_input
+        comp.rect = rect
+
+        for pins, pin_entries in ((comp.inputs, inputs), (comp.outputs, outputs)):
+            for pin_name, xy, net_id in pin_entries:
+                pin = ComponentPin(xy)
+                pin.net_id = net_id
+                pins[pin_name] = pin
+
+        if sub_netlist is not None:
+            comp.internal_component = load_netlist(sub_netlist, is_root=False)
+            comp.has_sub_schematic = True
+
+        elif hasattr(components, comp_name):
+            comp.internal_component = getattr(components, comp_name)(comp)
+
+        simulator.add_component(comp)
+
+    for comp_id, is_input, pin_name, other_id, other_pin in netlist["connections"]:
+        component1 = simulator.components[comp_id]
+        component2 = simulator.components[other_id]
+
+        pins = component1.inputs if is_input else component1.outputs
+        pins[pin_name].connections.append((component2, pin_name, other_pin))
+        simulator.wires.append(SimulatorWire(component1, pin_name, component2, other_pin))
+
+    for comp_id, pin_name in netlist["nets"]:
+        simulator.nets.append((simulator.components[comp_id], pin_name))
+
+    for xy, comp_id, is_input, pin_name in netlist["wires"]:
+        component = simulator.components[comp_id]
+        pins = component.inputs if is_input else component.outputs
+        simulator.wire_vcc_lookup[xy] = pins[pin_name]
+
+    simulator.connection_nets.frombytes(netlist["connection_nets"])
+
+    # Same start-up as Simulator.update() does after a build
+    simulator.update_simulation()
+    simulator.full_rescan()
+    simulator.built = True
+
+    end = time.time()
+    simulator.status = f"On (loaded netlist in {round((end - start) * 1000)}ms)"
+
+    return simulator
+
+
+def dumps_netlist(netlist):
+    return pickle.dumps(netlist, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads_netlist(data):
+    return pickle.loads(data)
+
+
+def get_netlist_sources(netlist, sources=None, missing=None):
+    """ Hashes every file the netlist was built from, plus the .bdf files that did not exist for its primitives """
+    if sources is None:
+        sources, missing = {}, set()
+
+    path = netlist["path"]
+    if path is not None and path not in sources:
+        with open(path, "r") as f:
+            sources[path] = hash_text(f.read())
+
+    directory = os.path.dirname(path) if path is not None else ""
+
+    for comp_name, instance_name, is_input, rect, inputs, outputs, sub_netlist in netlist["components"]:
+        if sub_netlist is not None:
+            get_netlist_sources(sub_netlist, sources, missing)
+
+        elif comp_name != "pin.generic":
+            missing.add(os.path.join(directory, f"{comp_name}.bdf"))
+
+    return sources, missing
+
+
+def get_cache_path(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIRECTORY, name + CACHE_SUFFIX)
+
+
+def save_cached_netlist(simulator, cache_path=None):
+    """ Simulator must already be built from a schematic """
+    netlist = compile_netlist(simulator)
+    sources, missing = get_netlist_sources(netlist)
+    cache_path = cache_path or get_cache_path(simulator.schematic.path)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+    data = dumps_netlist({
+        "version": NETLIST_VERSION,
+        "sources": sources,
+        "missing": sorted(missing),
+        "netlist": netlist,
+    })
+
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"  # Never leave a half written cache behind
+    with open(temp_path, "wb") as f:
+        f.write(data)
+
+    os.replace(temp_path, cache_path)
+
+
+def load_cached_netlist(path, cache_path=None):
+    """ The cached netlist for a design, None if there isn't one or it is out of date """
+    cache_path = cache_path or get_cache_path(path)
+
+    try:
+        with open(cache_path, "rb") as f:
+            cached = loads_netlist(f.read())
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+    if not isinstance(cached, dict) or cached.get("version") != NETLIST_VERSION:
+        return None
+
+    for source_path, source_hash in cached["sources"].items():
+        try:
+            with open(source_path, "r") as f:
+                if hash_text(f.read()) != source_hash:
+                    return None
+        except OSError:
+            return None
+
+    for missing_path in cached["missing"]:
+        if os.path.exists(missing_path):
+            return None
+
+    return cached["netlist"]
+
+
+def attach_schematic(simulator, schematic):
+    """ Gives a simulator loaded from a netlist its parsed layout back, so it can be drawn and reloaded """
+    simulator.schematic = schematic
+
+    for component, layout in zip(simulator.components, schematic.components):
+        component.component = layout
+
+        if component.has_sub_schematic:
+            attach_schematic(component.internal_component, layout["sub_schematic"])
+
+
+def load_or_build(path, schematic=None):
+    """
+        Simulator for a design, straight from the netlist cache when it is still valid. Pass an already parsed
+        schematic to get a simulator the renderer can use, headless callers can leave it out and skip parsing
+    """
+    netlist = load_cached_netlist(path)
+
+    if netlist is not None:
+        simulator = load_netlist(netlist)
+
+        if schematic is not None:
+            attach_schematic(simulator, schematic)
+
+        return simulator
+
+    simulator = Simulator(schematic or Schematic(path), auto_gen=True)
+    save_cached_netlist(simulator)
+
+    return simulator
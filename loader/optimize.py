@@ -0,0 +1,378 @@
+import fnmatch
+
+
+"""
+Netlist Optimization
+
+Rewrites a compiled netlist (see netlist.py) into a smaller one that simulates the same outputs
+with fewer events per tick. Every level of the hierarchy is optimized on its own, sub schematic
+instances, pins, flip flops and anything unknown are left alone. The passes run until nothing
+changes:
+
+    constants    gates fed by VCC / GND / unconnected inputs fold into constants, a gate left
+                 with a single live input becomes a wire (AND, OR) or a NOT (NAND)
+    NOT-NOT      consumers of a double inversion read the original net
+    NAND fusion  an AND2 / AND3 only read by a NOT becomes a single NAND2 / NAND3
+    hashing      identical gates on the same inputs are merged into one
+    dead logic   anything that can't reach an output pin or a sub schematic is dropped
+
+Nets matching one of the probe patterns (hierarchical names / fnmatch patterns, as used by
+vcd.select_nets) keep their driver so they can still be watched, every other net may be merged
+away. The optimized netlist has no wire geometry, it is meant for headless runs (sweeps,
+benchmarks, stimulus files) rather than the renderer. Its "net_map" maps every original net id
+of the level to the new id carrying the same value (-1 if it was dropped).
+"""
+
+MAX_PASSES = 16
+
+AND_GATES = {"AND2", "AND3", "AND4"}
+NAND_GATES = {"NAND2", "NAND3"}
+OR_GATES = {"OR2", "OR3", "OR4", "OR6", "OR8"}
+CONSTANT_GATES = {"VCC": 1, "GND": 0}
+COMBINATIONAL = AND_GATES | NAND_GATES | OR_GATES | {"NOT"} | set(CONSTANT_GATES)
+
+NAND_FOR_AND = {"AND2": "NAND2", "AND3": "NAND3"}  # There is no NAND4
+
+
+class Gate:
+    __slots__ = ("name", "instance", "is_input", "rect", "inputs", "outputs", "sub_netlist", "xys")
+
+    def __init__(self, entry):
+        self.name, self.instance, self.is_input, self.rect, inputs, outputs, self.sub_netlist = entry
+
+        self.inputs = {pin_name: net_id for pin_name, xy, net_id in inputs}
+        self.outputs = {pin_name: net_id for pin_name, xy, net_id in outputs}
+        self.xys = {pin_name: xy for pin_name, xy, net_id in inputs + outputs}
+
+    @property
+    def combinational(self):
+        return self.sub_netlist is None and self.name in COMBINATIONAL
+
+    @property
+    def output(self):
+        return self.outputs.get("OUT")
+
+    def rewire(self, name, input_nets, xys):
+        """ Turns the gate into another kind, input pins are numbered like the rest of the library """
+        pin_names = ["IN"] if name == "NOT" else [f"IN{i + 1}" for i in range(len(input_nets))]
+
+        self.name = name
+        self.inputs = dict(zip(pin_names, input_nets))
+        self.xys = {**dict(zip(pin_names, xys)), "OUT": self.xys.get("OUT")}
+
+
+class LevelOptimizer:
+    def __init__(self, netlist, probes=None, prefix=""):
+        self.netlist = netlist
+        self.probes = probes or []
+        self.prefix = prefix
+
+        self.gates = [Gate(entry) for entry in netlist["components"]]
+        self.net_count = len(netlist["nets"])
+
+        self.alias = {}  # net id -> net id carrying the same value
+        self.constants = {}  # net id -> 0 / 1
+        self.protected = set()
+
+        self.drivers = {}  # net id -> gate
+        for gate in self.gates:
+            for net_id in gate.outputs.values():
+                if net_id is not None:
+                    self.drivers.setdefault(net_id, gate)
+
+        for net_id, (comp_index, pin_name) in enumerate(netlist["nets"]):
+            gate = self.gates[comp_index]
+            name = pin_name if gate.name == "pin.generic" else f"{gate.instance}.{pin_name}"
+
+            if any(fnmatch.fnmatchcase(prefix + name, pattern) for pattern in self.probes):
+                self.protected.add(net_id)
+
+    def resolve(self, net_id):
+        while net_id in self.alias:
+            net_id = self.alias[net_id]
+
+        return net_id
+
+    def value(self, net_id):
+        """ 0 / 1 for constant nets (unconnected inputs read 0), None otherwise """
+        if net_id is None:
+            return 0
+
+        return self.constants.get(self.resolve(net_id))
+
+    def set_alias(self, net_id, target):
+        target = self.resolve(target)
+
+        if net_id is None or net_id in self.alias or net_id == target:
+            return False
+
+        self.alias[net_id] = target
+        return True
+
+    def set_constant(self, net_id, value):
+        if net_id is None or self.value(net_id) is not None:
+            return False
+
+        self.constants[self.resolve(net_id)] = value
+        return True
+
+    def live_inputs(self, gate):
+        return [self.resolve(net_id) for net_id in gate.inputs.values()]
+
+    def fold_constants(self):
+        changed = False
+
+        for gate in self.gates:
+            if not gate.combinational or gate.output is None:
+                continue
+
+            if gate.name in CONSTANT_GATES:
+                changed |= self.set_constant(gate.output, CONSTANT_GATES[gate.name])
+                continue
+
+            values = [self.value(net_id) for net_id in gate.inputs.values()]
+
+            if gate.name == "NOT":
+                if values[0] is not None:
+                    changed |= self.set_constant(gate.output, 1 - values[0])
+                continue
+
+            # AND / NAND are decided by a 0, OR by a 1, inputs at the other value drop out
+            decisive = 1 if gate.name in OR_GATES else 0
+            inverted = gate.name in NAND_GATES
+
+            live = []
+            for net_id, value in zip(gate.inputs.values(), values):
+                net_id = self.resolve(net_id) if net_id is not None else None
+
+                if value is None and net_id not in live:
+                    live.append(net_id)
+
+            if decisive in values:
+                changed |= self.set_constant(gate.output, 1 - decisive if inverted else decisive)
+
+            elif not live:
+                changed |= self.set_constant(gate.output, decisive if inverted else 1 - decisive)
+
+            elif len(live) == 1 and not inverted:
+                changed |= self.set_alias(gate.output, live[0])
+
+            elif len(live) == 1:
+                gate.rewire("NOT", live, [next(iter(gate.xys.values()))])
+                changed = True
+
+        return changed
+
+    def remove_double_inversions(self):
+        changed = False
+
+        for gate in self.gates:
+            if gate.name != "NOT" or not gate.combinational or gate.output is None or gate.inputs["IN"] is None:
+                continue
+
+            first = self.drivers.get(self.resolve(gate.inputs["IN"]))
+
+            if first is not None and first.name == "NOT" and first.combinational and first.inputs["IN"] is not None:
+                changed |= self.set_alias(gate.output, first.inputs["IN"])
+
+        return changed
+
+    def count_readers(self):
+        readers = {}
+
+        for gate in self.gates:
+            for net_id in gate.inputs.values():
+                if net_id is not None:
+                    net_id = self.resolve(net_id)
+                    readers[net_id] = readers.get(net_id, 0) + 1
+
+        return readers
+
+    def fuse_nands(self):
+        changed = False
+        readers = self.count_readers()
+
+        for gate in self.gates:
+            if gate.name != "NOT" or not gate.combinational or gate.inputs["IN"] is None:
+                continue
+
+            net_id = self.resolve(gate.inputs["IN"])
+            first = self.drivers.get(net_id)
+
+            if first is None or first.name not in NAND_FOR_AND or first.sub_netlist is not None:
+                continue
+
+            if net_id in self.protected or readers.get(net_id) != 1 or first.output != net_id:
+                continue
+
+            pins = list(first.inputs)
+            gate.rewire(NAND_FOR_AND[first.name], [first.inputs[pin] for pin in pins], [first.xys[pin] for pin in pins])
+            readers[net_id] = 0
+            changed = True
+
+        return changed
+
+    def merge_duplicates(self):
+        changed = False
+        seen = {}
+
+        for gate in self.gates:
+            if not gate.combinational or gate.output is None or gate.name in CONSTANT_GATES:
+                continue
+
+            inputs = self.live_inputs(gate)
+            if gate.name != "NOT":  # Every other gate is commutative
+                inputs.sort(key=lambda net_id: -1 if net_id is None else net_id)
+
+            key = (gate.name, tuple(inputs))
+            first = seen.setdefault(key, gate)
+
+            if first is not gate:
+                changed |= self.set_alias(gate.output, first.output)
+
+        return changed
+
+    def run(self):
+        passes = 0
+
+        while passes < MAX_PASSES:
+            passes += 1
+            changed = self.fold_constants()
+            changed |= self.remove_double_inversions()
+            changed |= self.fuse_nands()
+            changed |= self.merge_duplicates()
+
+            if not changed:
+                break
+
+        return passes
+
+    def emit_net(self, net_id, constant_nets):
+        """ Where a consumer of net_id reads from after optimization """
+        if net_id is None:
+            return None
+
+        value = self.value(net_id)
+        if value is None:
+            return self.resolve(net_id)
+
+        if value not in constant_nets:
+            constant_nets[value] = self.net_count + len(constant_nets)
+
+        return constant_nets[value]
+
+    def find_live(self, constant_nets):
+        """ Marks everything an output pin, sub schematic or probed net depends on """
+        stack = [gate for gate in self.gates if gate.name == "pin.generic" or gate.sub_netlist is not None]
+        stack.extend(self.drivers[net_id] for net_id in self.protected if net_id in self.drivers)
+        stack.extend(gate for gate in self.gates if gate.sub_netlist is None and not gate.combinational and gate.name != "DFF")
+
+        live = set()
+        while stack:
+            gate = stack.pop()
+
+            if id(gate) in live:
+                continue
+
+            live.add(id(gate))
+
+            for net_id in gate.inputs.values():
+                net_id = self.emit_net(net_id, constant_nets)
+
+                if net_id is not None and net_id in self.drivers:
+                    stack.append(self.drivers[net_id])
+
+        return live
+
+    def emit(self, sub_netlists):
+        constant_nets = {}
+        live = self.find_live(constant_nets)
+        kept = [gate for gate in self.gates if id(gate) in live]
+
+        for value, net_id in sorted(constant_nets.items(), reverse=True):
+            gate = Gate(("VCC" if value else "GND", f"opt_{'vcc' if value else 'gnd'}", False, None, (), (("OUT", None, net_id),), None))
+            kept.append(gate)
+
+        # Only nets something still touches survive, renumbered in their original order
+        entries = []
+        for gate in kept:
+            inputs = [(pin_name, self.emit_net(net_id, constant_nets)) for pin_name, net_id in gate.inputs.items()]
+            outputs = [(pin_name, net_id) for pin_name, net_id in gate.outputs.items()]
+            entries.append((gate, inputs, outputs))
+
+        used = sorted({net_id for _, inputs, outputs in entries for _, net_id in inputs + outputs if net_id is not None})
+        renumber = {net_id: i for i, net_id in enumerate(used)}
+
+        components = []
+        driver_pins = {}
+        reader_pins = {}
+
+        for comp_index, (gate, inputs, outputs) in enumerate(entries):
+            for pin_name, net_id in outputs:
+                if net_id is not None:
+                    driver_pins.setdefault(renumber[net_id], []).append((comp_index, pin_name))
+
+            for pin_name, net_id in inputs:
+                if net_id is not None:
+                    reader_pins.setdefault(renumber[net_id], []).append((comp_index, pin_name))
+
+            components.append((
+                gate.name,
+                gate.instance,
+                gate.is_input,
+                gate.rect,
+                tuple((pin_name, gate.xys.get(pin_name), renumber.get(net_id)) for pin_name, net_id in inputs),
+                tuple((pin_name, gate.xys.get(pin_name), renumber.get(net_id)) for pin_name, net_id in outputs),
+                sub_netlists.get(id(gate))
+            ))
+
+        connections = []
+        nets = []
+
+        for net_id in range(len(used)):
+            readers = reader_pins.get(net_id, [])
+            drivers = driver_pins.get(net_id, [])
+            nets.append((drivers or readers)[0])
+
+            for driver_index, driver_pin in drivers:  # Undriven nets have nothing to connect, they read 0 either way
+                for comp_index, pin_name in readers:
+                    connections.append((driver_index, False, driver_pin, comp_index, pin_name))
+                    connections.append((comp_index, True, pin_name, driver_index, driver_pin))
+
+        net_map = []
+        for net_id in range(self.net_count):
+            target = self.emit_net(net_id, constant_nets) if net_id not in self.protected else net_id
+            net_map.append(renumber.get(target, -1))
+
+        return {
+            "version": self.netlist["version"],
+            "path": self.netlist["path"],
+            "components": tuple(components),
+            "connections": tuple(connections),
+            "nets": tuple(nets),
+            "wires": (),
+            "connection_nets": b"",
+            "net_map": tuple(net_map),
+        }
+
+
+def optimize_netlist(netlist, probes=None, prefix=""):
+    """ Returns an optimized copy of a compiled netlist, the original is left untouched """
+    optimizer = LevelOptimizer(netlist, probes, prefix)
+    optimizer.run()
+
+    sub_netlists = {
+        id(gate): optimize_netlist(gate.sub_netlist, probes, f"{prefix}{gate.instance}/")
+        for gate in optimizer.gates
+        if gate.sub_netlist is not None
+    }
+
+    return optimizer.emit(sub_netlists)
+
+
+def count_components(netlist):
+    """ Components across the whole hierarchy, sub schematic instances included """
+    return sum(
+        1 + (count_components(entry[6]) if entry[6] is not None else 0)
+        for entry in netlist["components"]
+    )
@@ -0,0 +1,251 @@
+import argparse
+import json
+import sys
+import time
+
+
+"""
+Simulation Profiling
+
+Counts evaluations, output toggles and wall time for every component that simulator2 runs,
+plus toggles for every net. Profiling is opt-in: attach() subscribes to the component_eval hook
+of a design and all of its sub schematics, nothing is compiled into the event loop otherwise.
+Profiled levels are always simulated for real, memoization skips them.
+
+    profiler = Profiler()
+    profiler.attach(simulator)
+    ...  # run the simulation
+    print(profiler.report())
+    profiler.save("profile.json")
+
+Time for a sub schematic instance includes everything simulated inside it, so in the type
+totals a schematic's time overlaps with the primitives it contains.
+
+EventStats uses the same hooks to collect distributions of event fan-out (evaluations each
+evaluation scheduled), queue depth (evaluations per delta wave), deltas and events per tick.
+
+    python -m loader.profiler <schematic.bdf> <vectors.csv|vectors.jsonl> [--json out.json]
+"""
+
+DEFAULT_TOP = 20
+
+
+class Profiler:
+    def __init__(self):
+        self.components = {}  # id(component) -> [evaluations, toggles, seconds, outputs after the last evaluation]
+        self.nets = {}  # (id(simulator), net_id) -> toggles
+
+        self.names = {}  # id(component) -> (hierarchical path, type), filled in by attach()
+        self.simulators = {}  # id(simulator) -> (simulator, prefix)
+
+        self.root = None
+        self.start_tick = 0
+        self.start_time = 0
+
+    def attach(self, simulator, prefix=""):
+        if self.root is None:
+            self.root = simulator
+            self.start_tick = simulator.simulation_tick
+            self.start_time = time.perf_counter()
+
+        simulator.subscribe("component_eval", self.record)
+        self.simulators[id(simulator)] = (simulator, prefix)
+
+        for component in simulator.components:
+            self.names[id(component)] = (prefix + component.instance_name, component.component_name)
+
+            if component.has_sub_schematic:
+                self.attach(component.internal_component, f"{prefix}{component.instance_name}/")
+
+    def detach(self):
+        for simulator, _ in self.simulators.values():
+            simulator.unsubscribe("component_eval", self.record)
+
+    def record(self, simulator, component, seconds, fanout):
+        stats = self.components.get(id(component))
+        after = [pin.vcc for pin in component.outputs.values()]
+
+        if stats is None:
+            stats = self.components[id(component)] = [0, 0, 0.0, after]
+
+        stats[0] += 1
+        stats[2] += seconds
+
+        # Against the previous evaluation rather than just this one, input pins are set from outside the loop
+        for vcc, previous, pin in zip(after, stats[3], component.outputs.values()):
+            if vcc != previous:
+                stats[1] += 1
+
+                if pin.net_id is not None:
+                    key = (id(simulator), pin.net_id)
+                    self.nets[key] = self.nets.get(key, 0) + 1
+
+        stats[3] = after
+
+    def get_results(self, top=None):
+        """ Everything sorted hottest first, top limits the instance and net lists """
+        types = {}
+        instances = []
+
+        for component_id, (evaluations, toggles, seconds, _) in self.components.items():
+            path, type_name = self.names.get(component_id, ("?", "?"))
+            instances.append({"path": path, "type": type_name, "evaluations": evaluations, "toggles": toggles, "seconds": seconds})
+
+            totals = types.setdefault(type_name, {"type": type_name, "instances": 0, "evaluations": 0, "toggles": 0, "seconds": 0.0})
+            totals["instances"] += 1
+            totals["evaluations"] += evaluations
+            totals["toggles"] += toggles
+            totals["seconds"] += seconds
+
+        nets = []
+        for (simulator_id, net_id), toggles in self.nets.items():
+            simulator, prefix = self.simulators[simulator_id]
+            nets.append({"net": prefix + simulator.get_net_name(net_id), "toggles": toggles})
+
+        instances.sort(key=lambda entry: (entry["seconds"], entry["evaluations"]), reverse=True)
+        nets.sort(key=lambda entry: entry["toggles"], reverse=True)
+
+        return {
+            "ticks": self.root.simulation_tick - self.start_tick if self.root is not None else 0,
+            "wall_s": time.perf_counter() - self.start_time if self.root is not None else 0,
+            "evaluations": sum(stats[0] for stats in self.components.values()),
+            "types": sorted(types.values(), key=lambda entry: (entry["seconds"], entry["evaluations"]), reverse=True),
+            "instances": instances[:top] if top else instances,
+            "nets": nets[:top] if top else nets,
+        }
+
+    def report(self, top=DEFAULT_TOP):
+        results = self.get_results(top)
+        lines = [
+            f"{results['ticks']} ticks, {results['evaluations']} evaluations in {results['wall_s'] * 1000:.1f}ms",
+            "",
+            f"{'type':<24} {'instances':>9} {'evals':>10} {'toggles':>10} {'ms':>10} {'us/eval':>8}",
+        ]
+
+        for entry in results["types"]:
+            lines.append(
+                f"{entry['type']:<24} {entry['instances']:>9} {entry['evaluations']:>10} {entry['toggles']:>10} "
+                f"{entry['seconds'] * 1000:>10.2f} {entry['seconds'] * 1e6 / max(1, entry['evaluations']):>8.2f}"
+            )
+
+        lines += ["", f"{'instance':<40} {'type':<12} {'evals':>10} {'toggles':>10} {'ms':>10}"]
+        for entry in results["instances"]:
+            lines.append(
+                f"{entry['path']:<40} {entry['type']:<12} {entry['evaluations']:>10} {entry['toggles']:>10} {entry['seconds'] * 1000:>10.2f}"
+            )
+
+        lines += ["", f"{'net':<40} {'toggles':>10}"]
+        for entry in results["nets"]:
+            lines.append(f"{entry['net']:<40} {entry['toggles']:>10}")
+
+        return "\n".join(lines)
+
+    def save(self, path, top=None):
+        with open(path, "w") as f:
+            json.dump(self.get_results(top), f, indent=2)
+
+
+class EventStats:
+    def __init__(self):
+        self.fanout = {}  # Evaluations scheduled -> times seen
+        self.queue_depth = {}  # Evaluations in a delta wave -> times seen
+        self.deltas = {}  # Delta waves in a tick -> times seen
+        self.events = {}  # Evaluations in a tick -> times seen
+
+        self.simulators = []
+
+    def attach(self, simulator):
+        for sim in simulator.iter_simulators():
+            sim.subscribe("component_eval", self.record_eval)
+            sim.subscribe("tick_end", self.record_tick)
+            self.simulators.append(sim)
+
+    def detach(self):
+        for sim in self.simulators:
+            sim.unsubscribe("component_eval", self.record_eval)
+            sim.unsubscribe("tick_end", self.record_tick)
+
+        self.simulators = []
+
+    def record_eval(self, simulator, component, seconds, fanout):
+        self.fanout[fanout] = self.fanout.get(fanout, 0) + 1
+
+    def record_tick(self, simulator, events, wave_sizes):
+        for size in wave_sizes:
+            self.queue_depth[size] = self.queue_depth.get(size, 0) + 1
+
+        self.deltas[len(wave_sizes)] = self.deltas.get(len(wave_sizes), 0) + 1
+        self.events[events] = self.events.get(events, 0) + 1
+
+    @staticmethod
+    def summarize(histogram):
+        """ count, mean, p50, p90, p99 and max of a value -> times seen histogram """
+        count = sum(histogram.values())
+
+        if count == 0:
+            return {"count": 0, "mean": 0, "p50": 0, "p90": 0, "p99": 0, "max": 0}
+
+        summary = {"count": count, "mean": sum(value * seen for value, seen in histogram.items()) / count}
+        percentiles = [("p50", 0.5), ("p90", 0.9), ("p99", 0.99)]
+        total = 0
+
+        for value in sorted(histogram):
+            total += histogram[value]
+
+            while percentiles and total >= percentiles[0][1] * count:
+                summary[percentiles.pop(0)[0]] = value
+
+        summary["max"] = max(histogram)
+        return summary
+
+    def get_results(self):
+        return {
+            name: {"summary": self.summarize(histogram), "histogram": sorted(histogram.items())}
+            for name, histogram in (
+                ("fanout", self.fanout),
+                ("queue_depth", self.queue_depth),
+                ("deltas", self.deltas),
+                ("events", self.events),
+            )
+        }
+
+    def report(self):
+        lines = [f"{'':<12} {'count':>10} {'mean':>8} {'p50':>6} {'p90':>6} {'p99':>6} {'max':>6}"]
+
+        for name, results in self.get_results().items():
+            summary = results["summary"]
+            lines.append(
+                f"{name:<12} {summary['count']:>10} {summary['mean']:>8.2f} {summary['p50']:>6} "
+                f"{summary['p90']:>6} {summary['p99']:>6} {summary['max']:>6}"
+            )
+
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from .netlist import load_or_build
+    from .stimulus import StimulusRunner
+
+    parser = argparse.ArgumentParser(description="Run a stimulus file with profiling and print the hotspots")
+    parser.add_argument("schematic")
+    parser.add_argument("vectors")
+    parser.add_argument("--json", help="Also write the full results out as JSON")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Instances and nets to list")
+    args = parser.parse_args()
+
+    simulator = load_or_build(args.schematic)
+    profiler = Profiler()
+    profiler.attach(simulator)
+    event_stats = EventStats()
+    event_stats.attach(simulator)
+
+    stimulus_result = StimulusRunner(simulator).run(args.vectors)
+
+    print(stimulus_result, file=sys.stderr)
+    print(profiler.report(args.top))
+    print()
+    print(event_stats.report())
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**profiler.get_results(), "event_stats": event_stats.get_results()}, f, indent=2)
@@ -0,0 +1,425 @@
+import multiprocessing
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from .netlist import compile_netlist, load_netlist, dumps_netlist, loads_netlist
+
+
+"""
+Background Simulation
+
+Runs simulator2 at full speed in its own thread or process, away from the frame loop. The
+worker simulates a copy of the design loaded from a compiled netlist and publishes the value of
+every net into a shared buffer (one byte per net, numbered across all sub-simulators in
+iter_simulators() order). The renderer keeps the simulator it was given as a mirror, sync()
+copies the buffer into the mirror's driver pins once per frame. Memoized sub schematics are
+still skipped in the worker, they catch up every SETTLE_EVERY so their nets lag by at most that.
+
+Input events go the other way over a single producer / single consumer ring buffer, so
+neither side ever takes a lock:
+
+    ring     head (u32), tail (u32), then fixed size slots: op, simulator index,
+             component index, value
+    state    tick (u64), events across every level (u64), ticks per second (f64), then one
+             byte per net
+
+Components are addressed by (simulator index, component index), which is the same in the
+mirror and in the worker because both are walked in the same order. That is also how a new
+worker picks up where the last one stopped: start() hands it every pin value of the mirror
+(get_pin_state) and the worker restores them before its first tick, so restarts after an
+incremental reload only reset the levels that were rebuilt.
+"""
+
+OP_PRESS = 1
+OP_SET_TOGGLE = 2
+OP_SET_CLOCK = 3
+OP_CLOCK_SPEED = 4
+OP_RESCAN = 5
+OP_STOP = 6
+
+RING_SLOTS = 1024
+RING_HEADER = struct.Struct("<II")
+RING_EVENT = struct.Struct("<BxxxIIf")
+RING_SLOTS_OFFSET = 64  # Keep the slots off the header's cache line
+
+STATE_HEADER = struct.Struct("<QQd")
+
+IDLE_SLEEP = 0.001  # s, when nothing is dirty and nothing is clocked
+SETTLE_EVERY = 1 / 60  # s, how often memoized levels catch up so their nets can be published
+STATS_EVERY = 0.25  # s
+
+
+class EventRing:
+    """ Lock free as long as there is exactly one producer and one consumer """
+    def __init__(self, buffer, slots=RING_SLOTS):
+        self.buffer = buffer
+        self.slots = slots
+
+    @staticmethod
+    def size(slots=RING_SLOTS):
+        return RING_SLOTS_OFFSET + slots * RING_EVENT.size
+
+    def push(self, op, sim_index=0, comp_index=0, value=0.0):
+        """ Returns False if the consumer has fallen a whole ring behind """
+        head, tail = RING_HEADER.unpack_from(self.buffer, 0)
+
+        if (head + 1) % self.slots == tail:
+            return False
+
+        RING_EVENT.pack_into(self.buffer, RING_SLOTS_OFFSET + head * RING_EVENT.size, op, sim_index, comp_index, value)
+        struct.pack_into("<I", self.buffer, 0, (head + 1) % self.slots)  # Publish after the slot is written
+        return True
+
+    def pop_all(self):
+        head, tail = RING_HEADER.unpack_from(self.buffer, 0)
+
+        while tail != head:
+            yield RING_EVENT.unpack_from(self.buffer, RING_SLOTS_OFFSET + tail * RING_EVENT.size)
+            tail = (tail + 1) % self.slots
+            struct.pack_into("<I", self.buffer, 4, tail)
+
+
+def get_net_offsets(simulators):
+    """ Index of the first net of every simulator in the shared buffer, plus the total """
+    offsets = []
+    total = 0
+
+    for simulator in simulators:
+        offsets.append(total)
+        total += len(simulator.nets)
+
+    return offsets, total
+
+
+def get_pin_state(simulators):
+    """ Every pin value of every component, as ((input values, output values), ...) per simulator """
+    return tuple(
+        tuple(
+            (tuple(pin.vcc for pin in component.inputs.values()), tuple(pin.vcc for pin in component.outputs.values()))
+            for component in simulator.components
+        )
+        for simulator in simulators
+    )
+
+
+def set_pin_state(simulators, pin_state):
+    """ Puts get_pin_state() values back on a copy of the same design, everything is re-evaluated on the next tick """
+    for simulator, component_states in zip(simulators, pin_state):
+        for component, (inputs, outputs) in zip(simulator.components, component_states):
+            for pin, vcc in zip(component.inputs.values(), inputs):
+                pin.vcc = vcc
+
+            for pin, vcc in zip(component.outputs.values(), outputs):
+                pin.vcc = vcc
+
+            if component.internal_component is not None and not component.has_sub_schematic:
+                component.internal_component.load_state()
+
+        simulator.full_rescan()
+
+
+def apply_event(simulators, op, sim_index, comp_index, value):
+    simulator = simulators[sim_index]
+
+    if op == OP_RESCAN:
+        simulator.full_rescan()
+        return
+
+    component = simulator.components[comp_index]
+    pin_comp = next(iter(component.outputs.values()))
+
+    if op == OP_PRESS:
+        simulator.update_input_pin(component, value)
+
+    elif op == OP_SET_TOGGLE:
+        pin_comp.settings["is_toggle"] = bool(value)
+
+    elif op == OP_SET_CLOCK:
+        pin_comp.settings["is_clock"] = bool(value)
+        clock = (component, pin_comp)
+
+        if pin_comp.settings["is_clock"] and clock not in simulator.clocks:
+            simulator.clocks.append(clock)
+
+        elif not pin_comp.settings["is_clock"] and clock in simulator.clocks:
+            simulator.clocks.remove(clock)
+
+    elif op == OP_CLOCK_SPEED:
+        pin_comp.settings["clock_speed_hz"] = int(value)
+
+
+def simulate(netlist, state, ring_buffer, stopped=None, pin_state=None):
+    """ Worker loop, shared by both run modes. Runs until OP_STOP (or stopped is set) """
+    simulator = load_netlist(netlist)
+    simulators = list(simulator.iter_simulators())
+    offsets, _ = get_net_offsets(simulators)
+    ring = EventRing(ring_buffer)
+
+    if pin_state is not None:
+        set_pin_state(simulators, pin_state)
+
+    # Tracking doesn't stop levels being memoized, settle_memoized() brings them up to date for the mirror
+    for sim in simulators:
+        sim.track_changes(memoizable=True)
+
+    simulator.settle_memoized()
+
+    for sim_index, sim in enumerate(simulators):
+        sim.pop_changed_nets()
+
+        for net_id in range(len(sim.nets)):
+            state[STATE_HEADER.size + offsets[sim_index] + net_id] = sim.get_net_vcc(net_id) > 0.5
+
+    last_stats = time.time()
+    last_settle = last_stats
+    last_tick = 0
+
+    while stopped is None or not stopped.is_set():
+        busy = False
+
+        for op, sim_index, comp_index, value in ring.pop_all():
+            if op == OP_STOP:
+                return
+
+            apply_event(simulators, op, sim_index, comp_index, value)
+            busy = True
+
+        events = simulator.event_count
+        simulator.update_simulation()
+        busy = busy or simulator.event_count != events
+
+        now = time.time()
+        if now - last_settle >= SETTLE_EVERY:
+            simulator.settle_memoized()
+            last_settle = now
+
+        for sim_index, sim in enumerate(simulators):
+            if sim.changed_nets:
+                offset = STATE_HEADER.size + offsets[sim_index]
+
+                for net_id in sim.pop_changed_nets():
+                    state[offset + net_id] = sim.get_net_vcc(net_id) > 0.5
+
+        if now - last_stats >= STATS_EVERY:
+            rate = (simulator.simulation_tick - last_tick) / (now - last_stats)
+            events = sum(sim.event_count for sim in simulators)  # Sub schematics count their own
+            STATE_HEADER.pack_into(state, 0, simulator.simulation_tick, events, rate)
+
+            last_stats = now
+            last_tick = simulator.simulation_tick
+
+        if not busy and not simulator.dirty_components and not any(sim.clocks for sim in simulators):
+            time.sleep(IDLE_SLEEP)
+
+
+def _run_process(netlist_data, state_name, ring_name, pin_state=None):
+    state = shared_memory.SharedMemory(name=state_name)
+    ring = shared_memory.SharedMemory(name=ring_name)
+
+    try:
+        simulate(loads_netlist(netlist_data), state.buf, ring.buf, pin_state=pin_state)
+    finally:
+        state.close()
+        ring.close()
+
+
+class SimulationRunner:
+    def __init__(self, simulator, mode="thread"):
+        """ simulator must already be built, it becomes the mirror the renderer reads from """
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown run mode: {mode}")
+
+        self.simulator = simulator
+        self.mode = mode
+
+        self.simulators = []
+        self.offsets = []
+        self.component_lookup = {}  # id(component) -> (simulator index, component index)
+
+        self.state = None
+        self.ring = None
+        self.seen = None
+        self.shared = []
+        self.worker = None
+        self.stopped = None
+
+    @property
+    def running(self):
+        return self.worker is not None
+
+    def start(self):
+        if self.running:
+            return
+
+        self.simulators = list(self.simulator.iter_simulators())
+        self.offsets, net_count = get_net_offsets(self.simulators)
+
+        self.component_lookup = {}
+        for sim_index, sim in enumerate(self.simulators):
+            for comp_index, component in enumerate(sim.components):
+                self.component_lookup[id(component)] = (sim_index, comp_index)
+
+        netlist = compile_netlist(self.simulator)
+        pin_state = get_pin_state(self.simulators)  # The worker carries on from what the mirror shows
+        state_size = STATE_HEADER.size + max(1, net_count)
+
+        if self.mode == "process":
+            state = shared_memory.SharedMemory(create=True, size=state_size)
+            ring = shared_memory.SharedMemory(create=True, size=EventRing.size())
+            state.buf[:state_size] = bytes(state_size)
+            ring.buf[:RING_HEADER.size] = bytes(RING_HEADER.size)
+
+            self.shared = [state, ring]
+            self.state = state.buf
+            self.ring = EventRing(ring.buf)
+
+            self.worker = multiprocessing.Process(
+                target=_run_process,
+                args=(dumps_netlist(netlist), state.name, ring.name, pin_state),
+                daemon=True
+            )
+
+        else:
+            self.state = bytearray(state_size)
+            self.ring = EventRing(bytearray(EventRing.size()))
+            self.stopped = threading.Event()
+
+            self.worker = threading.Thread(
+                target=simulate,
+                args=(netlist, self.state, self.ring.buffer, self.stopped, pin_state),
+                daemon=True
+            )
+
+        self.seen = bytearray(b"\xff" * net_count)  # Forces the first sync to write every net
+        self.__send_pin_settings()
+        self.worker.start()
+
+    def stop(self):
+        if not self.running:
+            return
+
+        self.ring.push(OP_STOP)
+
+        if self.stopped is not None:
+            self.stopped.set()
+
+        self.worker.join(timeout=2)
+
+        if self.mode == "process" and self.worker.is_alive():
+            self.worker.terminate()
+            self.worker.join()
+
+        self.worker = None
+        self.stopped = None
+        self.state = None
+        self.ring = None
+
+        for shared in self.shared:
+            shared.close()
+            shared.unlink()
+
+        self.shared = []
+
+    def reload(self, simulator):
+        """ Reloads any simulator of the mirror from disk and restarts the worker on the new design """
+        self.stop()
+        simulator.reload()
+        self.start()
+
+    def reload_changed(self):
+        """
+            Incremental reload of the mirror, the worker is only restarted if something was rebuilt.
+            The new worker starts from the mirror's values, so only the rebuilt levels lose their state
+        """
+        self.sync()
+        reloaded = self.simulator.reload_changed()
+
+        if reloaded and self.running:
+            self.stop()
+            self.start()
+
+        return reloaded
+
+    def __send_pin_settings(self):
+        """ The worker's copy starts with default settings, bring over anything changed in the mirror """
+        for sim in self.simulators:
+            for component in sim.inputs.values():
+                pin_comp = next(iter(component.outputs.values()))
+
+                if not pin_comp.settings["is_toggle"] or pin_comp.settings["is_clock"] or pin_comp.settings["clock_speed_hz"]:
+                    self.update_pin_settings(component)
+
+    def send(self, op, component=None, value=0.0):
+        sim_index, comp_index = self.component_lookup[id(component)] if component is not None else (0, 0)
+
+        while not self.ring.push(op, sim_index, comp_index, value):
+            time.sleep(0)  # Worker is a whole ring behind, it will catch up
+
+    def update_input_pin(self, component, vcc):
+        if id(component) in self.component_lookup and component.outputs:
+            self.send(OP_PRESS, component, vcc)
+
+    def update_pin_settings(self, component):
+        """ Sends every setting of an input pin, call after changing them on the mirror """
+        settings = next(iter(component.outputs.values())).settings
+
+        self.send(OP_SET_TOGGLE, component, settings["is_toggle"])
+        self.send(OP_SET_CLOCK, component, settings["is_clock"])
+        self.send(OP_CLOCK_SPEED, component, settings["clock_speed_hz"])
+
+    def full_rescan(self, simulator):
+        sim_index = self.simulators.index(simulator)
+        while not self.ring.push(OP_RESCAN, sim_index):
+            time.sleep(0)
+
+    def sync(self):
+        """ Copies the worker's net values into the mirror, watchers fire for nets that changed """
+        if not self.running:
+            return
+
+        tick, events, _ = STATE_HEADER.unpack_from(self.state, 0)
+        values = bytes(self.state[STATE_HEADER.size:STATE_HEADER.size + len(self.seen)])
+        seen = self.seen
+
+        for sim_index, sim in enumerate(self.simulators):
+            start = self.offsets[sim_index]
+            end = start + len(sim.nets)
+
+            if values[start:end] == seen[start:end]:
+                continue
+
+            changed = {}
+            for net_id in range(len(sim.nets)):
+                value = values[start + net_id]
+
+                if value == seen[start + net_id]:
+                    continue
+
+                component, pin_name = sim.nets[net_id]
+                is_input = pin_name not in component.outputs
+                vcc = float(value)
+
+                component.set_pin_vcc(pin_name, is_input, vcc)
+                changed[id(component)] = component
+
+                if not is_input:  # Keep the pins it drives in step too, for get_output() and friends
+                    for next_comp, _, input_pin in component.outputs[pin_name].connections:
+                        next_comp.inputs[input_pin].vcc = vcc
+
+            for component in changed.values():
+                if component.watched_pins:
+                    component.report_changes()
+
+        self.seen[:] = values
+        self.simulator.simulation_tick = tick
+        self.simulator.event_count = events
+
+    @property
+    def status(self):
+        if not self.running:
+            return "Stopped"
+
+        tick, events, rate = STATE_HEADER.unpack_from(self.state, 0)
+        return f"Running in {self.mode} ({round(rate)} ticks/s, tick {tick})"
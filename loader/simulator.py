@@ -11,6 +11,48 @@ class IntegrityError(Exception):
     pass
 
 
+class PinVCC:
+    """ A pin the way components.Component sees it, the value lives in a pin_vcc dict """
+    connections = ()  # This simulator follows connections itself
+
+    def __init__(self, vcc_values, pin_name):
+        self.vcc_values = vcc_values
+        self.pin_name = pin_name
+
+    @property
+    def vcc(self):
+        return self.vcc_values.get(self.pin_name, 0.0)
+
+    @vcc.setter
+    def vcc(self, vcc):
+        self.vcc_values[self.pin_name] = vcc
+
+
+class PinVCCMap:
+    """ pin name -> PinVCC over pin_vcc["inputs"] or pin_vcc["outputs"], which only hold connected pins """
+    def __init__(self, vcc_values):
+        self.vcc_values = vcc_values
+
+    def __getitem__(self, pin_name):
+        return PinVCC(self.vcc_values, pin_name)
+
+    def get(self, pin_name, default=None):
+        return PinVCC(self.vcc_values, pin_name) if pin_name in self.vcc_values else default
+
+    def values(self):
+        return [PinVCC(self.vcc_values, pin_name) for pin_name in self.vcc_values]
+
+    def items(self):
+        return [(pin_name, PinVCC(self.vcc_values, pin_name)) for pin_name in self.vcc_values]
+
+
+class ComponentPins:
+    """ What components.Component expects to be handed, built over a component's _simulation data """
+    def __init__(self, sim_data):
+        self.inputs = PinVCCMap(sim_data["pin_vcc"]["inputs"])
+        self.outputs = PinVCCMap(sim_data["pin_vcc"]["outputs"])
+
+
 class Simulator:
     def __init__(self, schematic, auto_gen=False, is_root=True):
         self.schematic = schematic
@@ -19,6 +61,7 @@ class Simulator:
         self.wire_vcc_lookup = {}
 
         self.simulation_tick = 0
+        self.event_count = 0  # Component evaluations on this level, sub simulators count their own
         self.built = False
         self.status = "Off"
 
@@ -72,7 +115,7 @@ class Simulator:
 
                     if hasattr(components, component_name):
                         component_sim = getattr(components, component_name)
-                        component["_simulation"]["sim"] = component_sim(component)
+                        component["_simulation"]["sim"] = component_sim(ComponentPins(component["_simulation"]))
 
                     else:
                         print(
@@ -183,6 +226,15 @@ class Simulator:
                             self.wire_vcc_lookup[wire] = (comp_id, pin_name, direction)
 
 
+    def iter_simulators(self):
+        yield self
+
+        for component in self.schematic.components:
+            sim = component.get("_simulation", {}).get("sim")
+
+            if isinstance(sim, Simulator):
+                yield from sim.iter_simulators()
+
     def get_wire_vcc(self, xy1):
         if xy1 not in self.wire_vcc_lookup:
             return None
@@ -194,6 +246,7 @@ class Simulator:
     def __update_component(self, component):
         """ Cascade update all inputs then compute our outputs """
         sim_data = component["_simulation"]
+        self.event_count += 1
 
         # Update component inputs
         for pin_name, data in sim_data["connections"]["inputs"].items():
@@ -1,7 +1,7 @@
 import time
-from collections import deque
+from array import array
 
-from . import components
+from . import components, memo
 
 
 
@@ -18,6 +18,15 @@ Replace dicts with lists / tuples where possible
 
 GLOBAL_CLOCK_SPEED = 60  # Flips every X ticks
 
+HOOKS = ("net_change", "component_eval", "tick_start", "tick_end", "clock_edge")
+
+observe_generation = 0  # Bumped whenever a pin gains or loses its last watcher, see Simulator.is_observed()
+
+
+def observers_changed():
+    global observe_generation
+    observe_generation += 1
+
 class IntegrityError(Exception):
     pass
 
@@ -46,11 +55,16 @@ class ComponentPin:
         self.vcc = 0.0
         self.xy = xy
 
+        self.net_id = None
+        self.watchers = []
+        self.reported_vcc = 0.0
+
 
 class SimulatorComponent:
     def __init__(self, component):
         self.component = component
         self.component_name = None
+        self.instance_name = None
 
         self.is_input = None
         self.internal_component = None
@@ -65,7 +79,10 @@ class SimulatorComponent:
         self.inputs = {}
         self.outputs = {}
 
-        self.__load()
+        self.watched_pins = []
+
+        if component is not None:  # None when being rebuilt from a compiled netlist
+            self.__load()
 
     def __str__(self):
         if self.component_name == "pin.generic":
@@ -98,6 +115,7 @@ class SimulatorComponent:
             self.component_name = "pin.generic"
             name = self.component["data"]["text"][1]["text"]
             self.is_input = "input" in self.component["data"]
+            self.instance_name = str(name)
 
             rect = self.component["data"]["rect"]
             self.rect = rect
@@ -115,6 +133,12 @@ class SimulatorComponent:
             comp_name = self.component["data"][1][0]["data"]["text"]
             self.component_name = comp_name
 
+            texts = [
+                chunk["data"]["text"] for [chunk] in self.component["data"]
+                if type(chunk) is dict and chunk["type"] == "text"
+            ]
+            self.instance_name = str(texts[1]) if len(texts) > 1 else comp_name
+
             if "sub_schematic" in self.component:
                 self.internal_component = Simulator(self.component["sub_schematic"], auto_gen=True, is_root=False)
                 self.has_sub_schematic = True
@@ -178,6 +202,38 @@ class SimulatorComponent:
 
         return pin_map
 
+    def get_pin(self, pin_name):
+        return self.outputs[pin_name] if pin_name in self.outputs else self.inputs[pin_name]
+
+    def watch(self, pin_name, callback):
+        """ callback(vcc) is called from the simulation loop whenever the pin actually changes value """
+        pin = self.get_pin(pin_name)
+
+        if not pin.watchers:  # Existing watchers may still be owed a change that hasn't been reported
+            pin.reported_vcc = pin.vcc
+
+        pin.watchers.append(callback)
+
+        if pin not in self.watched_pins:
+            self.watched_pins.append(pin)
+            observers_changed()
+
+    def unwatch(self, pin_name, callback):
+        pin = self.get_pin(pin_name)
+        pin.watchers.remove(callback)
+
+        if not pin.watchers:
+            self.watched_pins.remove(pin)
+            observers_changed()
+
+    def report_changes(self):
+        for pin in self.watched_pins:
+            if pin.vcc != pin.reported_vcc:
+                pin.reported_vcc = pin.vcc
+
+                for callback in pin.watchers:
+                    callback(pin.vcc)
+
     def needs_update(self):
         return True # self.get_input_hash() != self.last_hash
 
@@ -203,6 +259,7 @@ class Simulator:
         self.wire_vcc_lookup = {}
 
         self.simulation_tick = 0
+        self.event_count = 0
         self.built = False
         self.status = "Off"
 
@@ -211,6 +268,12 @@ class Simulator:
 
         self.components = []
         self.wires = []
+        self.nets = []  # (component, pin_name) of the pin driving each net
+        self.connection_nets = array("i")  # Net id of every entry in schematic.connections, -1 if unconnected
+
+        self.changed_nets = set()
+        self.change_callbacks = None  # Set while track_changes() is on
+        self.tracking_memoizable = False
 
         self.pin_inputs = []
         self.pin_outputs = []
@@ -220,6 +283,25 @@ class Simulator:
 
         self.clocks = []
 
+        # Memoization, see get_memo()
+        self.combinational = None
+        self.fingerprint = None
+        self.memo = None
+        self.memo_stale = False  # Skipped by a memo hit, internals lag behind the inputs
+        self.observed = False
+        self.observed_generation = -1
+        self.released_generation = observe_generation
+
+        self.hooks = {hook: [] for hook in HOOKS}  # See subscribe()
+        self.hook_net_values = []  # Last value handed to net_change, per net
+
+        # Stats of the last update_simulation(), times are only kept on the root (see hud.py)
+        self.tick_deltas = 0
+        self.tick_queue_peak = 0
+        self.tick_seconds = 0.0
+        self.queue_high_water = 0
+        self.simulate_seconds = 0.0
+
         self.is_root = is_root
 
         if auto_gen: # Should run 2 update cycles and everything will be initialised
@@ -240,19 +322,7 @@ class Simulator:
 
         for component in self.schematic.components:
             comp = SimulatorComponent(component)
-            self.components.append(comp)
-
-            if comp.component_name == "pin.generic":
-                if comp.is_input:
-                    pin_name = list(comp.outputs.keys())[0]
-                    self.pin_inputs.append((comp, pin_name))
-                    self.inputs[pin_name] = comp
-
-                else:
-                    pin_name = list(comp.inputs.keys())[0]
-                    self.pin_outputs.append((comp, pin_name))
-                    self.outputs[pin_name] = comp
-
+            self.add_component(comp)
 
             # Generate a pin map
             for xy, values in comp.get_pin_coord_map().items():
@@ -295,6 +365,28 @@ class Simulator:
 
             return results, used_wires
 
+        def assign_net(component, pin_name, is_input, results):
+            """ Every pin reached by the same trace shares a net, preferably named after an output pin """
+            members = [(component, pin_name, is_input)] + [
+                (result["component"], result["pin"], result["is_input"]) for result in results
+            ]
+            pins = [(comp.inputs if pin_is_input else comp.outputs)[name] for comp, name, pin_is_input in members]
+
+            net_id = next((pin.net_id for pin in pins if pin.net_id is not None), None)
+            if net_id is None:
+                net_id = len(self.nets)
+                self.nets.append((component, pin_name))
+
+            for pin in pins:
+                pin.net_id = net_id
+
+            driver, driver_pin = self.nets[net_id]
+            if driver_pin not in driver.outputs:
+                for comp, name, pin_is_input in members:
+                    if not pin_is_input:
+                        self.nets[net_id] = (comp, name)
+                        break
+
 
         # Generate connections
         for pin_xy, pins in pin_lookup.items():
@@ -308,6 +400,8 @@ class Simulator:
                     is_input1 = pin_data["is_input"]
                     pin_name1 = pin_data["pin"]
 
+                    assign_net(component1, pin_name1, is_input1, results)
+
                     for wire in wires:
                         pins = component1.inputs if is_input1 else component1.outputs
                         self.wire_vcc_lookup[wire] = pins[pin_name1]
@@ -326,6 +420,131 @@ class Simulator:
                         pins1[pin_name1].connections.append((component2, pin_name1, pin_name2))
                         pin2[pin_name2].connections.append((component1, pin_name2, pin_name1))
 
+        # Flat wire segment -> net lookup for the renderer, either end of a segment will do
+        for wire in self.schematic.connections:
+            pin = self.wire_vcc_lookup.get(tuple(wire[0]["data"])) or self.wire_vcc_lookup.get(tuple(wire[1]["data"]))
+            self.connection_nets.append(-1 if pin is None or pin.net_id is None else pin.net_id)
+
+
+    def add_component(self, comp):
+        self.components.append(comp)
+
+        if comp.component_name == "pin.generic":
+            if comp.is_input:
+                pin_name = list(comp.outputs.keys())[0]
+                self.pin_inputs.append((comp, pin_name))
+                self.inputs[pin_name] = comp
+
+            else:
+                pin_name = list(comp.inputs.keys())[0]
+                self.pin_outputs.append((comp, pin_name))
+                self.outputs[pin_name] = comp
+
+    def get_net_name(self, net_id):
+        component, pin_name = self.nets[net_id]
+
+        if component.component_name == "pin.generic":
+            return pin_name
+
+        return f"{component.instance_name}.{pin_name}"
+
+    def get_net_vcc(self, net_id):
+        component, pin_name = self.nets[net_id]
+        return component.get_pin_vcc(pin_name, pin_name not in component.outputs)
+
+    def watch_net(self, net_id, callback):
+        component, pin_name = self.nets[net_id]
+        component.watch(pin_name, callback)
+
+    def unwatch_net(self, net_id, callback):
+        component, pin_name = self.nets[net_id]
+
+        if callback not in component.get_pin(pin_name).watchers:
+            # Watched before a reload() renumbered the nets, look for where it was re-attached
+            for component, pin_name in self.nets:
+                if callback in component.get_pin(pin_name).watchers:
+                    break
+            else:
+                return
+
+        component.unwatch(pin_name, callback)
+
+    def subscribe(self, hook, callback):
+        """
+            Hooks only cover this level, sub schematics have their own (see iter_simulators).
+            Callbacks are called from the simulation loop as:
+
+                net_change        (simulator, net_id, vcc) after a net's driver changed value
+                component_eval    (simulator, component, seconds, fanout) after every evaluation,
+                                  fanout is how many evaluations it scheduled
+                tick_start        (simulator)
+                tick_end          (simulator, events, wave sizes)
+                clock_edge        (simulator, input pin component, vcc)
+        """
+        if hook not in self.hooks:
+            raise ValueError(f"Unknown hook: {hook}")
+
+        if hook == "net_change" and not self.hooks[hook]:
+            self.hook_net_values = [self.get_net_vcc(net_id) for net_id in range(len(self.nets))]
+
+        # New lists rather than changing them in place, the tick in progress keeps the ones it started with
+        self.hooks[hook] = self.hooks[hook] + [callback]
+        observers_changed()  # Hooked levels can't be skipped by memoization
+
+    def unsubscribe(self, hook, callback):
+        callbacks = list(self.hooks[hook])
+        callbacks.remove(callback)
+        self.hooks[hook] = callbacks
+        observers_changed()
+
+    def track_changes(self, enabled=True, memoizable=False):
+        """
+            Collects the ids of nets that change value into changed_nets, see pop_changed_nets().
+            Tracked levels normally always run for real, with memoizable=True they can still be
+            skipped by memo hits and only catch up (and report their changes) on settle_memoized()
+        """
+        if enabled and self.change_callbacks is None:
+            self.change_callbacks = []
+            self.changed_nets = set()
+            self.tracking_memoizable = memoizable
+
+            for net_id in range(len(self.nets)):
+                callback = self.__make_change_callback(net_id)
+                self.watch_net(net_id, callback)
+                self.change_callbacks.append((net_id, callback))
+
+        elif not enabled and self.change_callbacks is not None:
+            for net_id, callback in self.change_callbacks:
+                self.unwatch_net(net_id, callback)
+
+            self.change_callbacks = None
+
+    def __make_change_callback(self, net_id):
+        def changed(vcc):
+            self.changed_nets.add(net_id)
+
+        return changed
+
+    def pop_changed_nets(self):
+        changed = self.changed_nets
+        self.changed_nets = set()
+        return changed
+
+    def iter_simulators(self):
+        yield self
+
+        for component in self.components:
+            if component.has_sub_schematic:
+                yield from component.internal_component.iter_simulators()
+
+    def iter_nets(self, prefix=""):
+        """ Yields (hierarchical name, simulator, net_id) for this schematic and every sub schematic """
+        for net_id in range(len(self.nets)):
+            yield prefix + self.get_net_name(net_id), self, net_id
+
+        for component in self.components:
+            if component.has_sub_schematic:
+                yield from component.internal_component.iter_nets(f"{prefix}{component.instance_name}/")
 
     def get_wire_vcc(self, start_xy):
         if start_xy not in self.wire_vcc_lookup:
@@ -349,6 +568,18 @@ class Simulator:
         else:
             pin_comp.vcc = vcc
 
+    def set_input(self, pin_name, vcc):
+        """ Drives an input pin directly, ignoring its toggle / hold setting. Used by scripted runs """
+        component = self.inputs[pin_name]
+        pin_comp = component.outputs[pin_name]
+
+        if pin_comp.vcc != vcc:
+            pin_comp.vcc = vcc
+            self.dirty_components.append(component)
+
+    def get_output(self, pin_name):
+        return self.outputs[pin_name].inputs[pin_name].vcc
+
     def full_rescan(self):
         for component in self.components:
             self.dirty_components.append(component)
@@ -399,6 +630,172 @@ class Simulator:
 
         return changed_outputs
 
+    def update_sub_schematic(self, component):
+        """ Runs a sub schematic for one event, or looks its outputs up when it is memoizable """
+        simulator = component.internal_component
+        table = simulator.get_memo()
+
+        if table is not None:
+            key = simulator.get_memo_key(component)
+            outputs = table.get(key)
+
+            if outputs is not None:
+                simulator.memo_stale = True
+                changed_outputs = []
+
+                for pin_name, vcc in zip(simulator.outputs, outputs):
+                    pin_comp = component.outputs.get(pin_name)
+
+                    if pin_comp is not None and pin_comp.vcc != vcc:
+                        pin_comp.vcc = vcc
+                        changed_outputs.extend(pin_comp.connections)
+
+                return changed_outputs
+
+        self.copy_to_component_inputs(component)
+        component.update()
+        changed_outputs = self.copy_from_component_outputs(component)
+        simulator.memo_stale = False
+
+        if table is not None:
+            table.put(key, tuple(simulator.outputs[pin_name].inputs[pin_name].vcc for pin_name in simulator.outputs))
+
+        return changed_outputs
+
+    def get_memo(self):
+        """ The memo table shared by every instance of this design, None while it has to be simulated for real """
+        if not self.built or self.clocks or not self.is_combinational() or self.is_observed():
+            return None
+
+        if self.memo is None:
+            self.memo = memo.get_table(self.get_fingerprint(), len(self.inputs))
+
+        return self.memo
+
+    def get_memo_key(self, component):
+        """ Input vector of a sub schematic instance, one bit per input pin """
+        key = 0
+
+        for pin_name, pin_comp in self.inputs.items():
+            pin = component.inputs.get(pin_name) or pin_comp.outputs[pin_name]
+            key = (key << 1) | int(pin.vcc)
+
+        return key
+
+    def is_combinational(self):
+        """ No flip flops and no feedback on this level or below, so the outputs only depend on the inputs """
+        if self.combinational is None:
+            self.combinational = self.__check_combinational()
+
+        return self.combinational
+
+    def __check_combinational(self):
+        for component in self.components:
+            if component.has_sub_schematic:
+                if not component.internal_component.is_combinational():
+                    return False
+
+            elif getattr(component.internal_component, "sequential", False):
+                return False
+
+        # Depth first search for a loop through the output connections
+        state = {}  # id(component) -> 1 while on the stack, 2 once finished
+
+        for start in self.components:
+            if id(start) in state:
+                continue
+
+            stack = [(start, iter([c for pin in start.outputs.values() for c, _, _ in pin.connections]))]
+            state[id(start)] = 1
+
+            while stack:
+                component, children = stack[-1]
+                child = next(children, None)
+
+                if child is None:
+                    state[id(component)] = 2
+                    stack.pop()
+
+                elif state.get(id(child)) == 1:
+                    return False
+
+                elif id(child) not in state:
+                    state[id(child)] = 1
+                    stack.append((child, iter([c for pin in child.outputs.values() for c, _, _ in pin.connections])))
+
+        return True
+
+    def get_fingerprint(self):
+        """ Equal for every simulator built from the same design, used to share memo tables """
+        if self.fingerprint is None:
+            self.fingerprint = tuple(
+                (
+                    component.component_name,
+                    tuple((pin_name, pin.net_id) for pin_name, pin in component.inputs.items()),
+                    tuple((pin_name, pin.net_id) for pin_name, pin in component.outputs.items()),
+                    component.internal_component.get_fingerprint() if component.has_sub_schematic else None
+                )
+                for component in self.components
+            )
+
+        return self.fingerprint
+
+    def is_observed(self):
+        """ True if anything watches a net on this level or below, those have to really run """
+        if self.observed_generation != observe_generation:
+            tracking = self.change_callbacks is not None
+            tracker_watchers = 1 if tracking and self.tracking_memoizable else 0  # Every net has one
+
+            self.observed = (tracking and not self.tracking_memoizable) or any(self.hooks.values()) or any(
+                any(len(pin.watchers) > tracker_watchers for pin in component.watched_pins)
+                or (component.has_sub_schematic and component.internal_component.is_observed())
+                for component in self.components
+            )
+            self.observed_generation = observe_generation
+
+        return self.observed
+
+    def release_memoized(self):
+        """ Levels skipped by memo hits that are now observed catch up with their inputs """
+        for component in self.components:
+            if not component.has_sub_schematic:
+                continue
+
+            simulator = component.internal_component
+
+            if simulator.memo_stale and simulator.get_memo() is None:
+                simulator.memo_stale = False
+                simulator.full_rescan()
+                self.dirty_components.append(component)
+
+            simulator.release_memoized()
+
+        self.released_generation = observe_generation
+
+    def settle_memoized(self):
+        """ Runs levels skipped by memo hits right away, so their nets hold real values before anything hooks them """
+        for component in self.components:
+            if not component.has_sub_schematic:
+                continue
+
+            simulator = component.internal_component
+
+            if simulator.memo_stale:
+                simulator.memo_stale = False
+                simulator.full_rescan()
+                self.copy_to_component_inputs(component)
+                component.update()
+                self.copy_from_component_outputs(component)  # Same outputs as the memo gave
+
+            simulator.settle_memoized()
+
+    def __reset_memo(self):
+        self.combinational = None
+        self.fingerprint = None
+        self.memo = None
+        self.memo_stale = False
+        self.observed_generation = -1
+
     def update_clocks(self):
         current_time = time.time()
         for component, pin_comp in self.clocks:  # Component should be an input pin ONLY
@@ -415,37 +812,98 @@ class Simulator:
 
                 self.dirty_components.append(component)
 
+                for callback in self.hooks["clock_edge"]:
+                    callback(self, component, pin_comp.vcc)
+
     def update_simulation(self):
+        start = time.perf_counter() if self.is_root else 0
+
+        if self.is_root and self.released_generation != observe_generation:
+            self.release_memoized()
+
         self.update_clocks()
 
-        queue = deque(self.dirty_components)
+        # Hook lists are replaced rather than changed (see subscribe), so these hold for the whole tick
+        hooks = self.hooks
+        eval_callbacks = hooks["component_eval"]
+        net_callbacks = hooks["net_change"]
+        net_values = self.hook_net_values
+        tick_end_callbacks = hooks["tick_end"]
+        wave_sizes = []
+        perf_counter = time.perf_counter
+
+        for callback in hooks["tick_start"]:
+            callback(self)
+
+        # Processed in waves (delta cycles), everything a wave schedules runs in the next one
+        queue = list(self.dirty_components)
         self.dirty_components.clear()
+        events = 0
+        deltas = 0
+        queue_peak = len(queue)
 
         while queue:
-            component = queue.popleft()
+            wave, queue = queue, []
+            deltas += 1
 
-            if not component.needs_update():
-                continue
+            if tick_end_callbacks:
+                wave_sizes.append(len(wave))
 
-            if component.has_sub_schematic:
-                self.copy_to_component_inputs(component)
+            for component in wave:
+                if not component.needs_update():
+                    continue
 
-            changed_outputs = component.update()
+                events += 1
 
-            if component.has_sub_schematic:
-                changed_outputs = self.copy_from_component_outputs(component)
+                if eval_callbacks:
+                    eval_start = perf_counter()
+
+                if component.has_sub_schematic:
+                    changed_outputs = self.update_sub_schematic(component)
+                else:
+                    changed_outputs = component.update()
+
+                if eval_callbacks:
+                    seconds = perf_counter() - eval_start
+                    scheduled = len(queue)
 
-            for next_comp, output_pin, input_pin in changed_outputs:
-                if next_comp.tick < self.simulation_tick and component.outputs[output_pin].vcc != next_comp.inputs[input_pin].vcc:
-                    next_comp.inputs[input_pin].vcc = component.outputs[output_pin].vcc
-                    queue.append(next_comp)
+                if component.watched_pins:
+                    component.report_changes()
 
+                for next_comp, output_pin, input_pin in changed_outputs:
+                    if next_comp.tick < self.simulation_tick and component.outputs[output_pin].vcc != next_comp.inputs[input_pin].vcc:
+                        next_comp.inputs[input_pin].vcc = component.outputs[output_pin].vcc
+                        queue.append(next_comp)
+
+                if eval_callbacks:
+                    for callback in eval_callbacks:
+                        callback(self, component, seconds, len(queue) - scheduled)
+
+                if net_callbacks:
+                    for pin in component.outputs.values():
+                        if pin.net_id is not None and pin.vcc != net_values[pin.net_id]:
+                            net_values[pin.net_id] = pin.vcc
+
+                            for callback in net_callbacks:
+                                callback(self, pin.net_id, pin.vcc)
+
+            if len(queue) > queue_peak:
+                queue_peak = len(queue)
 
         self.last_hash = self.get_input_hash()
         self.simulation_tick += 1
+        self.event_count += events
 
-        return None
+        self.tick_deltas = deltas
+        self.tick_queue_peak = queue_peak
+        self.queue_high_water = max(self.queue_high_water, queue_peak)
 
+        if self.is_root:
+            self.tick_seconds = time.perf_counter() - start
+            self.simulate_seconds += self.tick_seconds
+
+        for callback in tick_end_callbacks:
+            callback(self, events, wave_sizes)
 
     def update(self):
         if not self.built and self.status == "Off":
@@ -473,10 +931,66 @@ class Simulator:
         return None
 
     def clear_cache(self):
-        pass  # We don't have any caches at the moment
+        """ Drops the memo tables of this level and everything below it """
+        for simulator in self.iter_simulators():
+            if simulator.memo is not None:
+                memo.drop_table(simulator.get_fingerprint())
+
+            simulator.memo = None
+
+    def reload_changed(self, checked=None):
+        """
+            Reloads only the levels whose .bdf changed on disk, everything else keeps its state.
+            Returns the simulators that were rebuilt (empty if nothing changed)
+        """
+        if checked is None:
+            checked = {}
+
+        if self.schematic.has_changed(checked):
+            self.reload()
+            return [self]
+
+        reloaded = []
+        for component in self.components:
+            if not component.has_sub_schematic:
+                continue
+
+            simulator = component.internal_component
+            inputs, outputs = set(simulator.inputs), set(simulator.outputs)
+
+            changed = simulator.reload_changed(checked)
+            if not changed:
+                continue
+
+            if set(simulator.inputs) != inputs or set(simulator.outputs) != outputs:
+                # The ports moved, the symbol on this level has to be rebuilt to match
+                self.reload()
+                return [self]
+
+            reloaded.extend(changed)
+            self.dirty_components.append(component)  # Re-links the boundary pins on the next tick
+            self.__reset_memo()  # A different design below means a different fingerprint here
+
+        return reloaded
 
     def reload(self):
         start = time.time()
+
+        # Watchers are kept by net name, change tracking is turned back on for the new nets
+        tracking = self.change_callbacks is not None
+        tracking_memoizable = self.tracking_memoizable
+        tracker_callbacks = {id(callback) for _, callback in self.change_callbacks or ()}
+        watchers = []
+
+        for net_id, (component, pin_name) in enumerate(self.nets):
+            callbacks = [
+                callback for callback in component.get_pin(pin_name).watchers
+                if id(callback) not in tracker_callbacks
+            ]
+
+            if callbacks:
+                watchers.append((self.get_net_name(net_id), callbacks))
+
         self.connection_map = {}
         self.wire_vcc_lookup = {}
         self.clocks = []
@@ -484,18 +998,39 @@ class Simulator:
         self.last_hash = -1
         self.components = []
         self.wires = []
+        self.nets = []
+        self.connection_nets = array("i")
+        self.changed_nets = set()
+        self.change_callbacks = None
         self.pin_inputs = []
         self.pin_outputs = []
         self.inputs = {}
         self.outputs = {}
         self.simulation_tick = 0
+        self.event_count = 0
+        self.queue_high_water = 0
         self.built = False
         self.status = "Off"
+        self.__reset_memo()
 
         self.schematic.reload()
 
         self.build()
 
+        if self.hooks["net_change"]:  # Subscribers carry over, the nets don't
+            self.hook_net_values = [self.get_net_vcc(net_id) for net_id in range(len(self.nets))]
+
+        net_ids = {self.get_net_name(net_id): net_id for net_id in range(len(self.nets))}
+        for name, callbacks in watchers:
+            if name in net_ids:  # Nets that are gone lose their watchers
+                for callback in callbacks:
+                    self.watch_net(net_ids[name], callback)
+
+        if tracking:
+            self.track_changes(memoizable=tracking_memoizable)
+
+        observers_changed()
+
         self.update_simulation()
         self.full_rescan()
 
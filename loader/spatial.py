@@ -0,0 +1,72 @@
+"""
+Spatial Indexing
+
+A uniform grid over axis aligned boxes in world coordinates. Schematics are fairly evenly
+spread out and only change on (re)load, so a grid beats anything fancier here.
+"""
+
+DEFAULT_CELL_SIZE = 256
+
+
+class GridIndex:
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boxes = {}  # item -> (x1, y1, x2, y2)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def insert(self, item, box):
+        x1, y1, x2, y2 = box
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        self.boxes[item] = box
+
+        size = self.cell_size
+        for cx in range(int(box[0] // size), int(box[2] // size) + 1):
+            for cy in range(int(box[1] // size), int(box[3] // size) + 1):
+                cell = self.cells.get((cx, cy))
+
+                if cell is None:
+                    self.cells[(cx, cy)] = [item]
+                else:
+                    cell.append(item)
+
+    def query(self, x1, y1, x2, y2):
+        """ Items whose box overlaps the given box, sorted so draw order stays stable """
+        size = self.cell_size
+        cx1, cx2 = int(x1 // size), int(x2 // size)
+        cy1, cy2 = int(y1 // size), int(y2 // size)
+
+        candidates = set()
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self.cells):  # Mostly zoomed out, just walk the cells
+            for (cx, cy), cell in self.cells.items():
+                if cx1 <= cx <= cx2 and cy1 <= cy <= cy2:
+                    candidates.update(cell)
+
+        else:
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    cell = self.cells.get((cx, cy))
+
+                    if cell:
+                        candidates.update(cell)
+
+        boxes = self.boxes
+        return sorted(
+            item for item in candidates
+            if boxes[item][0] <= x2 and boxes[item][2] >= x1 and boxes[item][1] <= y2 and boxes[item][3] >= y1
+        )
+
+    def query_point(self, x, y):
+        """ Items whose box strictly contains the point, in insertion order """
+        cell = self.cells.get((int(x // self.cell_size), int(y // self.cell_size)))
+
+        if not cell:
+            return []
+
+        boxes = self.boxes
+        return sorted(
+            item for item in cell
+            if boxes[item][0] < x < boxes[item][2] and boxes[item][1] < y < boxes[item][3]
+        )
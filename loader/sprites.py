@@ -0,0 +1,103 @@
+import math
+import threading
+from collections import OrderedDict
+
+
+"""
+Sprite Cache
+
+Rendered surfaces shared between every instance of the same symbol artwork, keyed by
+(symbol definition, zoom). Least recently used surfaces are dropped once the cache goes over
+its memory budget. Safe to share with the renderer's raster thread.
+
+Sprites are only rendered at zooms on a geometric ladder (ZOOM_STEP apart, see quantize_zoom),
+the renderer scales them the last few percent to the exact zoom. Nearby zoom levels share one
+set of sprites instead of each wheel step rendering everything again.
+
+Anything else with a known size can be kept the same way by passing a sizeof function.
+"""
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ZOOM_STEP = 1.1  # Ratio between neighbouring sprite zooms
+
+
+def quantize_zoom(zoom):
+    """ Nearest rung of the sprite zoom ladder, rounded so the same rung always gives the same key """
+    return round(ZOOM_STEP ** round(math.log(zoom, ZOOM_STEP)), 4)
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class SpriteCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, sizeof=surface_bytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, factory):
+        """ factory() renders the surface on a miss, outside the lock """
+        with self.lock:
+            surface = self.entries.get(key)
+
+            if surface is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return surface
+
+            self.misses += 1
+
+        surface = factory()
+
+        with self.lock:
+            if key in self.entries:  # Another thread got there first
+                return self.entries[key]
+
+            self.__insert(key, surface)
+
+        return surface
+
+    def put(self, key, value):
+        with self.lock:
+            self.__remove(key)
+            self.__insert(key, value)
+
+    def value_ids(self):
+        """ id() of everything cached, to tell shared surfaces from ones a caller owns """
+        with self.lock:
+            return {id(value) for value in self.entries.values()}
+
+    def pop(self, key):
+        """ Removes and returns an entry, None if it isn't cached """
+        with self.lock:
+            return self.__remove(key)
+
+    def __insert(self, key, value):
+        self.entries[key] = value
+        self.size += self.sizeof(value)
+
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+
+    def __remove(self, key):
+        value = self.entries.pop(key, None)
+
+        if value is not None:
+            self.size -= self.sizeof(value)
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -0,0 +1,225 @@
+import csv
+import json
+import sys
+
+
+"""
+Scripted Stimulus
+
+Test vectors are read one line at a time, so files with millions of vectors never have to fit
+in memory. Two formats are supported, picked by file extension:
+
+CSV (.csv)
+    The first row names the columns. Plain names are input pins, names starting with "=" are
+    expected output values and an optional "@ticks" column sets how many ticks to run the row
+    for (default 1). Empty cells, "x" and "-" mean "leave unchanged" / "don't care". Rows that
+    start with "#" are comments.
+
+        A,B,CLK,@ticks,=Y
+        0,1,0,,1
+        1,1,1,4,0
+
+JSON lines (.jsonl)
+    One object per line, every key optional:
+
+        {"inputs": {"A": 0, "B": 1}, "expect": {"Y": 1}, "ticks": 1}
+
+Each vector is applied to the input pins, the simulation is advanced and the outputs are
+compared against the expected values. Malformed rows raise a StimulusError naming the line.
+"""
+
+DONT_CARE = ("", "x", "X", "-")
+
+
+class StimulusError(Exception):
+    pass
+
+
+class Vector:
+    __slots__ = ("line", "inputs", "expect", "ticks")
+
+    def __init__(self, line, inputs, expect, ticks=1):
+        self.line = line
+        self.inputs = inputs  # [(pin_name, vcc), ...]
+        self.expect = expect  # [(pin_name, vcc), ...]
+        self.ticks = ticks
+
+
+def parse_value(line, name, value):
+    """ Pin values have to be 0 or 1 """
+    try:
+        vcc = int(value)
+    except (TypeError, ValueError):
+        vcc = None
+
+    if vcc not in (0, 1) or isinstance(value, (bool, float)):
+        raise StimulusError(f"line {line}: '{name}' must be 0 or 1, not {value!r}")
+
+    return vcc
+
+
+def parse_ticks(line, value):
+    try:
+        ticks = int(value)
+    except (TypeError, ValueError):
+        ticks = 0
+
+    if ticks < 1 or isinstance(value, (bool, float)):
+        raise StimulusError(f"line {line}: ticks must be a positive whole number, not {value!r}")
+
+    return ticks
+
+
+def read_csv_vectors(f):
+    columns = None
+
+    for line, row in enumerate(csv.reader(f), start=1):
+        if not row or row[0].lstrip().startswith("#"):
+            continue
+
+        if columns is None:
+            columns = [name.strip() for name in row]
+            continue
+
+        if len(row) > len(columns):
+            raise StimulusError(f"line {line}: {len(row)} cells but only {len(columns)} columns")
+
+        inputs, expect, ticks = [], [], 1
+
+        for name, value in zip(columns, row):
+            value = value.strip()
+
+            if value in DONT_CARE:
+                continue
+
+            if name == "@ticks":
+                ticks = parse_ticks(line, value)
+
+            elif name.startswith("="):
+                expect.append((name[1:], parse_value(line, name[1:], value)))
+
+            else:
+                inputs.append((name, parse_value(line, name, value)))
+
+        yield Vector(line, inputs, expect, ticks)
+
+
+def read_jsonl_vectors(f):
+    for line, text in enumerate(f, start=1):
+        text = text.strip()
+
+        if not text or text.startswith("#"):
+            continue
+
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise StimulusError(f"line {line}: {e}") from None
+
+        if not isinstance(data, dict) or not all(isinstance(data.get(key, {}), dict) for key in ("inputs", "expect")):
+            raise StimulusError(f"line {line}: expected an object with \"inputs\" / \"expect\" objects")
+
+        yield Vector(
+            line,
+            [(name, parse_value(line, name, value)) for name, value in data.get("inputs", {}).items()],
+            [(name, parse_value(line, name, value)) for name, value in data.get("expect", {}).items()],
+            parse_ticks(line, data.get("ticks", 1))
+        )
+
+
+def read_vectors(path):
+    """ Lazily yields Vectors from a stimulus file """
+    with open(path, "r", newline="") as f:
+        if path.endswith(".jsonl"):
+            yield from read_jsonl_vectors(f)
+        else:
+            yield from read_csv_vectors(f)
+
+
+class StimulusResult:
+    def __init__(self, max_failures):
+        self.vectors = 0
+        self.ticks = 0
+        self.checks = 0
+        self.failed_checks = 0
+        self.failures = []  # (line, pin_name, expected, got), capped at max_failures
+        self.max_failures = max_failures
+
+    @property
+    def passed(self):
+        return self.failed_checks == 0
+
+    def __str__(self):
+        lines = [
+            f"{'PASS' if self.passed else 'FAIL'}: {self.vectors} vectors, {self.ticks} ticks, "
+            f"{self.checks - self.failed_checks}/{self.checks} checks passed"
+        ]
+
+        for line, pin_name, expected, got in self.failures:
+            lines.append(f"  line {line}: {pin_name} expected {expected}, got {got}")
+
+        if self.failed_checks > len(self.failures):
+            lines.append(f"  ... and {self.failed_checks - len(self.failures)} more")
+
+        return "\n".join(lines)
+
+
+class StimulusRunner:
+    def __init__(self, simulator, max_failures=100):
+        self.simulator = simulator  # Must already be built
+        self.max_failures = max_failures
+
+    def run(self, vectors):
+        """ vectors can be a path or any iterable of Vectors """
+        if isinstance(vectors, str):
+            vectors = read_vectors(vectors)
+
+        simulator = self.simulator
+        result = StimulusResult(self.max_failures)
+
+        for vector in vectors:
+            for pin_name, vcc in vector.inputs:
+                if pin_name not in simulator.inputs:
+                    raise StimulusError(f"line {vector.line}: unknown input pin '{pin_name}'")
+
+                simulator.set_input(pin_name, vcc)
+
+            for _ in range(vector.ticks):
+                simulator.update_simulation()
+
+            for pin_name, expected in vector.expect:
+                if pin_name not in simulator.outputs:
+                    raise StimulusError(f"line {vector.line}: unknown output pin '{pin_name}'")
+
+                got = int(simulator.get_output(pin_name))
+
+                if got != expected:
+                    result.failed_checks += 1
+
+                    if len(result.failures) < result.max_failures:
+                        result.failures.append((vector.line, pin_name, expected, got))
+
+            result.vectors += 1
+            result.ticks += vector.ticks
+            result.checks += len(vector.expect)
+
+        return result
+
+
+if __name__ == "__main__":
+    from .netlist import load_or_build
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m loader.stimulus <schematic.bdf> <vectors.csv|vectors.jsonl>")
+        sys.exit(2)
+
+    simulator = load_or_build(sys.argv[1])
+
+    try:
+        stimulus_result = StimulusRunner(simulator).run(sys.argv[2])
+    except StimulusError as e:
+        print(f"{sys.argv[2]}: {e}")
+        sys.exit(2)
+
+    print(stimulus_result)
+    sys.exit(0 if stimulus_result.passed else 1)
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+
+from .coverage import ToggleCoverage
+from .netlist import compile_netlist, load_netlist, dumps_netlist, loads_netlist
+from .optimize import optimize_netlist
+
+
+"""
+Stimulus Sweeps
+
+Runs many independent stimulus sets through the same design across a process pool. The
+simulator is built once in the parent, compiled to a netlist and shipped to every worker a
+single time (pool initializer), so each task only pays for rebuilding the pin objects.
+
+A stimulus set is a dict:
+    {
+        "name": "anything",             # Optional, handed back with the trace
+        "vectors": [{"A": 1, "B": 0}, ...],  # Input pin values, one dict per tick
+        "clocks": {"CLK": 4},           # Optional, pin -> flips every X ticks
+        "ticks": 100,                   # Optional, defaults to len(vectors)
+    }
+
+With coverage=True every worker also records toggle coverage, the bitsets come back with each
+result and are merged into SweepRunner.coverage as results arrive.
+"""
+
+
+_worker_netlist = None
+_worker_coverage = False
+
+
+def _init_worker(data, coverage=False):
+    global _worker_netlist, _worker_coverage
+    _worker_netlist = loads_netlist(data)
+    _worker_coverage = coverage
+
+
+def _run_worker(stimulus):
+    simulator = load_netlist(_worker_netlist)
+    return run_stimulus(simulator, stimulus, _worker_coverage)
+
+
+def run_stimulus(simulator, stimulus, coverage=False):
+    """ Returns one tuple of output values (ordered like simulator.outputs) per tick, plus the coverage bitsets if asked """
+    toggle_coverage = None
+    if coverage:
+        toggle_coverage = ToggleCoverage.for_simulator(simulator)
+        toggle_coverage.attach(simulator, fresh=True)
+
+    vectors = stimulus.get("vectors", [])
+    clocks = stimulus.get("clocks", {})
+    ticks = stimulus.get("ticks", len(vectors))
+    output_names = list(simulator.outputs.keys())
+
+    trace = []
+    for tick in range(ticks):
+        if tick < len(vectors):
+            for pin_name, vcc in vectors[tick].items():
+                simulator.set_input(pin_name, vcc)
+
+        for pin_name, half_period in clocks.items():
+            simulator.set_input(pin_name, (tick // half_period) % 2)
+
+        simulator.update_simulation()
+
+        trace.append(tuple(
+            int(simulator.get_output(pin_name)) for pin_name in output_names
+        ))
+
+    result = {
+        "name": stimulus.get("name"),
+        "trace": trace
+    }
+
+    if toggle_coverage is not None:
+        toggle_coverage.detach()
+        result["coverage"] = (bytes(toggle_coverage.rose), bytes(toggle_coverage.fell))
+
+    return result
+
+
+class SweepRunner:
+    def __init__(self, simulator, processes=None, optimize=False, coverage=False):
+        """
+            Simulator must already be built, it is only used as a template. Traces only read the
+            output pins, so optimize can run every worker on an optimized netlist
+        """
+        if optimize and coverage:
+            raise ValueError("Coverage needs every net of the design, it can't run on an optimized netlist")
+
+        netlist = compile_netlist(simulator)
+        if optimize:
+            netlist = optimize_netlist(netlist)
+
+        self.netlist_data = dumps_netlist(netlist)
+        self.output_names = list(simulator.outputs.keys())
+        self.processes = processes or os.cpu_count() or 1
+
+        self.coverage = ToggleCoverage.for_simulator(simulator) if coverage else None
+
+    def iter_results(self, stimulus_sets, chunksize=1):
+        """ Yields results in the same order as stimulus_sets, as they complete """
+        for result in self.__iter_results(stimulus_sets, chunksize):
+            if self.coverage is not None:
+                self.coverage.merge_bits(*result["coverage"])
+
+            yield result
+
+    def __iter_results(self, stimulus_sets, chunksize):
+        collect_coverage = self.coverage is not None
+
+        if self.processes == 1:
+            netlist = loads_netlist(self.netlist_data)
+
+            for stimulus in stimulus_sets:
+                yield run_stimulus(load_netlist(netlist), stimulus, collect_coverage)
+            return
+
+        with multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self.netlist_data, collect_coverage)) as pool:
+            yield from pool.imap(_run_worker, stimulus_sets, chunksize)
+
+    def run(self, stimulus_sets, chunksize=None):
+        stimulus_sets = list(stimulus_sets)
+
+        if chunksize is None:  # A few chunks per worker keeps them all busy without much IPC
+            chunksize = max(1, len(stimulus_sets) // (self.processes * 4))
+
+        return list(self.iter_results(stimulus_sets, chunksize))
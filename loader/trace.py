@@ -0,0 +1,316 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .vcd import select_nets
+
+
+"""
+Binary Change Traces
+
+A compact alternative to VCD for long runs. Value changes are stored as fixed size records in
+fixed size chunks so any chunk can be found with a bit of arithmetic, plus an index at the end
+of the file:
+
+    header   magic, version, events per chunk, net count, net names
+    chunks   start tick (u64), event count (u32), padding (u32)
+             events: tick delta from the previous event (u32), net_id << 1 | value (u32)
+    index    per chunk: first tick (u64), last tick (u64), event count (u32)
+             per net: chunk count (u32), chunk ids (u32 each)
+    trailer  index offset (u64), chunk count (u32), magic
+
+Everything is little endian. TraceReader memory maps the file, so looking at a time window or
+a single net only touches the chunks involved.
+"""
+
+MAGIC = b"QUTR"
+TRACE_VERSION = 1
+CHUNK_EVENTS = 4096
+
+HEADER = struct.Struct("<4sHII")
+NAME_LENGTH = struct.Struct("<H")
+CHUNK_HEADER = struct.Struct("<QII")
+EVENT = struct.Struct("<II")
+INDEX_ENTRY = struct.Struct("<QQI")
+COUNT = struct.Struct("<I")
+TRAILER = struct.Struct("<QI4s")
+
+MAX_DELTA = 0xFFFFFFFF
+
+
+class TraceWriter:
+    def __init__(self, simulator, path, nets=None, chunk_events=CHUNK_EVENTS):
+        self.simulator = simulator  # Root simulator, its tick is used as the timestamp
+        self.chunk_events = chunk_events
+        self.chunk_size = CHUNK_HEADER.size + chunk_events * EVENT.size
+
+        self.nets = select_nets(simulator, nets)
+        self.callbacks = []
+
+        self.file = open(path, "wb", buffering=1 << 20)
+
+        self.events = array("I")
+        self.chunk_start = 0
+        self.last_tick = 0
+
+        self.chunk_index = []  # (first tick, last tick, count)
+        self.net_chunks = [[] for _ in self.nets]
+        self.chunk_nets = set()
+
+        self.__write_header()
+
+        for net_index, (name, sim, net_id) in enumerate(self.nets):
+            self.record(net_index, sim.get_net_vcc(net_id))
+
+        self.__attach()
+
+    def __write_header(self):
+        data = bytearray(HEADER.pack(MAGIC, TRACE_VERSION, self.chunk_events, len(self.nets)))
+
+        for name, sim, net_id in self.nets:
+            encoded = name.encode("utf-8")
+            data += NAME_LENGTH.pack(len(encoded)) + encoded
+
+        self.file.write(data)
+
+    def __attach(self):
+        for net_index, (name, sim, net_id) in enumerate(self.nets):
+            callback = self.__make_callback(net_index)
+            sim.watch_net(net_id, callback)
+            self.callbacks.append((sim, net_id, callback))
+
+    def __make_callback(self, net_index):
+        def record(vcc):
+            self.record(net_index, vcc)
+
+        return record
+
+    def record(self, net_index, vcc):
+        tick = self.simulator.simulation_tick
+
+        if not self.events:
+            self.chunk_start = tick
+            self.last_tick = tick
+
+        elif tick - self.last_tick > MAX_DELTA:
+            self.__write_chunk()
+            self.chunk_start = tick
+            self.last_tick = tick
+
+        self.events.append(tick - self.last_tick)
+        self.events.append((net_index << 1) | (vcc > 0.5))
+        self.last_tick = tick
+
+        self.chunk_nets.add(net_index)
+
+        if len(self.events) >= self.chunk_events * 2:
+            self.__write_chunk()
+
+    def __write_chunk(self):
+        count = len(self.events) // 2
+        chunk_id = len(self.chunk_index)
+
+        events = self.events
+        if sys.byteorder != "little":
+            events = array("I", events)
+            events.byteswap()
+
+        self.file.write(CHUNK_HEADER.pack(self.chunk_start, count, 0))
+        self.file.write(events.tobytes())
+        self.file.write(bytes((self.chunk_events - count) * EVENT.size))  # Keep chunks fixed size
+
+        self.chunk_index.append((self.chunk_start, self.last_tick, count))
+        for net_index in self.chunk_nets:
+            self.net_chunks[net_index].append(chunk_id)
+
+        self.events = array("I")
+        self.chunk_nets = set()
+
+    def close(self):
+        for sim, net_id, callback in self.callbacks:
+            sim.unwatch_net(net_id, callback)
+
+        self.callbacks = []
+
+        if self.events:
+            self.__write_chunk()
+
+        index_offset = self.file.tell()
+
+        data = bytearray()
+        for entry in self.chunk_index:
+            data += INDEX_ENTRY.pack(*entry)
+
+        for chunk_ids in self.net_chunks:
+            data += COUNT.pack(len(chunk_ids))
+            data += struct.pack(f"<{len(chunk_ids)}I", *chunk_ids)
+
+        data += TRAILER.pack(index_offset, len(self.chunk_index), MAGIC)
+
+        self.file.write(data)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TraceReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = None
+
+        try:
+            self.__open(path)
+        except Exception:
+            self.close()
+            raise
+
+    def __open(self, path):
+        size = os.fstat(self.file.fileno()).st_size
+
+        if size < HEADER.size + TRAILER.size:
+            raise ValueError(f"Trace file is truncated, no room for a header and trailer: {path}")
+
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.chunk_events, net_count = HEADER.unpack_from(self.data, 0)
+
+        if magic != MAGIC:
+            raise ValueError(f"Not a trace file: {path}")
+
+        if version != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version: {version}")
+
+        trailer_offset = size - TRAILER.size
+        offset = HEADER.size
+        self.names = []
+        for _ in range(net_count):
+            if offset + NAME_LENGTH.size > trailer_offset:
+                raise ValueError(f"Trace file is truncated in the net names: {path}")
+
+            (length,) = NAME_LENGTH.unpack_from(self.data, offset)
+            offset += NAME_LENGTH.size
+
+            self.names.append(bytes(self.data[offset:offset + length]).decode("utf-8"))
+            offset += length
+
+        self.name_lookup = {name: net_id for net_id, name in enumerate(self.names)}
+
+        self.chunks_offset = offset
+        self.chunk_size = CHUNK_HEADER.size + self.chunk_events * EVENT.size
+
+        index_offset, chunk_count, magic = TRAILER.unpack_from(self.data, trailer_offset)
+
+        if magic != MAGIC:
+            raise ValueError(f"Trace file was not closed properly: {path}")
+
+        if not offset + chunk_count * self.chunk_size <= index_offset <= trailer_offset - chunk_count * INDEX_ENTRY.size:
+            raise ValueError(f"Trace file is truncated or corrupt: {path}")
+
+        self.chunk_index = [
+            INDEX_ENTRY.unpack_from(self.data, index_offset + i * INDEX_ENTRY.size)
+            for i in range(chunk_count)
+        ]
+        self.chunk_starts = [entry[0] for entry in self.chunk_index]
+        self.chunk_ends = [entry[1] for entry in self.chunk_index]
+
+        self.net_index_offset = index_offset + chunk_count * INDEX_ENTRY.size
+        self.net_chunks = None  # Loaded on first use
+
+    def get_net_id(self, name):
+        return self.name_lookup[name]
+
+    def get_net_chunks(self, net_id):
+        if self.net_chunks is None:
+            self.net_chunks = []
+            offset = self.net_index_offset
+
+            for _ in self.names:
+                (count,) = COUNT.unpack_from(self.data, offset)
+                offset += COUNT.size
+
+                self.net_chunks.append(struct.unpack_from(f"<{count}I", self.data, offset))
+                offset += count * COUNT.size
+
+        return self.net_chunks[net_id]
+
+    def read_chunk(self, chunk_id):
+        """ Returns [(tick, net_id, value), ...] for one chunk """
+        offset = self.chunks_offset + chunk_id * self.chunk_size
+        tick, count, _ = CHUNK_HEADER.unpack_from(self.data, offset)
+
+        start = offset + CHUNK_HEADER.size
+        events = []
+
+        for delta, word in EVENT.iter_unpack(self.data[start:start + count * EVENT.size]):
+            tick += delta
+            events.append((tick, word >> 1, word & 1))
+
+        return events
+
+    def iter_window(self, start=0, end=None):
+        """ Every change with start <= tick <= end, in order """
+        first = bisect_left(self.chunk_ends, start)
+        last = len(self.chunk_index) if end is None else bisect_right(self.chunk_starts, end)
+
+        for chunk_id in range(first, last):
+            for event in self.read_chunk(chunk_id):
+                if event[0] < start:
+                    continue
+
+                if end is not None and event[0] > end:
+                    return
+
+                yield event
+
+    def iter_net(self, net_id, start=0, end=None):
+        """ Changes of a single net, only reading chunks that contain it """
+        for chunk_id in self.get_net_chunks(net_id):
+            chunk_start, chunk_end, _ = self.chunk_index[chunk_id]
+
+            if chunk_end < start:
+                continue
+
+            if end is not None and chunk_start > end:
+                return
+
+            for tick, event_net, value in self.read_chunk(chunk_id):
+                if event_net == net_id and start <= tick and (end is None or tick <= end):
+                    yield tick, value
+
+    def value_at(self, net_id, tick):
+        """ Value of a net at the end of a tick, None if the trace starts after it """
+        for chunk_id in reversed(self.get_net_chunks(net_id)):
+            if self.chunk_index[chunk_id][0] > tick:
+                continue
+
+            value = None
+            for event_tick, event_net, event_value in self.read_chunk(chunk_id):
+                if event_tick > tick:
+                    break
+
+                if event_net == net_id:
+                    value = event_value
+
+            if value is not None:
+                return value
+
+        return None
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,157 @@
+import fnmatch
+import queue
+import threading
+import time
+
+
+"""
+VCD (Value Change Dump) Recording
+
+Watches a set of nets on a simulator2.Simulator (sub schematics included) and writes every
+actual value change out as a VCD file, one simulation tick per timescale unit.
+
+Changes are collected into an in memory chunk and handed to a background thread that does the
+file writes, so the simulation loop only pays for a string append per change.
+"""
+
+FLUSH_EVERY = 65536  # Value changes per chunk handed to the writer thread
+FILE_BUFFER_SIZE = 1 << 20
+
+
+def select_nets(simulator, nets=None):
+    """ nets is a list of hierarchical names / fnmatch patterns, None selects everything """
+    selected = []
+
+    for name, sim, net_id in simulator.iter_nets():
+        if nets is None or any(fnmatch.fnmatchcase(name, pattern) for pattern in nets):
+            selected.append((name, sim, net_id))
+
+    return selected
+
+
+def identifier_code(index):
+    """ VCD short identifiers, base 94 over the printable ascii range """
+    code = ""
+
+    while True:
+        code += chr(33 + index % 94)
+        index //= 94
+
+        if index == 0:
+            return code
+
+
+class VCDWriter:
+    def __init__(self, simulator, path, nets=None, timescale="1 ns"):
+        self.simulator = simulator  # Root simulator, its tick is used as the timestamp
+        self.path = path
+
+        self.nets = select_nets(simulator, nets)
+        self.callbacks = []
+
+        self.chunk = []
+        self.last_tick = None
+
+        self.file = open(path, "w", buffering=FILE_BUFFER_SIZE)
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.thread.start()
+
+        self.__write_header(timescale)
+        self.__attach()
+
+    def __write_loop(self):
+        while True:
+            data = self.queue.get()
+
+            if data is None:
+                break
+
+            self.file.write(data)
+
+    def __write_header(self, timescale):
+        lines = [
+            f"$date {time.strftime('%Y-%m-%d %H:%M:%S')} $end",
+            "$version QuartusUnlogicalSim $end",
+            f"$timescale {timescale} $end",
+        ]
+
+        # Nest the vars in scopes following the sub schematic paths
+        tree = {}
+        for i, (name, sim, net_id) in enumerate(self.nets):
+            *scopes, net_name = name.split("/")
+
+            node = tree
+            for scope in scopes:
+                node = node.setdefault(scope, {})
+
+            node.setdefault(None, []).append((identifier_code(i), net_name))
+
+        def write_scope(scope_name, node):
+            lines.append(f"$scope module {scope_name} $end")
+
+            for code, net_name in node.get(None, []):
+                lines.append(f"$var wire 1 {code} {net_name.replace(' ', '_')} $end")
+
+            for sub_name, sub_node in node.items():
+                if sub_name is not None:
+                    write_scope(sub_name.replace(" ", "_"), sub_node)
+
+            lines.append("$upscope $end")
+
+        write_scope("top", tree)
+        lines.append("$enddefinitions $end")
+
+        lines.append(f"#{self.simulator.simulation_tick}")
+        lines.append("$dumpvars")
+        for i, (name, sim, net_id) in enumerate(self.nets):
+            lines.append(f"{'1' if sim.get_net_vcc(net_id) > 0.5 else '0'}{identifier_code(i)}")
+        lines.append("$end")
+
+        self.last_tick = self.simulator.simulation_tick
+        self.queue.put("\n".join(lines) + "\n")
+
+    def __attach(self):
+        for i, (name, sim, net_id) in enumerate(self.nets):
+            callback = self.__make_callback(identifier_code(i))
+            sim.watch_net(net_id, callback)
+            self.callbacks.append((sim, net_id, callback))
+
+    def __make_callback(self, code):
+        rising, falling = f"1{code}\n", f"0{code}\n"
+
+        def record(vcc):
+            tick = self.simulator.simulation_tick
+
+            if tick != self.last_tick:
+                self.last_tick = tick
+                self.chunk.append(f"#{tick}\n")
+
+            self.chunk.append(rising if vcc > 0.5 else falling)
+
+            if len(self.chunk) >= FLUSH_EVERY:
+                self.flush()
+
+        return record
+
+    def flush(self):
+        if self.chunk:
+            self.queue.put("".join(self.chunk))
+            self.chunk = []
+
+    def close(self):
+        for sim, net_id, callback in self.callbacks:
+            sim.unwatch_net(net_id, callback)
+
+        self.callbacks = []
+
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
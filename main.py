@@ -1,11 +1,17 @@
-from loader import Schematic, Renderer, Simulator
+from loader import Schematic, Renderer
 
-from loader import simulator2
+from loader.netlist import load_or_build
+from loader.runner import SimulationRunner
 
 # "test_data/quartus/main.bdf"
 # "test_data/quartus/Ripple-Counter_Up.bdf"
 
-schem = Schematic("test_data/quartus/main.bdf")
+# "lockstep": simulate one tick per frame
+# "thread" / "process": simulate at full speed in the background, the renderer samples it
+RUN_MODE = "lockstep"
+
+# Reload .bdf files automatically when they change on disk (checked about once a second)
+WATCH_FILES = False
 
 """
 >> TODO LIST
@@ -16,13 +22,28 @@ schem = Schematic("test_data/quartus/main.bdf")
 """
 
 
+if __name__ == "__main__":
+    path = "test_data/quartus/main.bdf"
+    schem = Schematic(path)
+
+    if RUN_MODE == "lockstep":
+        simulator = load_or_build(path, schem)  # Skips the build on warm starts
+        preview = Renderer(schem, simulator, watch_files=WATCH_FILES)
+        preview.target_fps = 500
+
+        simulator.full_rescan()
+
+        while True:
+            simulator.update()
+            preview.update()
 
-simulator = simulator2.Simulator(schem)
-preview = Renderer(schem, simulator)
-preview.target_fps = 500
+    else:
+        simulator = load_or_build(path, schem)
+        runner = SimulationRunner(simulator, mode=RUN_MODE)
+        runner.start()
 
-simulator.full_rescan()
+        preview = Renderer(schem, simulator, runner=runner, watch_files=WATCH_FILES)
+        preview.target_fps = 500
 
-while True:
-    simulator.update()
-    preview.update()
\ No newline at end of file
+        while True:
+            preview.update()
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from loader import Schematic, memo, simulator2
+from loader.bench import generate_counter, generate_hierarchy, generate_ripple_adder
+
+
+"""
+Designs come from the benchmark generators, so the tests don't need any .bdf files checked in
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_memo():
+    """ Memo tables are shared by design fingerprint, keep one test's answers out of the next """
+    memo.clear()
+    yield
+    memo.clear()
+
+
+@pytest.fixture(scope="session")
+def design_paths(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("designs"))
+
+    return {
+        "ripple_adder": generate_ripple_adder(directory, 4),
+        "counter": generate_counter(directory, 4),
+        "hierarchy": generate_hierarchy(directory, 3),
+    }
+
+
+@pytest.fixture
+def build(design_paths):
+    def build(name):
+        return simulator2.Simulator(Schematic(design_paths[name]), auto_gen=True)
+
+    return build
+
+
+def drive_random(simulator, ticks, seed=0):
+    """ Random values on every input, one tick each. Yields after every tick """
+    rng = random.Random(seed)
+    names = list(simulator.inputs)
+
+    for _ in range(ticks):
+        for name in names:
+            simulator.set_input(name, rng.randint(0, 1))
+
+        simulator.update_simulation()
+        yield
+
+
+@pytest.fixture
+def drive():
+    return drive_random
@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+from loader.coverage import COVERAGE_VERSION, ToggleCoverage
+from loader.sweep import run_stimulus
+
+
+def sample(simulator):
+    return [sim.get_net_vcc(net_id) > 0.5 for _, sim, net_id in simulator.iter_nets()]
+
+
+def get_set(coverage, bits):
+    return {index for index in range(len(coverage.names)) if coverage.get_bit(bits, index)}
+
+
+@pytest.mark.parametrize("name", ["ripple_adder", "counter", "hierarchy"])
+def test_records_toggles(build, drive, name):
+    simulator = build(name)
+    coverage = ToggleCoverage.for_simulator(simulator)
+    coverage.attach(simulator, fresh=True)
+
+    simulator.update_simulation()  # Settling isn't a toggle
+    assert coverage.count(coverage.rose) == coverage.count(coverage.fell) == 0
+
+    rose, fell = set(), set()
+    previous = sample(simulator)
+
+    for _ in drive(simulator, 200):
+        current = sample(simulator)
+        rose.update(i for i, (before, now) in enumerate(zip(previous, current)) if now and not before)
+        fell.update(i for i, (before, now) in enumerate(zip(previous, current)) if before and not now)
+        previous = current
+
+    assert rose and fell
+    assert rose <= get_set(coverage, coverage.rose)  # Glitches inside a tick count too, sampling misses them
+    assert fell <= get_set(coverage, coverage.fell)
+    assert coverage.runs == 1
+
+    coverage.detach()
+    assert not any(any(sim.hooks.values()) for sim in simulator.iter_simulators())
+
+
+def test_steady_inputs_record_nothing(build):
+    simulator = build("hierarchy")
+    simulator.update_simulation()
+
+    coverage = ToggleCoverage.for_simulator(simulator)
+    coverage.attach(simulator)
+
+    for _ in range(20):
+        simulator.update_simulation()
+
+    assert coverage.count(coverage.rose) == coverage.count(coverage.fell) == 0
+
+
+def test_save_load_merge(build, drive, tmp_path):
+    runs = []
+    for seed in range(2):
+        simulator = build("ripple_adder")
+        coverage = ToggleCoverage.for_simulator(simulator)
+        coverage.attach(simulator, fresh=True)
+        for _ in drive(simulator, 5, seed):
+            pass
+        runs.append(coverage)
+
+    path = str(tmp_path / "coverage.json")
+    runs[0].save(path)
+    loaded = ToggleCoverage.load(path)
+
+    assert (loaded.names, loaded.rose, loaded.fell, loaded.runs) == (runs[0].names, runs[0].rose, runs[0].fell, 1)
+
+    loaded.merge(runs[1])
+    assert loaded.runs == 2
+    assert get_set(loaded, loaded.rose) == get_set(runs[0], runs[0].rose) | get_set(runs[1], runs[1].rose)
+    assert get_set(loaded, loaded.fell) == get_set(runs[0], runs[0].fell) | get_set(runs[1], runs[1].fell)
+
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    data["version"] = COVERAGE_VERSION + 1
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+    with pytest.raises(ValueError):
+        ToggleCoverage.load(path)
+
+
+def test_stimulus_coverage(build):
+    simulator = build("counter")
+    stimulus = {"vectors": [{"CLK": tick % 2} for tick in range(40)]}
+    result = run_stimulus(simulator, stimulus, coverage=True)
+
+    reference = build("counter")
+    coverage = ToggleCoverage.for_simulator(reference)
+    coverage.attach(reference, fresh=True)
+    assert run_stimulus(reference, stimulus)["trace"] == result["trace"]
+
+    assert result["coverage"] == (bytes(coverage.rose), bytes(coverage.fell))
+
+
+def test_rejects_mismatches(build):
+    coverage = ToggleCoverage.for_simulator(build("ripple_adder"))
+    other = ToggleCoverage.for_simulator(build("counter"))
+
+    with pytest.raises(ValueError):
+        coverage.merge(other)
+
+    with pytest.raises(ValueError):
+        coverage.merge_bits(coverage.rose + b"\x00", coverage.fell)
+
+    with pytest.raises(ValueError):
+        coverage.attach(build("counter"))
+
+    assert coverage.runs == 0
+
+
+def test_count():
+    assert ToggleCoverage.count(b"") == 0
+    assert ToggleCoverage.count(bytearray(b"\x0f\x01\x80")) == 6
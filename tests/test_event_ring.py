@@ -0,0 +1,50 @@
+import threading
+import time
+
+from loader.runner import EventRing, OP_PRESS
+
+
+def make_ring(slots):
+    return EventRing(bytearray(EventRing.size(slots)), slots)
+
+
+def test_fifo_and_full():
+    ring = make_ring(4)
+
+    assert all(ring.push(OP_PRESS, 0, i, 1.0) for i in range(3))
+    assert not ring.push(OP_PRESS, 0, 3, 1.0)  # One slot always stays free
+
+    assert [event[2] for event in ring.pop_all()] == [0, 1, 2]
+    assert list(ring.pop_all()) == []
+
+
+def test_wraps_around():
+    ring = make_ring(4)
+    seen = []
+
+    for i in range(10):
+        assert ring.push(OP_PRESS, 1, i, i / 2)
+        seen.extend(ring.pop_all())
+
+    assert seen == [(OP_PRESS, 1, i, i / 2) for i in range(10)]
+
+
+def test_one_producer_one_consumer():
+    ring = make_ring(8)
+    count = 5000
+    received = []
+
+    def consume():
+        while len(received) < count:
+            received.extend(event[2] for event in ring.pop_all())
+            time.sleep(0)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+
+    for i in range(count):
+        while not ring.push(OP_PRESS, 0, i):
+            time.sleep(0)  # Consumer is a whole ring behind
+
+    consumer.join(timeout=30)
+    assert received == list(range(count))
@@ -0,0 +1,123 @@
+import time
+import types
+
+import pytest
+
+from loader import simulator2
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    """ time.time() moves on 2s per call, so a 1Hz clock flips on every tick """
+    clock = types.SimpleNamespace(now=0.0)
+
+    def step():
+        clock.now += 2
+        return clock.now
+
+    monkeypatch.setattr(simulator2, "time", types.SimpleNamespace(time=step, perf_counter=time.perf_counter))
+    return clock
+
+
+def make_clock(simulator, pin_name="CLK"):
+    component = simulator.inputs[pin_name]
+    pin_comp = next(iter(component.outputs.values()))
+    pin_comp.settings["is_clock"] = True
+    pin_comp.settings["clock_speed_hz"] = 1
+    simulator.clocks.append((component, pin_comp))
+
+
+def test_hooks_fire(build, fake_time):
+    simulator = build("counter")
+    make_clock(simulator)
+    simulator.update_simulation()
+
+    calls = {hook: [] for hook in simulator2.HOOKS}
+
+    def record(hook):
+        return lambda *args: calls[hook].append(args)
+
+    callbacks = {hook: record(hook) for hook in simulator2.HOOKS}
+    for hook, callback in callbacks.items():
+        simulator.subscribe(hook, callback)
+
+    nets_before = [simulator.get_net_vcc(net_id) for net_id in range(len(simulator.nets))]
+    events_before = simulator.event_count
+    ticks = 16
+
+    for _ in range(ticks):
+        simulator.update_simulation()
+
+    events = simulator.event_count - events_before
+
+    assert len(calls["tick_start"]) == len(calls["tick_end"]) == len(calls["clock_edge"]) == ticks
+    assert sum(args[1] for args in calls["tick_end"]) == len(calls["component_eval"]) == events
+
+    edges = [vcc for sim, component, vcc in calls["clock_edge"]]
+    assert all(a != b for a, b in zip(edges, edges[1:]))
+    assert all(component is simulator.inputs["CLK"] for sim, component, vcc in calls["clock_edge"])
+
+    # net_change only reports real changes, and the last report of every net is its value now
+    last = dict(enumerate(nets_before))
+    for sim, net_id, vcc in calls["net_change"]:
+        assert sim is simulator and vcc != last[net_id]
+        last[net_id] = vcc
+
+    assert last == {net_id: simulator.get_net_vcc(net_id) for net_id in range(len(simulator.nets))}
+    assert len(calls["net_change"]) >= ticks  # The CLK net alone changes every tick
+
+    for hook, callback in callbacks.items():
+        simulator.unsubscribe(hook, callback)
+
+    counts = {hook: len(args) for hook, args in calls.items()}
+    for _ in range(4):
+        simulator.update_simulation()
+
+    assert {hook: len(args) for hook, args in calls.items()} == counts
+    assert simulator.event_count > events_before + events  # Still simulating, just not reporting
+
+
+def test_unsubscribe_mid_tick(build):
+    simulator = build("counter")
+    calls = []
+
+    def once(sim, events, wave_sizes):
+        calls.append(events)
+        sim.unsubscribe("tick_end", once)
+
+    simulator.subscribe("tick_end", once)
+    simulator.subscribe("tick_end", lambda *args: calls.append("after"))
+
+    simulator.update_simulation()
+    simulator.update_simulation()
+
+    assert len(calls) == 3 and calls[1:] == ["after", "after"]
+
+
+def test_unknown_hook(build):
+    with pytest.raises(ValueError):
+        build("counter").subscribe("tick_middle", print)
+
+
+def test_hooked_level_not_memoized(build, drive):
+    simulator = build("hierarchy")
+    levels = [sim for sim in simulator.iter_simulators() if sim is not simulator]
+    for _ in drive(simulator, 4):
+        pass
+
+    assert all(level.get_memo() is not None for level in levels)
+
+    ticks = []
+    level = levels[-1]
+    level.subscribe("tick_start", ticks.append)
+
+    assert level.get_memo() is None
+    assert all(parent.get_memo() is None for parent in levels if level in parent.iter_simulators())
+
+    for _ in drive(simulator, 20, seed=1):
+        pass
+
+    assert ticks and not level.memo_stale  # Really simulated
+
+    level.unsubscribe("tick_start", ticks.append)
+    assert level.get_memo() is not None
@@ -0,0 +1,75 @@
+import types
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from loader import hud
+from loader.hud import PerformanceHUD, SAMPLE_INTERVAL
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=0.0)
+    monkeypatch.setattr(hud, "time", types.SimpleNamespace(perf_counter=lambda: clock.now))
+    return clock
+
+
+def make_hud():
+    return PerformanceHUD(lambda text, antialias, colour: pygame.Surface((6 * len(text), 12)))
+
+
+def run(simulator, clock, performance_hud, ticks):
+    for _ in range(ticks):
+        simulator.update_simulation()
+
+    clock.now += SAMPLE_INTERVAL
+    performance_hud.sample(simulator)
+
+
+def test_rate(build, clock):
+    simulator = build("counter")
+    performance_hud = make_hud()
+
+    run(simulator, clock, performance_hud, 0)
+    run(simulator, clock, performance_hud, 10)
+
+    assert performance_hud.history[-1] == 10 / SAMPLE_INTERVAL
+    assert performance_hud.surface is not None
+
+
+def test_counters_going_back(build, clock):
+    simulator = build("counter")
+    performance_hud = make_hud()
+
+    run(simulator, clock, performance_hud, 0)
+    run(simulator, clock, performance_hud, 50)
+    lines = performance_hud.lines
+
+    simulator.reload()
+    run(simulator, clock, performance_hud, 5)  # Fewer ticks than before the reload
+
+    assert list(performance_hud.history) == [50 / SAMPLE_INTERVAL]
+    assert performance_hud.lines == lines
+
+    run(simulator, clock, performance_hud, 5)  # Counts from the new baseline
+    assert performance_hud.history[-1] == 5 / SAMPLE_INTERVAL
+    assert all(rate >= 0 for rate in performance_hud.history)
+
+
+def test_new_simulator(build, clock):
+    performance_hud = make_hud()
+    first = build("counter")
+
+    run(first, clock, performance_hud, 0)
+    run(first, clock, performance_hud, 50)
+
+    second = build("counter")
+    for _ in range(80):  # Ahead of the first, so only the identity check catches it
+        second.update_simulation()
+
+    run(second, clock, performance_hud, 0)
+    assert list(performance_hud.history) == [50 / SAMPLE_INTERVAL]
+
+    run(second, clock, performance_hud, 4)
+    assert performance_hud.history[-1] == 4 / SAMPLE_INTERVAL
@@ -0,0 +1,137 @@
+import os
+
+from loader import Schematic, simulator2
+from loader.bench import DesignWriter, generate_hierarchy
+
+
+def generate_half_adders(directory):
+    """ Three instances of one two input design, wired up in different orders """
+    design = DesignWriter()
+    a, b = design.pin("A", True, 0, 0), design.pin("B", True, 0, 40)
+    or1 = design.symbol("OR2", ["IN1", "IN2"], ["OUT"], 300, 0)
+    and1 = design.symbol("AND2", ["IN1", "IN2"], ["OUT"], 300, 120)
+    not1 = design.symbol("NOT", ["IN"], ["OUT"], 450, 120)
+    and2 = design.symbol("AND2", ["IN1", "IN2"], ["OUT"], 600, 0)
+
+    for pin, port in ((a, "IN1"), (b, "IN2")):
+        design.connect(pin, or1[port])
+        design.connect(pin, and1[port])
+
+    design.connect(and1["OUT"], not1["IN"])
+    design.connect(or1["OUT"], and2["IN1"])
+    design.connect(not1["OUT"], and2["IN2"])
+    design.connect(and2["OUT"], design.pin("S", False, 900, 0))
+    design.connect(and1["OUT"], design.pin("C", False, 900, 120))
+    design.save(os.path.join(directory, "half_adder.bdf"))
+
+    design = DesignWriter()
+    x0, x1 = design.pin("X0", True, 0, 0), design.pin("X1", True, 0, 40)
+    y0, y1 = design.pin("Y0", True, 0, 80), design.pin("Y1", True, 0, 120)
+
+    for i, (first, second) in enumerate(((x0, y0), (y1, x1), (x1, x0))):
+        ports = design.symbol("half_adder", ["A", "B"], ["S", "C"], 300, i * 200)
+        design.connect(first, ports["A"])
+        design.connect(second, ports["B"])
+        design.connect(ports["S"], design.pin(f"S{i}", False, 600, i * 200))
+        design.connect(ports["C"], design.pin(f"C{i}", False, 600, i * 200 + 40))
+
+    path = os.path.join(directory, "half_adders.bdf")
+    design.save(path)
+    return path
+
+
+def build_path(path):
+    return simulator2.Simulator(Schematic(path), auto_gen=True)
+
+
+def trace_outputs(simulator, drive, ticks=100, seed=0):
+    names = sorted(simulator.outputs)
+    return [tuple(int(simulator.get_output(name)) for name in names) for _ in drive(simulator, ticks, seed)]
+
+
+def memo_hits(simulator):
+    return sum(sim.memo.hits for sim in simulator.iter_simulators() if sim.memo is not None)
+
+
+def test_same_outputs(design_paths, drive, tmp_path):
+    for path in (design_paths["hierarchy"], generate_half_adders(str(tmp_path))):
+        memoized = build_path(path)
+        expected = build_path(path)
+
+        for sim in expected.iter_simulators():  # Tracked levels always run for real
+            sim.track_changes()
+
+        assert trace_outputs(memoized, drive) == trace_outputs(expected, drive)
+        assert memo_hits(memoized) > 0
+        assert memo_hits(expected) == 0
+
+
+def test_catches_up_when_observed(build, drive):
+    simulator = build("hierarchy")
+    reference = build("hierarchy")
+    for sim in reference.iter_simulators():
+        sim.track_changes()
+
+    for _ in zip(drive(simulator, 10), drive(reference, 10)):
+        pass
+
+    stale = [index for index, sim in enumerate(simulator.iter_simulators()) if sim.memo_stale]
+    assert stale
+
+    level = list(simulator.iter_simulators())[stale[0]]
+    expected = list(reference.iter_simulators())[stale[0]]
+    changes = []
+
+    generation = simulator2.observe_generation
+    level.watch_net(0, changes.append)
+    assert simulator2.observe_generation != generation
+    assert level.get_memo() is None
+
+    simulator.update_simulation()  # Released at the start of the tick
+    reference.update_simulation()
+
+    assert not level.memo_stale
+    assert [level.get_net_vcc(net_id) for net_id in range(len(level.nets))] == [
+        expected.get_net_vcc(net_id) for net_id in range(len(expected.nets))
+    ]
+
+    for _ in zip(drive(simulator, 20, seed=1), drive(reference, 20, seed=1)):
+        assert level.get_net_vcc(0) == expected.get_net_vcc(0)
+
+    assert changes
+
+    level.unwatch_net(0, changes.append)
+    assert level.get_memo() is not None
+
+
+def test_reload_resets_parent_memo(tmp_path, drive):
+    path = generate_hierarchy(str(tmp_path), 3)
+    simulator = build_path(path)
+    trace_outputs(simulator, drive, 20)
+
+    levels = list(simulator.iter_simulators())[1:]
+    fingerprints = [level.get_fingerprint() for level in levels]
+    assert memo_hits(simulator) > 0
+
+    design = DesignWriter()  # The bottom NOT becomes a pair, so every level turns into a wire
+    previous = design.pin("A", True, 0, 0)
+    for i in range(2):
+        ports = design.symbol("NOT", ["IN"], ["OUT"], 300 + i * 150, 0)
+        design.connect(previous, ports["IN"])
+        previous = ports["OUT"]
+
+    design.connect(previous, design.pin("Y", False, 600, 0))
+    bottom = str(tmp_path / "level0.bdf")
+    design.save(bottom)
+    os.utime(bottom, (0, 0))  # Different mtime even on coarse clocks
+
+    reloaded = simulator.reload_changed()
+    assert reloaded and all(sim.schematic.path == bottom for sim in reloaded)
+
+    for level, fingerprint in zip(levels, fingerprints):
+        if level not in reloaded:
+            assert level.memo is None
+            assert level.get_fingerprint() != fingerprint
+
+    simulator.update_simulation()
+    assert trace_outputs(simulator, drive, 40, seed=1) == trace_outputs(build_path(path), drive, 40, seed=1)
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from loader import Schematic, simulator2
+from loader.bench import generate_hierarchy
+from loader.netlist import (
+    NETLIST_VERSION, compile_netlist, dumps_netlist, load_netlist, loads_netlist, load_cached_netlist,
+    save_cached_netlist
+)
+
+
+def trace_outputs(simulator, drive, ticks=60):
+    return [{name: simulator.get_output(name) for name in simulator.outputs} for _ in drive(simulator, ticks)]
+
+
+def test_pickle_round_trip(build, drive):
+    for name in ("ripple_adder", "counter", "hierarchy"):
+        netlist = loads_netlist(dumps_netlist(compile_netlist(build(name))))
+
+        assert netlist["version"] == NETLIST_VERSION
+        assert trace_outputs(load_netlist(netlist), drive) == trace_outputs(build(name), drive)
+
+
+def test_cache(tmp_path, drive):
+    path = generate_hierarchy(str(tmp_path), 3)  # Own copy, this test edits it
+    cache_path = str(tmp_path / "cache" / "design.netlist")
+
+    simulator = simulator2.Simulator(Schematic(path), auto_gen=True)
+    save_cached_netlist(simulator, cache_path)
+
+    netlist = load_cached_netlist(path, cache_path)
+    assert netlist is not None
+    assert trace_outputs(load_netlist(netlist), drive) == trace_outputs(simulator2.Simulator(Schematic(path), auto_gen=True), drive)
+
+    assert load_cached_netlist(path, str(tmp_path / "nothing_here")) is None
+
+    with open(cache_path, "rb") as f:
+        missing = loads_netlist(f.read())["missing"]
+
+    assert missing
+    with open(missing[0], "w"):  # A primitive that gets its own .bdf would now be built from it
+        pass
+
+    assert load_cached_netlist(path, cache_path) is None
+    os.remove(missing[0])
+    assert load_cached_netlist(path, cache_path) is not None
+
+    with open(path, "a") as f:
+        f.write("\n")
+
+    assert load_cached_netlist(path, cache_path) is None
+
+
+def test_cache_version(build, tmp_path):
+    cache_path = str(tmp_path / "design.netlist")
+    simulator = build("ripple_adder")
+    save_cached_netlist(simulator, cache_path)
+
+    with open(cache_path, "rb") as f:
+        cached = loads_netlist(f.read())
+
+    cached["version"] = NETLIST_VERSION - 1
+    with open(cache_path, "wb") as f:
+        f.write(dumps_netlist(cached))
+
+    assert load_cached_netlist(simulator.schematic.path, cache_path) is None
+    assert os.path.exists(cache_path)
+
+    with pytest.raises(ValueError):
+        load_netlist(cached["netlist"] | {"version": NETLIST_VERSION - 1})
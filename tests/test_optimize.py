@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from loader import Schematic, simulator2
+from loader.bench import DesignWriter, generate_not_chain
+from loader.netlist import compile_netlist, load_netlist
+from loader.optimize import count_components, optimize_netlist
+
+
+def generate_redundant(directory):
+    """ A bit of everything the passes look for """
+    design = DesignWriter()
+    a = design.pin("A", True, 0, 0)
+    b = design.pin("B", True, 0, 40)
+    c = design.pin("C", True, 0, 80)
+
+    not1 = design.symbol("NOT", ["IN"], ["OUT"], 300, 0)  # NOT-NOT, then AND + NOT fuses into a NAND
+    not2 = design.symbol("NOT", ["IN"], ["OUT"], 420, 0)
+    and1 = design.symbol("AND2", ["IN1", "IN2"], ["OUT"], 300, 200)
+    not3 = design.symbol("NOT", ["IN"], ["OUT"], 420, 200)
+    design.connect(a, not1["IN"])
+    design.connect(not1["OUT"], not2["IN"])
+    design.connect(not2["OUT"], and1["IN1"])
+    design.connect(b, and1["IN2"])
+    design.connect(and1["OUT"], not3["IN"])
+    design.connect(not3["OUT"], design.pin("Y1", False, 900, 0))
+
+    or1 = design.symbol("OR2", ["IN1", "IN2"], ["OUT"], 300, 400)  # Duplicates
+    or2 = design.symbol("OR2", ["IN1", "IN2"], ["OUT"], 300, 500)
+    nand = design.symbol("NAND2", ["IN1", "IN2"], ["OUT"], 450, 450)
+    design.connect(b, or1["IN1"])
+    design.connect(c, or1["IN2"])
+    design.connect(c, or2["IN1"])
+    design.connect(b, or2["IN2"])
+    design.connect(or1["OUT"], nand["IN1"])
+    design.connect(or2["OUT"], nand["IN2"])
+    design.connect(nand["OUT"], design.pin("Y2", False, 900, 450))
+
+    and2 = design.symbol("AND2", ["IN1", "IN2"], ["OUT"], 300, 700)  # Floating input, always 0
+    or3 = design.symbol("OR2", ["IN1", "IN2"], ["OUT"], 450, 700)
+    design.connect(a, and2["IN1"])
+    design.connect(and2["OUT"], or3["IN1"])
+    design.connect(c, or3["IN2"])
+    design.connect(or3["OUT"], design.pin("Y3", False, 900, 700))
+
+    dead = design.symbol("NOT", ["IN"], ["OUT"], 300, 1100)
+    design.connect(a, dead["IN"])
+
+    path = os.path.join(directory, "redundant.bdf")
+    design.save(path)
+    return path
+
+
+def trace_outputs(simulator, drive, ticks=200):
+    names = sorted(simulator.outputs)
+    return [tuple(int(simulator.get_output(name)) for name in names) for _ in drive(simulator, ticks)]
+
+
+@pytest.mark.parametrize("name", ["ripple_adder", "counter", "hierarchy"])
+def test_same_outputs(build, drive, name):
+    netlist = compile_netlist(build(name))
+    optimized = optimize_netlist(netlist)
+
+    assert trace_outputs(load_netlist(optimized), drive) == trace_outputs(load_netlist(netlist), drive)
+
+
+def test_passes(tmp_path, drive):
+    for path in (generate_redundant(str(tmp_path)), generate_not_chain(str(tmp_path), 16)):
+        netlist = compile_netlist(simulator2.Simulator(Schematic(path), auto_gen=True))
+        components = count_components(netlist)
+        optimized = optimize_netlist(netlist)
+
+        assert count_components(netlist) == components  # Original left alone
+        assert count_components(optimized) < components
+        assert trace_outputs(load_netlist(optimized), drive) == trace_outputs(load_netlist(netlist), drive)
+
+
+def test_probes_keep_nets(tmp_path, drive):
+    simulator = simulator2.Simulator(Schematic(generate_not_chain(str(tmp_path), 8)), auto_gen=True)
+    netlist = compile_netlist(simulator)
+    names = [name for name, _, _ in simulator.iter_nets()]
+    probe = names.index("inst3.OUT")
+
+    assert optimize_netlist(netlist)["net_map"][probe] == -1
+
+    optimized = optimize_netlist(netlist, probes=["inst3.*"])
+    kept = optimized["net_map"][probe]
+    assert kept != -1
+
+    plain, fast = load_netlist(netlist), load_netlist(optimized)
+    for _ in zip(drive(plain, 50), drive(fast, 50)):
+        assert fast.get_net_vcc(kept) == plain.get_net_vcc(probe)
@@ -0,0 +1,148 @@
+import os
+import time
+
+import pytest
+
+from loader import Schematic, simulator2
+from loader.bench import DesignWriter
+from loader.runner import OP_PRESS, SimulationRunner
+
+BITS = 3
+
+
+def write_sub(directory, inverters):
+    """ Y = A through a chain of NOTs """
+    design = DesignWriter()
+    previous = design.pin("A", True, 0, 0)
+
+    for i in range(inverters):
+        ports = design.symbol("NOT", ["IN"], ["OUT"], 300 + i * 150, 0)
+        design.connect(previous, ports["IN"])
+        previous = ports["OUT"]
+
+    design.connect(previous, design.pin("Y", False, 900, 0))
+
+    path = os.path.join(directory, "sub.bdf")
+    design.save(path)
+    os.utime(path, (0, 0) if inverters % 2 else (1, 1))  # A different mtime on every edit, however coarse the clock
+
+
+def generate_design(directory):
+    """ A ripple counter on CLK next to a sub schematic on A """
+    write_sub(directory, 1)
+    design = DesignWriter()
+    clock = design.pin("CLK", True, 0, 0)
+
+    for bit in range(BITS):
+        dff = design.symbol("DFF", ["D", "CLK"], ["Q"], 300, bit * 120)
+        inverter = design.symbol("NOT", ["IN"], ["OUT"], 450, bit * 120)
+        design.connect(clock, dff["CLK"])
+        design.connect(dff["Q"], inverter["IN"])
+        design.connect(inverter["OUT"], dff["D"])
+        design.connect(dff["Q"], design.pin(f"Q{bit}", False, 600, bit * 120))
+        clock = inverter["OUT"]
+
+    sub = design.symbol("sub", ["A"], ["Y"], 300, 600)
+    design.connect(design.pin("A", True, 0, 600), sub["A"])
+    design.connect(sub["Y"], design.pin("Y", False, 600, 600))
+
+    path = os.path.join(directory, "top.bdf")
+    design.save(path)
+    return path
+
+
+def get_outputs(simulator):
+    return {name: int(simulator.get_output(name)) for name in simulator.outputs}
+
+
+def count(outputs):
+    return sum(outputs[f"Q{bit}"] << bit for bit in range(BITS))
+
+
+class Lockstep:
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def press(self, pin_name):
+        self.simulator.update_input_pin(self.simulator.inputs[pin_name], 1)
+        self.settle()
+
+    def settle(self):
+        for _ in range(10):
+            self.simulator.update_simulation()
+
+    def reload_changed(self):
+        reloaded = self.simulator.reload_changed()
+        self.settle()
+        return reloaded
+
+    def stop(self):
+        pass
+
+
+class Background:
+    def __init__(self, simulator, mode):
+        self.simulator = simulator
+        self.runner = SimulationRunner(simulator, mode)
+        self.runner.start()
+        self.settle()
+
+    def press(self, pin_name):
+        self.runner.send(OP_PRESS, self.simulator.inputs[pin_name], 1)
+        self.settle()
+
+    def settle(self):
+        """ Waits until the worker has moved on a good few ticks since now, then syncs """
+        self.runner.sync()
+        deadline = time.time() + 10
+        start = None
+
+        while time.time() < deadline:
+            time.sleep(0.02)
+            self.runner.sync()
+
+            if start is None:
+                start = self.simulator.simulation_tick
+            elif self.simulator.simulation_tick > start + 10:
+                return
+
+        raise TimeoutError("Worker stopped ticking")
+
+    def reload_changed(self):
+        reloaded = self.runner.reload_changed()
+        self.settle()
+        return reloaded
+
+    def stop(self):
+        self.runner.stop()
+
+
+@pytest.mark.parametrize("mode", ["lockstep", "thread", "process"])
+def test_reload_keeps_untouched_levels(tmp_path, mode):
+    path = generate_design(str(tmp_path))
+    simulator = simulator2.Simulator(Schematic(path), auto_gen=True)
+    driver = Lockstep(simulator) if mode == "lockstep" else Background(simulator, mode)
+
+    try:
+        for _ in range(5):
+            driver.press("CLK")
+
+        driver.press("A")
+        before = get_outputs(simulator)
+        assert count(before) != 0 and before["Y"] == 0  # NOT of A=1
+
+        write_sub(str(tmp_path), 2)
+        reloaded = driver.reload_changed()
+
+        assert [os.path.basename(sim.schematic.path) for sim in reloaded] == ["sub.bdf"]
+
+        after = get_outputs(simulator)
+        assert {name: after[name] for name in after if name != "Y"} == {name: before[name] for name in before if name != "Y"}
+        assert after["Y"] == 1  # Now a buffer
+
+        driver.press("CLK")
+        driver.press("CLK")
+        assert count(get_outputs(simulator)) != count(after)  # Still counting from where it was
+
+    finally:
+        driver.stop()
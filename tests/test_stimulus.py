@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from loader.stimulus import StimulusError, StimulusRunner, read_vectors
+
+
+ADDER_INPUTS = ["CIN", "A0", "B0", "A1", "B1", "A2", "B2", "A3", "B3"]
+
+
+def add(values):
+    a = sum(values[f"A{bit}"] << bit for bit in range(4))
+    b = sum(values[f"B{bit}"] << bit for bit in range(4))
+    total = a + b + values["CIN"]
+    return {f"S{bit}": (total >> bit) & 1 for bit in range(4)} | {"COUT": total >> 4}
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def adder_rows(count=16):
+    rows = []
+    for i in range(count):
+        values = {name: (i * 2654435761 >> bit) & 1 for bit, name in enumerate(ADDER_INPUTS)}
+        rows.append((values, add(values)))
+
+    return rows
+
+
+def test_csv(build, tmp_path):
+    lines = ["# Exhaustive enough", ",".join(ADDER_INPUTS + ["@ticks", "=S0", "=S1", "=S2", "=S3", "=COUT"])]
+    for values, expected in adder_rows():
+        lines.append(",".join([str(values[name]) for name in ADDER_INPUTS] + ["4"] + [str(value) for value in expected.values()]))
+
+    cout = adder_rows()[-1][1]["COUT"]
+    lines.append(",".join([""] * len(ADDER_INPUTS) + ["", "x", "-", "", "", str(cout)]))  # Nothing changes, only COUT is checked
+    path = write(tmp_path, "adder.csv", "\n".join(lines) + "\n")
+
+    vectors = list(read_vectors(path))
+    assert [vector.line for vector in vectors] == list(range(3, 3 + len(vectors)))
+    assert vectors[0].ticks == 4 and vectors[-1].ticks == 1
+    assert vectors[-1].inputs == [] and vectors[-1].expect == [("COUT", cout)]
+
+    result = StimulusRunner(build("ripple_adder")).run(path)
+
+    assert result.passed
+    assert (result.vectors, result.ticks, result.checks) == (17, 16 * 4 + 1, 16 * 5 + 1)
+    assert str(result).startswith("PASS: 17 vectors")
+
+
+def test_jsonl(build, tmp_path):
+    lines = ["", "# comment"]
+    for values, expected in adder_rows():
+        lines.append(json.dumps({"inputs": values, "expect": expected, "ticks": 4}))
+
+    lines.append(json.dumps({"expect": {"S0": 1 - adder_rows()[-1][1]["S0"], "S1": adder_rows()[-1][1]["S1"]}}))
+    path = write(tmp_path, "adder.jsonl", "\n".join(lines) + "\n")
+
+    result = StimulusRunner(build("ripple_adder"), max_failures=5).run(path)
+
+    assert not result.passed
+    assert (result.vectors, result.checks, result.failed_checks) == (17, 16 * 5 + 2, 1)
+    assert result.failures == [(len(lines), "S0", 1 - adder_rows()[-1][1]["S0"], adder_rows()[-1][1]["S0"])]
+    assert f"line {len(lines)}: S0 expected" in str(result)
+
+
+def test_failures_are_capped(build, tmp_path):
+    rows = "\n".join(f"{i % 2},{1 - i % 2}" for i in range(10))  # Always wrong for CIN=0, A0=0, B0=0
+    path = write(tmp_path, "wrong.csv", f"CIN,=S0\n{rows}\n")
+
+    result = StimulusRunner(build("ripple_adder"), max_failures=3).run(path)
+
+    assert result.failed_checks == 10 and len(result.failures) == 3
+    assert "... and 7 more" in str(result)
+
+
+@pytest.mark.parametrize("name, text, line", [
+    ("cells.csv", "A0,B0\n0,1\n0,1,1\n", 3),
+    ("value.csv", "A0,B0\n0,2\n", 2),
+    ("letters.csv", "A0,=S0\nlow,1\n", 2),
+    ("ticks.csv", "A0,@ticks\n1,0\n", 2),
+    ("json.jsonl", '{"inputs": {"A0": 1}}\n{"inputs": \n', 2),
+    ("list.jsonl", '[1, 2]\n', 1),
+    ("inputs.jsonl", '{"inputs": [["A0", 1]]}\n', 1),
+    ("float.jsonl", '{"inputs": {"A0": 0.5}}\n', 1),
+    ("ticks.jsonl", '{"ticks": "many"}\n', 1),
+])
+def test_malformed_rows(tmp_path, name, text, line):
+    with pytest.raises(StimulusError, match=f"^line {line}: "):
+        list(read_vectors(write(tmp_path, name, text)))
+
+
+def test_unknown_pins(build, tmp_path):
+    with pytest.raises(StimulusError, match="unknown input pin 'A9'"):
+        StimulusRunner(build("ripple_adder")).run(write(tmp_path, "in.csv", "A0,A9\n1,1\n"))
+
+    with pytest.raises(StimulusError, match="unknown output pin 'Q'"):
+        StimulusRunner(build("ripple_adder")).run(write(tmp_path, "out.jsonl", '{"expect": {"Q": 1}}\n'))
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from loader.sweep import SweepRunner, run_stimulus
+
+
+def make_stimulus(simulator, count=6, ticks=30, seed=0):
+    rng = random.Random(seed)
+    names = [name for name in simulator.inputs if name != "CLK"]
+    stimulus_sets = []
+
+    for i in range(count):
+        stimulus = {"name": f"set{i}", "vectors": [{name: rng.randint(0, 1) for name in names} for _ in range(ticks)]}
+
+        if "CLK" in simulator.inputs:
+            stimulus["clocks"] = {"CLK": i + 1}
+            stimulus["ticks"] = ticks
+
+        stimulus_sets.append(stimulus)
+
+    return stimulus_sets
+
+
+@pytest.mark.parametrize("name", ["ripple_adder", "counter"])
+@pytest.mark.parametrize("optimize, coverage", [(False, False), (True, False), (False, True)])
+def test_processes_match_serial(build, name, optimize, coverage):
+    simulator = build(name)
+    stimulus_sets = make_stimulus(simulator)
+
+    serial = SweepRunner(simulator, processes=1, optimize=optimize, coverage=coverage)
+    parallel = SweepRunner(simulator, processes=2, optimize=optimize, coverage=coverage)
+    expected = serial.run(stimulus_sets)
+
+    assert parallel.run(stimulus_sets) == expected
+    assert [result["name"] for result in expected] == [stimulus["name"] for stimulus in stimulus_sets]
+
+    for stimulus, result in zip(stimulus_sets, expected):  # And the same as a plain simulator
+        assert run_stimulus(build(name), stimulus)["trace"] == result["trace"]
+
+    if coverage:
+        assert parallel.coverage.runs == serial.coverage.runs == len(stimulus_sets)
+        assert (parallel.coverage.rose, parallel.coverage.fell) == (serial.coverage.rose, serial.coverage.fell)
+        assert serial.coverage.count(serial.coverage.rose) > 0
+
+
+def test_optimize_without_coverage(build):
+    with pytest.raises(ValueError):
+        SweepRunner(build("ripple_adder"), optimize=True, coverage=True)
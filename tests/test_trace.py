@@ -0,0 +1,75 @@
+import pytest
+
+from loader.trace import TRACE_VERSION, TraceReader, TraceWriter
+
+
+def test_round_trip(build, drive, tmp_path):
+    simulator = build("ripple_adder")
+    nets = list(simulator.iter_nets())
+    path = str(tmp_path / "run.qtr")
+
+    samples = {}  # tick -> value of every net at the end of it
+    with TraceWriter(simulator, path, chunk_events=8) as writer:  # Small chunks, so the index gets used
+        start = simulator.simulation_tick
+
+        for _ in drive(simulator, 40):
+            samples[simulator.simulation_tick - 1] = [sim.get_net_vcc(net_id) for _, sim, net_id in nets]
+
+    with TraceReader(path) as reader:
+        assert reader.names == [name for name, _, _ in nets]
+        assert len(reader.chunk_index) > 1
+
+        events = list(reader.iter_window())
+        assert [tick for tick, _, _ in events] == sorted(tick for tick, _, _ in events)
+        assert events[0][0] == start
+
+        for tick, values in samples.items():
+            assert [reader.value_at(net_id, tick) for net_id in range(len(nets))] == [int(vcc > 0.5) for vcc in values]
+
+        for net_id in range(len(nets)):
+            assert list(reader.iter_net(net_id)) == [(tick, value) for tick, event_net, value in events if event_net == net_id]
+
+        window = list(reader.iter_window(start + 10, start + 20))
+        assert window == [event for event in events if start + 10 <= event[0] <= start + 20]
+
+
+def test_rejects_unclosed_file(build, tmp_path):
+    path = str(tmp_path / "open.qtr")
+    writer = TraceWriter(build("ripple_adder"), path)
+    writer.file.flush()
+
+    with pytest.raises(ValueError):
+        TraceReader(path)
+
+    writer.close()
+
+
+def test_rejects_truncated_file(build, drive, tmp_path):
+    simulator = build("ripple_adder")
+    path = str(tmp_path / "run.qtr")
+
+    with TraceWriter(simulator, path, chunk_events=8):
+        for _ in drive(simulator, 20):
+            pass
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    for length in (0, 5, len(data) // 2, len(data) - 1):
+        with open(path, "wb") as f:
+            f.write(data[:length])
+
+        with pytest.raises(ValueError):
+            TraceReader(path)
+
+    with open(path, "wb") as f:
+        f.write(b"JUNK" + data[4:])
+
+    with pytest.raises(ValueError, match="Not a trace file"):
+        TraceReader(path)
+
+    with open(path, "wb") as f:
+        f.write(data[:4] + (TRACE_VERSION + 1).to_bytes(2, "little") + data[6:])
+
+    with pytest.raises(ValueError, match="Unsupported trace version"):
+        TraceReader(path)
@@ -0,0 +1,91 @@
+from loader.vcd import VCDWriter, identifier_code
+
+
+def parse_vcd(path):
+    """ (scopes, {code: var name}, dumpvars, [(tick, [(code, value)])]) """
+    with open(path, "r") as f:
+        lines = iter(f.read().split("\n"))
+
+    scopes, variables, dumpvars, blocks = [], {}, {}, []
+    stack = []
+
+    for line in lines:
+        if line.startswith("$scope"):
+            stack.append(line.split()[2])
+            scopes.append("/".join(stack))
+
+        elif line.startswith("$upscope"):
+            stack.pop()
+
+        elif line.startswith("$var"):
+            _, kind, width, code, name, _ = line.split()
+            assert (kind, width) == ("wire", "1")
+            variables[code] = "/".join(stack[1:] + [name])
+
+        elif line == "$dumpvars":
+            for value in lines:
+                if value == "$end":
+                    break
+
+                dumpvars[value[1:]] = int(value[0])
+
+        elif line.startswith("#"):
+            blocks.append((int(line[1:]), []))
+
+        elif line and line[0] in "01":
+            blocks[-1][1].append((line[1:], int(line[0])))
+
+    return scopes, variables, dumpvars, blocks
+
+
+def sample(simulator):
+    return {identifier_code(i): int(sim.get_net_vcc(net_id) > 0.5) for i, (_, sim, net_id) in enumerate(simulator.iter_nets())}
+
+
+def test_counter(build, drive, tmp_path):
+    simulator = build("counter")
+    simulator.update_simulation()
+    path = str(tmp_path / "counter.vcd")
+
+    samples = {}  # tick -> value of every net at the end of it
+    with VCDWriter(simulator, path):
+        start = simulator.simulation_tick
+        initial = sample(simulator)
+
+        for _ in drive(simulator, 30):
+            samples[simulator.simulation_tick - 1] = sample(simulator)
+
+    scopes, variables, dumpvars, blocks = parse_vcd(path)
+
+    assert scopes == ["top"]
+    assert variables == {identifier_code(i): name for i, (name, _, _) in enumerate(simulator.iter_nets())}
+    assert dumpvars == initial
+    assert blocks[0][0] == start
+
+    ticks = [tick for tick, _ in blocks]
+    assert all(a < b for a, b in zip(ticks, ticks[1:]))  # Increasing, every tick stamped once
+    assert sum(len(changes) for _, changes in blocks) > len(variables)
+
+    values = {}
+    changes_by_tick = dict(blocks)
+    for tick in sorted(samples):
+        for code, value in changes_by_tick.get(tick, []):
+            values[code] = value
+
+        assert (dumpvars | values) == samples[tick]
+
+
+def test_hierarchy_scopes(build, drive, tmp_path):
+    simulator = build("hierarchy")
+    path = str(tmp_path / "hierarchy.vcd")
+
+    with VCDWriter(simulator, path, nets=["*/*/Y", "A"]):
+        for _ in drive(simulator, 5):
+            pass
+
+    scopes, variables, dumpvars, blocks = parse_vcd(path)
+    names = sorted(variables.values())
+
+    assert names and all(name == "A" or name.count("/") == 2 for name in names)
+    assert {name.rsplit("/", 1)[0] for name in names if "/" in name} <= {scope[len("top/"):] for scope in scopes}
+    assert set(dumpvars) == set(variables)